@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 class ArchitectAgent(BaseAgent):
     """A1: по спецификации от A0 строит список файлов Astro-проекта с их описаниями."""
 
+    json_response = True
+
     SYSTEM_PROMPT = """Ты — архитектор Astro-проектов.
 По заданным подзадачам создай полную спецификацию файловой структуры проекта.
 
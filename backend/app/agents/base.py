@@ -5,12 +5,13 @@ import json
 import logging
 import re
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Callable
 
 from openai import AsyncOpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from app.core.config import settings
+from app.services import llm_cache, model_router
+from app.services.llm_client import get_llm_client, get_token_budget, record_usage
 
 logger = logging.getLogger(__name__)
 
@@ -18,37 +19,166 @@ logger = logging.getLogger(__name__)
 class BaseAgent(ABC):
     """Базовый класс для агентов A0, A1, A2."""
 
+    # Оценка длины ответа для резерва в TPM-бюджете (уточняется по usage ответа)
+    expected_output_tokens: int = 1024
+    # Ответ — JSON: в кэш попадает только то, что _extract_json разбирает
+    json_response: bool = False
+    temperature: float = 0.7
+
     def __init__(self, model: str = "gpt-5.4", max_retries: int = 3) -> None:
         self.model = model
         self.max_retries = max_retries
-        self.client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_BASE_URL,  # None → дефолтный api.openai.com
-        )
+        self._client: AsyncOpenAI | None = None
+        self.cache_enabled = llm_cache.enabled_for(type(self).__name__)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Клиент из общего пула (llm_client), если не задан явно."""
+        return self._client if self._client is not None else get_llm_client()
+
+    @client.setter
+    def client(self, value: AsyncOpenAI) -> None:
+        self._client = value
 
     @abstractmethod
     async def run(self, input_data: dict[str, Any]) -> dict[str, Any]:
         ...
 
+    async def _call_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        on_delta: Callable[[int, int], None] | None = None,
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """Вызов LLM; каждый запрос к модели — с exponential backoff (3 попытки).
+
+        С on_delta ответ читается потоком (stream=True): после каждого
+        фрагмента вызывается on_delta(получено_байт, получено_фрагментов).
+
+        Модель выбирает model_router по роли агента и размеру запроса.  Если для
+        агента настроен каскад (LLM_CASCADE), сначала пробуется быстрая модель;
+        её ответ принимается, только если проходит validate (для JSON-агентов
+        по умолчанию — разбор JSON), иначе запрос повторяется на основной.
+        Без validate агент с ответом не в JSON каскад не использует — проверить
+        ответ быстрой модели нечем.  Прогресс быстрой модели придерживается до
+        решения: при эскалации счётчики не откатываются назад.
+        """
+        agent = self.__class__.__name__
+        model = model_router.route(agent, self.model, len(system_prompt) + len(user_prompt))
+        fast = model_router.cascade_model(agent)
+        if fast and fast != model and (validate is not None or self.json_response):
+            progress: list[tuple[int, int]] = []
+            try:
+                content = await self._complete(
+                    fast, system_prompt, user_prompt, (lambda *p: progress.append(p)) if on_delta else None,
+                )
+            except Exception as exc:
+                logger.info("[%s] Cascade: %s failed (%s), escalating to %s", agent, fast, exc, model)
+            else:
+                if self._output_ok(content, validate):
+                    logger.info("[%s] Cascade: accepted %s output", agent, fast)
+                    if on_delta is not None and progress:
+                        on_delta(*progress[-1])
+                    return content
+                logger.info("[%s] Cascade: %s output rejected, escalating to %s", agent, fast, model)
+        return await self._complete(model, system_prompt, user_prompt, on_delta)
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), reraise=True)
-    async def _call_llm(self, system_prompt: str, user_prompt: str) -> str:
-        """Вызов LLM с exponential backoff (3 попытки)."""
+    async def _complete(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        on_delta: Callable[[int, int], None] | None = None,
+    ) -> str:
+        """Один запрос к модели: кэш, TPM-бюджет, обычный или потоковый ответ."""
         logger.debug("[%s] Sending to LLM (model=%s):\n--- SYSTEM ---\n%s\n--- USER ---\n%s",
-                     self.__class__.__name__, self.model, system_prompt.strip(), user_prompt[:500])
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.7,
+                     self.__class__.__name__, model, system_prompt.strip(), user_prompt[:500])
+        cache_key = None
+        if self.cache_enabled:
+            cache_key = llm_cache.make_key(model, self.temperature, system_prompt, user_prompt)
+            cached = await llm_cache.lookup(cache_key)
+            if cached is not None:
+                logger.info("[%s] LLM response served from cache", self.__class__.__name__)
+                return cached
+
+        budget = get_token_budget()
+        # ~4 символа на токен — грубая оценка, до ответа точнее не узнать
+        reservation = await budget.acquire(
+            (len(system_prompt) + len(user_prompt)) // 4 + self.expected_output_tokens
         )
-        content = response.choices[0].message.content
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        if on_delta is None:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+            )
+            usage = getattr(response, "usage", None)
+            content = response.choices[0].message.content
+        else:
+            content, usage = await self._stream_completion(model, messages, on_delta)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if isinstance(total_tokens, int):
+            budget.settle(reservation, total_tokens)
+        tokens = record_usage(usage)
+        if tokens is not None:
+            logger.info(
+                "[%s] LLM usage (model=%s): prompt %d tokens, %d cached",
+                self.__class__.__name__, model, *tokens,
+            )
         if content is None:
             raise ValueError("LLM returned empty content")
-        logger.info("[%s] LLM raw response:\n%s", self.__class__.__name__, content)
+        logger.info("[%s] LLM raw response (model=%s):\n%s", self.__class__.__name__, model, content)
+        if cache_key is not None and self._is_cacheable(content):
+            await llm_cache.store(cache_key, content)
         return content
 
+    async def _stream_completion(
+        self, model: str, messages: list[dict[str, str]], on_delta: Callable[[int, int], None],
+    ) -> tuple[str | None, Any]:
+        """Читает ответ потоком; возвращает текст и usage из финального чанка."""
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts: list[str] = []
+        received = 0
+        usage = None
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                text = choice.delta.content
+                if text:
+                    parts.append(text)
+                    received += len(text.encode("utf-8"))
+                    on_delta(received, len(parts))
+        return ("".join(parts) or None), usage
+
+    def _output_ok(self, content: str, validate: Callable[[str], bool] | None) -> bool:
+        """Проверка ответа быстрой модели в каскаде."""
+        if validate is not None:
+            return validate(content)
+        return self._is_cacheable(content)
+
+    def _is_cacheable(self, content: str) -> bool:
+        """Битый JSON в кэше повторялся бы на каждом вызове — такие ответы не сохраняем."""
+        if not self.json_response:
+            return True
+        try:
+            self._extract_json(content)
+        except ValueError:
+            return False
+        return True
+
     @staticmethod
     def _extract_json(text: str) -> dict[str, Any]:
         """Вытаскивает JSON из ответа LLM — работает и с markdown-блоком, и с голым JSON."""
@@ -2,14 +2,24 @@
 from __future__ import annotations
 
 import json
-from typing import Any
+import re
+from typing import Any, Callable
 
 from app.agents.base import BaseAgent
+from app.services.astro_validator import validate_file
+
+_FRONTMATTER_RE = re.compile(r"^\s*---\s*\n(.*?)\n---", re.S)
+_PROPS_TYPE_RE = re.compile(r"(?:export\s+)?(?:interface\s+Props\b.*?\n\}|type\s+Props\s*=.*?\n\};?)", re.S)
+_PROPS_DESTRUCTURE_RE = re.compile(r"const\s*(\{.*?\})\s*=\s*Astro\.props", re.S)
+_SLOT_RE = re.compile(r"<slot\b([^>]*)>")
+_SLOT_NAME_RE = re.compile(r"""\bname\s*=\s*["']([^"']+)["']""")
 
 
 class CodeGeneratorAgent(BaseAgent):
     """A2: генерирует код файла по спецификации от ArchitectAgent."""
 
+    expected_output_tokens = 4096
+
     SYSTEM_PROMPT = """Ты — разработчик Astro-сайтов.
 Напиши код файла по заданной спецификации. Используй Astro, TypeScript, Tailwind CSS.
 Выведи ТОЛЬКО код файла без пояснений.
@@ -28,15 +38,74 @@ class CodeGeneratorAgent(BaseAgent):
 - Галереи и карточки — только статичная HTML-сетка через Tailwind grid/flex, без JS
 - Весь интерактив (если нужен) — только через CSS (hover:, focus: классы Tailwind)"""
 
-    async def run(self, input_data: dict[str, Any]) -> dict[str, Any]:
-        """input_data: {"file": {...}, "project_spec": {...}}. Возвращает {"path": str, "content": str}."""
+    @staticmethod
+    def extract_interface(path: str, content: str) -> str:
+        """Краткий интерфейс сгенерированного файла: Props, Astro.props и слоты.
+
+        Передаётся файлам, которые его импортируют, вместо полного кода —
+        чтобы импорт и атрибуты совпадали с тем, что реально сгенерировано.
+        """
+        lines = [path]
+        frontmatter = _FRONTMATTER_RE.match(content)
+        if frontmatter:
+            props_type = _PROPS_TYPE_RE.search(frontmatter.group(1))
+            if props_type:
+                lines.append(f"Props: {props_type.group(0).strip()}")
+            destructure = _PROPS_DESTRUCTURE_RE.search(frontmatter.group(1))
+            if destructure:
+                lines.append(f"Astro.props: {' '.join(destructure.group(1).split())}")
+        if len(lines) == 1:
+            lines.append("Props: нет")
+        slots = []
+        for attrs in _SLOT_RE.findall(content):
+            name = _SLOT_NAME_RE.search(attrs)
+            slot = name.group(1) if name else "default"
+            if slot not in slots:
+                slots.append(slot)
+        lines.append(f"Слоты: {', '.join(slots) if slots else 'нет'}")
+        return "\n".join(lines)
+
+    async def run(
+        self, input_data: dict[str, Any], *, on_progress: Callable[[int, int], None] | None = None,
+    ) -> dict[str, Any]:
+        """input_data: {"file": {...}, "project_spec": {...}, "dependencies": {path: interface}}.
+
+        dependencies (необязательно) — интерфейсы уже сгенерированных файлов,
+        от которых зависит текущий.
+        problems и previous (необязательно) — замечания astro_validator к прошлой
+        версии файла и сама эта версия.
+        on_progress(байт, фрагментов) — потоковый режим: вызывается по мере
+        получения ответа.
+        Возвращает {"path": str, "content": str}.
+        """
         file_spec = input_data["file"]
         project_spec = input_data.get("project_spec", {})
+        dependencies: dict[str, str] = input_data.get("dependencies") or {}
 
-        user_prompt = (
-            f"Файл для генерации: {json.dumps(file_spec, ensure_ascii=False)}\n"
-            f"Контекст проекта: {json.dumps(project_spec, ensure_ascii=False, indent=2)}"
-        )
+        # Общий для всех файлов проекта контекст идёт первым, файл — в конце:
+        # одинаковое начало запроса провайдер берёт из своего кэша префиксов
+        user_prompt = f"Контекст проекта: {json.dumps(project_spec, ensure_ascii=False, indent=2)}"
+        if dependencies:
+            user_prompt += (
+                "\n\nЗависимости уже сгенерированы — импортируй их по этим путям и передавай "
+                "ровно эти props и слоты:\n\n" + "\n\n".join(dependencies.values())
+            )
+        user_prompt += f"\n\nФайл для генерации: {json.dumps(file_spec, ensure_ascii=False)}"
 
-        content = await self._call_llm(self.SYSTEM_PROMPT, user_prompt)
+        problems: list[str] = input_data.get("problems") or []
+        if problems:
+            user_prompt += (
+                "\n\nПредыдущая версия файла не прошла проверку перед сборкой:\n"
+                + "\n".join(f"- {problem}" for problem in problems)
+                + f"\n\nПредыдущая версия:\n```\n{input_data.get('previous', '')}\n```\n"
+                "Верни исправленный файл целиком."
+            )
+
+        # в каскаде ответ быстрой модели принимается, только если он проходит astro_validator
+        content = await self._call_llm(
+            self.SYSTEM_PROMPT,
+            user_prompt,
+            on_delta=on_progress,
+            validate=lambda code: not validate_file(file_spec["path"], code, None),
+        )
         return {"path": file_spec["path"], "content": content}
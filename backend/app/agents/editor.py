@@ -1,9 +1,15 @@
 """A4 EditorAgent: редактирует один файл по prompt пользователя, возвращает полный код."""
 from __future__ import annotations
 
+import logging
 from typing import Any
 
 from app.agents.base import BaseAgent
+from app.core.config import settings
+from app.services.astro_validator import validate_file
+from app.services.code_patch import PatchError, apply_search_replace, parse_search_replace
+
+logger = logging.getLogger(__name__)
 
 
 class EditorAgent(BaseAgent):
@@ -15,6 +21,26 @@ class EditorAgent(BaseAgent):
 без тегов вроде ```astro или ```typescript. Только сам код.
 Сохраняй все части файла, которые не затронуты правкой.
 
+Важно: если указан data-editable-id — найди в исходнике элемент с этим атрибутом
+(атрибут data-editable-id="<id>") и измени именно его, не трогая остальные элементы.
+Все атрибуты data-editable-id и data-editable-file ОБЯЗАТЕЛЬНО сохраняй без изменений."""
+
+    PATCH_SYSTEM_PROMPT = """\
+Ты — разработчик Astro-сайтов. Тебе дают текущий код файла и задачу по его изменению.
+Не переписывай файл целиком — верни только правки в виде блоков:
+
+<<<<<<< SEARCH
+точные строки из текущего файла
+=======
+новые строки
+>>>>>>> REPLACE
+
+Правила:
+- SEARCH копирует строки файла символ в символ и встречается в файле ровно один раз;
+  бери несколько строк вокруг изменения, для элемента — строку с его data-editable-id.
+- Блоков может быть несколько, они не пересекаются. Пустой REPLACE — удаление.
+- Никаких объяснений и markdown-обёртки — только блоки.
+
 Важно: если указан data-editable-id — найди в исходнике элемент с этим атрибутом
 (атрибут data-editable-id="<id>") и измени именно его, не трогая остальные элементы.
 Все атрибуты data-editable-id и data-editable-file ОБЯЗАТЕЛЬНО сохраняй без изменений."""
@@ -42,36 +68,118 @@ class EditorAgent(BaseAgent):
         prompt: str,
         project_context: str = "",
         element_html: str = "",
+        *,
+        fragment_of: str = "",
+        element_tag: str = "",
+        file_path: str = "",
     ) -> str:
         """Редактирует файл и возвращает полный обновлённый код.
 
+        В режиме EDITOR_EDIT_MODE="patch" модель отвечает SEARCH/REPLACE блоками,
+        которые применяются к current_code здесь; если патч не разобран или
+        не применяется — повтор в полном режиме (модель возвращает весь файл).
+
         Args:
             current_code: текущее содержимое файла
             element_id: data-editable-id выбранного элемента
             prompt: задача от пользователя
             project_context: краткое описание проекта (необязательно)
             element_html: outerHTML выбранного элемента из dist/ (контекст для AI)
+            fragment_of: путь файла, если current_code — лишь фрагмент вокруг
+                элемента (element_locator); тогда возвращается обновлённый фрагмент
+            element_tag: открывающий тег элемента в исходнике — в исходнике
+                data-editable-id ещё нет, по тегу модель находит элемент
+            file_path: путь файла — по нему astro_validator проверяет ответ
+                быстрой модели в каскаде (LLM_CASCADE)
         """
         element_ctx = ""
         if element_id:
             element_ctx = f"Целевой элемент (data-editable-id=\"{element_id}\"):\n"
             if element_html:
                 element_ctx += f"```html\n{element_html}\n```\n"
+            if element_tag:
+                element_ctx += f"Открывающий тег в исходнике: `{element_tag}`\n"
             element_ctx += "\n"
 
+        file_header = "Файл:"
+        if fragment_of:
+            file_header = (
+                f"Ниже не весь файл {fragment_of}, а фрагмент вокруг целевого элемента. "
+                "Под «файлом» понимай этот фрагмент: остальной код файла не меняется."
+            )
+
+        # Контекст проекта и файл — общее начало запросов к одному файлу (кэш
+        # префиксов провайдера), элемент и задача — в конце
         user_prompt = (
+            f"{'Контекст проекта: ' + project_context + chr(10) + chr(10) if project_context else ''}"
+            f"{file_header}\n```\n{current_code}\n```\n\n"
             f"{element_ctx}"
+            f"Задача: {prompt}"
+        )
+        return await self._edit_code(current_code, user_prompt, fragment_of or file_path)
+
+    async def edit_many(
+        self,
+        current_code: str,
+        edits: list[dict[str, str]],
+        project_context: str = "",
+        *,
+        file_path: str = "",
+    ) -> str:
+        """Несколько правок разных элементов одного файла за один вызов LLM.
+
+        Args:
+            current_code: текущее содержимое файла
+            edits: [{"element_id", "prompt", "element_html"?, "element_tag"?}]
+            project_context: краткое описание проекта (необязательно)
+            file_path: путь файла (для проверки ответа в каскаде, см. edit())
+        """
+        tasks = []
+        for number, item in enumerate(edits, 1):
+            task = f"{number}. Элемент data-editable-id=\"{item['element_id']}\""
+            if item.get("element_tag"):
+                task += f", открывающий тег в исходнике: `{item['element_tag']}`"
+            task += "\n"
+            if item.get("element_html"):
+                task += f"```html\n{item['element_html']}\n```\n"
+            task += f"Задача: {item['prompt']}\n"
+            tasks.append(task)
+
+        user_prompt = (
             f"{'Контекст проекта: ' + project_context + chr(10) + chr(10) if project_context else ''}"
             f"Файл:\n```\n{current_code}\n```\n\n"
-            f"Задача: {prompt}"
+            f"Выполни все правки ниже, каждую — только в своём элементе:\n\n"
+            + "\n".join(tasks)
+        )
+        return await self._edit_code(current_code, user_prompt, file_path)
+
+    async def _edit_code(self, current_code: str, user_prompt: str, file_path: str) -> str:
+        """Патч (EDITOR_EDIT_MODE="patch") с откатом на полный файл."""
+        if settings.EDITOR_EDIT_MODE == "patch":
+            response = await self._call_llm(
+                self.PATCH_SYSTEM_PROMPT, user_prompt, validate=lambda r: _patch_applies(current_code, r),
+            )
+            try:
+                code = apply_search_replace(current_code, parse_search_replace(response))
+            except PatchError as exc:
+                logger.info("Patch not applied (%s), falling back to full-file edit", exc)
+            else:
+                logger.info(
+                    "Patch applied: %d response chars for %d-char file",
+                    len(response), len(current_code),
+                )
+                return code
+        return await self._call_llm(
+            self.SYSTEM_PROMPT, user_prompt, validate=lambda code: _code_ok(file_path, current_code, code),
         )
-        return await self._call_llm(self.SYSTEM_PROMPT, user_prompt)
 
     async def fix_build_error(
         self,
         edited_code: str,
         stderr: str,
         prompt: str,
+        *,
+        file_path: str = "",
     ) -> str:
         """Повторная правка файла с учётом ошибки сборки.
 
@@ -79,10 +187,36 @@ class EditorAgent(BaseAgent):
             edited_code: код после предыдущего вызова edit()
             stderr: вывод ошибки сборки
             prompt: исходная задача пользователя
+            file_path: путь файла (для проверки ответа в каскаде, см. edit())
         """
         user_prompt = (
             f"Код файла:\n```\n{edited_code}\n```\n\n"
             f"Ошибка сборки:\n```\n{stderr}\n```\n\n"
             f"Исходная задача: {prompt}"
         )
-        return await self._call_llm(self.FIX_SYSTEM_PROMPT, user_prompt)
+        return await self._call_llm(
+            self.FIX_SYSTEM_PROMPT, user_prompt, validate=lambda code: _code_ok(file_path, edited_code, code),
+        )
+
+
+def _patch_applies(code: str, response: str) -> bool:
+    """Проверка ответа быстрой модели в каскаде: патч разбирается и применяется."""
+    try:
+        apply_search_replace(code, parse_search_replace(response))
+    except PatchError:
+        return False
+    return True
+
+
+def _code_ok(file_path: str, original: str, code: str) -> bool:
+    """Проверка полного файла от быстрой модели в каскаде.
+
+    Код не пустой и не добавляет проблем astro_validator, которых не было
+    в original; без file_path проверяется только непустота.
+    """
+    if not code.strip():
+        return False
+    if not file_path:
+        return True
+    before = set(validate_file(file_path, original, None))
+    return all(problem in before for problem in validate_file(file_path, code, None))
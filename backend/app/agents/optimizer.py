@@ -9,6 +9,8 @@ from app.agents.base import BaseAgent
 class OptimizerAgent(BaseAgent):
     """A0: из сырого ТЗ делает структурированный JSON — pages, components, стиль и т.д."""
 
+    json_response = True
+
     SYSTEM_PROMPT = """Ты — аналитик требований для генератора Astro-сайтов.
 Преобразуй текстовое ТЗ пользователя в структурированный JSON.
 
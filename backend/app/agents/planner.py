@@ -17,6 +17,8 @@ logger = logging.getLogger(__name__)
 class PlannerAgent(BaseAgent):
     """Возвращает {file_path: instruction} — только для файлов, которые надо менять."""
 
+    json_response = True
+
     SYSTEM_PROMPT = """\
 Ты — планировщик редактирования Astro-сайта.
 Тебе дают список исходных файлов проекта и задачу пользователя.
@@ -1,13 +1,14 @@
 """Assets API: загрузка, список и удаление ассетов проекта из бакета astro-assets."""
 from __future__ import annotations
 
-from typing import List
+from typing import Annotated, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, HTTPException, Query, Response, UploadFile, File, status
 from sqlalchemy import select
 
 from app.core.dependencies import CurrentUser, DbSession
+from app.core.pagination import decode_cursor, finish_page, page_limit
 from app.db.models.asset import Asset as AssetModel
 from app.db.models.project import Project as ProjectModel
 from app.schemas.asset import Asset
@@ -82,15 +83,30 @@ async def list_assets(
     project_id: UUID,
     user: CurrentUser,
     session: DbSession,
+    response: Response,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    cursor: Optional[str] = None,
 ) -> List[AssetModel]:
-    """Возвращает все ассеты проекта (проект должен принадлежать текущему пользователю)."""
+    """Возвращает ассеты проекта (проект должен принадлежать текущему пользователю).
+
+    С limit/cursor — страница keyset-пагинации по id (у ассетов нет created_at),
+    курсор следующей страницы приходит в заголовке X-Next-Cursor.
+    """
     user_id = UUID(user["internal_user_id"])
     await _get_owned_project(session, project_id, user_id)
 
-    result = await session.execute(
-        select(AssetModel).where(AssetModel.project_id == project_id)
+    page_size = page_limit(limit, cursor)
+    query = (
+        select(AssetModel)
+        .where(AssetModel.project_id == project_id)
+        .order_by(AssetModel.id)
     )
-    return list(result.scalars().all())
+    if cursor is not None:
+        query = query.where(AssetModel.id > decode_cursor(cursor, id=UUID)["id"])
+    if page_size is not None:
+        query = query.limit(page_size + 1)
+    result = await session.execute(query)
+    return finish_page(result.scalars().all(), page_size, response, lambda asset: {"id": asset.id})
 
 
 # ---------------------------------------------------------------------------
@@ -9,14 +9,53 @@ from fastapi import APIRouter, HTTPException, status
 from app.core.dependencies import CurrentUser, DbSession, RedisClient
 from app.repositories import project as project_repo
 from app.repositories import snapshot as snapshot_repo
-from app.schemas.editor import EditElementRequest, EditElementResponse, UpdateFileRequest
+from app.schemas.editor import (
+    BatchEditRequest,
+    BatchEditResponse,
+    EditElementRequest,
+    EditElementResponse,
+    UpdateFileRequest,
+)
+from app.services.element_ops import ElementOpError, apply_operation
 from app.services.storage import StorageService
 from app.workers.tasks.build import run_build as run_build_task
+from app.workers.tasks.edit import edit_batch as edit_batch_task
 from app.workers.tasks.edit import edit_element as edit_element_task
 
 router = APIRouter(prefix="/editor", tags=["editor"])
 
 
+async def _save_file_version(
+    db: DbSession,
+    storage: StorageService,
+    user_id: str,
+    project_id: str,
+    file_path: str,
+    content: bytes,
+    description: str,
+) -> int:
+    """Пишет файл в src/, создаёт снапшот новой версии и делает её активной.
+
+    Весь I/O MinIO — до allocate_version: она блокирует строку проекта до
+    commit, поэтому allocate/create/set_active/commit идут подряд.
+    """
+    minio_path = f"projects/{user_id}/{project_id}/src/{file_path.lstrip('/')}"
+    await storage.save_file("projects", minio_path, content)
+    content_hash = await storage.save_blob(user_id, project_id, content)
+
+    new_version = await snapshot_repo.allocate_version(db, UUID(project_id))
+    await snapshot_repo.create(
+        db,
+        project_id=UUID(project_id),
+        version=new_version,
+        files={file_path.lstrip("/"): snapshot_repo.FileVersion(content_hash, len(content))},
+        description=description,
+    )
+    await project_repo.set_active_snapshot_version(db, UUID(project_id), new_version)
+    await db.commit()
+    return new_version
+
+
 @router.get("/files")
 async def list_project_files(
     project_id: str,
@@ -47,9 +86,19 @@ async def edit_element(
 
     Возвращает 202 Accepted немедленно; прогресс читается из
     Redis generation:{project_id}:status (те же SSE что у генерации).
+
+    Если задан operation (текст, атрибут, классы) — правка применяется прямо
+    к исходнику без LLM и Celery: снапшот пишется здесь же, в очередь сразу
+    уходит сборка (status="building").  Неприменимая операция уходит в A4,
+    если есть instruction, иначе — 422.
     """
     user_id: str = user["internal_user_id"]
 
+    if body.operation is not None:
+        response = await _apply_element_operation(body, db, redis, user_id)
+        if response is not None:
+            return response
+
     redis_key = f"generation:{body.project_id}:status"
     await redis.set(
         redis_key,
@@ -76,6 +125,101 @@ async def edit_element(
     )
 
 
+@router.post("/edit/batch", response_model=BatchEditResponse, status_code=status.HTTP_202_ACCEPTED)
+async def edit_batch(
+    body: BatchEditRequest,
+    redis: RedisClient,
+    user: CurrentUser,
+) -> BatchEditResponse:
+    """Несколько правок элементов (возможно, в разных файлах) одной задачей.
+
+    Правки группируются по файлам: на файл — не больше одного вызова A4,
+    все изменения попадают в одну версию снапшота и одну сборку.
+    """
+    user_id: str = user["internal_user_id"]
+
+    await redis.set(
+        f"generation:{body.project_id}:status",
+        json.dumps({"stage": "queued", "progress": 0}),
+        ex=86400,
+    )
+
+    edits = [
+        {
+            "file_path": item.element.file_path,
+            "element_id": item.element.editable_id,
+            "element_html": item.element.element_html,
+            "instruction": item.instruction,
+            "operation": item.operation.model_dump() if item.operation else None,
+        }
+        for item in body.edits
+    ]
+    task = edit_batch_task.delay(
+        project_id=body.project_id,
+        user_id=user_id,
+        edits=edits,
+        ai_model=body.ai_model,
+        project_context="",
+    )
+
+    return BatchEditResponse(
+        task_id=str(task.id),
+        project_id=body.project_id,
+        file_paths=list(dict.fromkeys(e["file_path"] for e in edits)),
+        status="queued",
+    )
+
+
+async def _apply_element_operation(
+    body: EditElementRequest,
+    db: DbSession,
+    redis: RedisClient,
+    user_id: str,
+) -> EditElementResponse | None:
+    """Быстрый путь POST /editor/edit; None — операцию нужно отдать A4."""
+    op = body.operation
+    file_path = body.element.file_path
+    storage = StorageService()
+    minio_path = f"projects/{user_id}/{body.project_id}/src/{file_path.lstrip('/')}"
+    try:
+        raw = await storage.get_file("projects", minio_path)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if raw is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    try:
+        new_code = apply_operation(
+            raw.decode("utf-8"),
+            file_path,
+            body.element.editable_id,
+            op.type,
+            op.value,
+            name=op.name,
+        )
+    except ElementOpError as e:
+        if body.instruction.strip():
+            return None
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    await _save_file_version(
+        db, storage, user_id, body.project_id, file_path, new_code.encode("utf-8"),
+        description=f"Edit: {op.type} {op.name or ''}".rstrip(),
+    )
+    await redis.set(
+        f"generation:{body.project_id}:status",
+        json.dumps({"stage": "building", "progress": 70}),
+        ex=86400,
+    )
+    task = run_build_task.delay(body.project_id, user_id)
+    return EditElementResponse(
+        task_id=str(task.id),
+        project_id=body.project_id,
+        file_path=file_path,
+        status="building",
+    )
+
+
 @router.get("/file")
 async def get_file_code(
     project_id: str,
@@ -124,27 +268,9 @@ async def update_file_code(
 ) -> dict:
     """Ручное обновление файла (без AI). Сохраняет новое содержимое, затем создаёт снапшот новой версии."""
     user_id: str = user["internal_user_id"]
-    storage = StorageService()
-    minio_path = f"projects/{user_id}/{body.project_id}/src/{body.file_path.lstrip('/')}"
-
-    new_content = body.content.encode("utf-8")
-    await storage.save_file("projects", minio_path, new_content)
-
-    latest_version = await snapshot_repo.get_latest_version(db, UUID(body.project_id))
-    new_version = latest_version + 1
-    snapshot_path = (
-        f"projects/{user_id}/{body.project_id}/snapshots/v{new_version}"
-        f"/{body.file_path.lstrip('/')}"
-    )
-    await storage.save_file("projects", snapshot_path, new_content)
-    await snapshot_repo.create(
-        db,
-        project_id=UUID(body.project_id),
-        version=new_version,
-        minio_path=snapshot_path,
-        description="Manual file update",
+    await _save_file_version(
+        db, StorageService(), user_id, body.project_id, body.file_path,
+        body.content.encode("utf-8"), description="Manual file update",
     )
-    await project_repo.set_active_snapshot_version(db, UUID(body.project_id), new_version)
-    await db.commit()
 
     return {"project_id": body.project_id, "file_path": body.file_path, "status": "saved"}
@@ -1,19 +1,21 @@
 """Projects API: список, получение, сохранение (000→уникальный), экспорт zip, удаление."""
 from __future__ import annotations
 
-import io
+import asyncio
 import urllib.parse
-import zipfile
-from typing import List, Optional
+from collections import deque
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Iterable, List, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import delete, select
+from sqlalchemy import delete, select, tuple_
 
 from app.core.config import settings
 from app.core.dependencies import CurrentUser, DbSession
+from app.core.pagination import decode_cursor, finish_page, page_limit
 from app.db.models.asset import Asset as AssetModel
 from app.db.models.deployment import Deployment as DeploymentModel
 from app.db.models.project import Project as ProjectModel
@@ -21,6 +23,8 @@ from app.db.models.snapshot import Snapshot as SnapshotModel
 from app.db.models.template import Template as TemplateModel
 from app.schemas.project import Project, ProjectCreate, ProjectPreview, ProjectUpdate
 from app.services.storage import StorageService
+from app.services.zip_stream import stream_zip
+from app.workers.tasks.storage import delete_prefix as delete_prefix_task
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -33,15 +37,36 @@ router = APIRouter(prefix="/projects", tags=["projects"])
 async def list_projects(
     user: CurrentUser,
     session: DbSession,
+    response: Response,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    cursor: Optional[str] = None,
 ) -> List[ProjectModel]:
-    """Возвращает все проекты текущего пользователя, от новых к старым."""
+    """Возвращает проекты текущего пользователя, от новых к старым.
+
+    С limit/cursor — страница keyset-пагинации по (created_at, id),
+    курсор следующей страницы приходит в заголовке X-Next-Cursor.
+    """
     user_id = UUID(user["internal_user_id"])
-    result = await session.execute(
+    page_size = page_limit(limit, cursor)
+    query = (
         select(ProjectModel)
         .where(ProjectModel.user_id == user_id)
-        .order_by(ProjectModel.created_at.desc())
+        .order_by(ProjectModel.created_at.desc(), ProjectModel.id.desc())
+    )
+    if cursor is not None:
+        after = decode_cursor(cursor, created_at=datetime.fromisoformat, id=UUID)
+        query = query.where(
+            tuple_(ProjectModel.created_at, ProjectModel.id) < tuple_(after["created_at"], after["id"])
+        )
+    if page_size is not None:
+        query = query.limit(page_size + 1)
+    result = await session.execute(query)
+    return finish_page(
+        result.scalars().all(),
+        page_size,
+        response,
+        lambda project: {"created_at": project.created_at.isoformat(), "id": project.id},
     )
-    return list(result.scalars().all())
 
 
 # ---------------------------------------------------------------------------
@@ -190,6 +215,8 @@ async def save_project(
 ) -> ProjectModel:
     """Переносит файлы проекта из временного слота ``000`` в ``{project_id}`` в MinIO.
 
+    Перенос — параллельное серверное копирование + пакетное удаление слота ``000``.
+
     Обновляет ``s3_path`` в БД — дальнейшие операции используют постоянный путь.
     Идемпотентно — если проект уже сохранён (s3_path != 000), просто возвращает его.
     """
@@ -202,8 +229,7 @@ async def save_project(
     if project.s3_path == tmp_path:
         storage = StorageService()
         try:
-            await storage.copy_directory("projects", tmp_path, permanent_path)
-            await storage.delete_directory("projects", tmp_path + "/")
+            await storage.copy_directory("projects", tmp_path, permanent_path, move=True)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -227,7 +253,12 @@ async def export_project(
     user: CurrentUser,
     session: DbSession,
 ) -> StreamingResponse:
-    """Стримит ZIP-архив: src/ (исходники) + build/ (готовый сайт)."""
+    """Стримит ZIP-архив: src/ (исходники) + build/ (готовый сайт).
+
+    Архив пишется на лету: каждый файл попадает в ответ сразу после загрузки
+    из MinIO, следующие EXPORT_PREFETCH файлов качаются параллельно. Память
+    на запрос ограничена окном prefetch, а не размером проекта.
+    """
     user_id = UUID(user["internal_user_id"])
     project = await _get_owned_project(session, project_id, user_id)
 
@@ -249,24 +280,17 @@ async def export_project(
             detail="No files found for this project",
         )
 
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for path in all_paths:
-            if path.endswith("/"):
-                continue
-            try:
-                data = await storage.get_file("projects", path)
-                if data is not None:
-                    arc_name = path[len(base_path):].lstrip("/")
-                    zf.writestr(arc_name, data)
-            except Exception:
-                pass
+    # маркеры директорий не нужны; dict.fromkeys убирает дубли, сохраняя порядок
+    file_paths = list(dict.fromkeys(p for p in all_paths if not p.endswith("/")))
+
+    async def _entries() -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+        async for path, data in _prefetch_files(storage, file_paths, settings.EXPORT_PREFETCH):
+            yield path[len(base_path):].lstrip("/"), data
 
-    buf.seek(0)
     filename = f"{project.name or str(project_id)}.zip"
     filename_encoded = urllib.parse.quote(filename, safe="")
     return StreamingResponse(
-        buf,
+        stream_zip(_entries()),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"},
     )
@@ -316,13 +340,22 @@ async def delete_project(
     user: CurrentUser,
     session: DbSession,
 ) -> Response:
-    """Удаляет проект из PostgreSQL и удаляет все его файлы из MinIO."""
+    """Удаляет проект из PostgreSQL и удаляет все его файлы из MinIO.
+
+    Файлы удаляются пакетами (S3 Multi-Object Delete). Если объектов больше
+    STORAGE_BACKGROUND_DELETE_THRESHOLD — удаление ставится в Celery, ответ 204 сразу.
+    """
     user_id = UUID(user["internal_user_id"])
     project = await _get_owned_project(session, project_id, user_id)
 
     storage = StorageService()
+    prefix = project.s3_path + "/"
     try:
-        await storage.delete_directory("projects", project.s3_path + "/")
+        object_names = await storage.list_files("projects", prefix)
+        if len(object_names) > settings.STORAGE_BACKGROUND_DELETE_THRESHOLD:
+            delete_prefix_task.delay("projects", prefix)
+        else:
+            await storage.delete_objects("projects", object_names)
     except Exception:
         pass  # best-effort: удаляем из БД даже если MinIO вернул ошибку
 
@@ -351,3 +384,36 @@ async def _get_owned_project(session, project_id: UUID, user_id: UUID) -> Projec
     if project is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     return project
+
+
+async def _prefetch_files(
+    storage: StorageService, paths: Iterable[str], prefetch: int
+) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    """Отдаёт (путь, содержимое) по порядку, скачивая до prefetch файлов наперёд.
+
+    В памяти одновременно не больше prefetch файлов. Нечитаемый файл
+    отдаётся с содержимым None (в архив не попадает).
+    """
+    remaining = iter(paths)
+    pending: deque = deque()
+
+    def _schedule() -> None:
+        path = next(remaining, None)
+        if path is not None:
+            pending.append((path, asyncio.ensure_future(storage.get_file("projects", path))))
+
+    for _ in range(max(prefetch, 1)):
+        _schedule()
+    try:
+        while pending:
+            path, future = pending.popleft()
+            try:
+                data: Optional[bytes] = await future
+            except Exception:
+                data = None
+            _schedule()
+            yield path, data
+    finally:
+        # клиент оборвал загрузку — не оставляем висящих запросов в MinIO
+        for _, future in pending:
+            future.cancel()
@@ -1,13 +1,16 @@
 """Snapshots API: список снапшотов проекта и восстановление версии файла."""
 from __future__ import annotations
 
+import asyncio
 import json
+from typing import Annotated, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from sqlalchemy import select
 
 from app.core.dependencies import CurrentUser, DbSession, RedisClient
+from app.core.pagination import decode_cursor, finish_page, page_limit
 from app.db.models.project import Project as ProjectModel
 from app.db.models.snapshot import Snapshot as SnapshotModel
 from app.repositories import project as project_repo
@@ -23,11 +26,26 @@ async def list_snapshots(
     project_id: UUID,
     user: CurrentUser,
     db: DbSession,
+    response: Response,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    cursor: Optional[str] = None,
 ) -> list[SnapshotModel]:
-    """Все снапшоты проекта, от новых к старым."""
+    """Снапшоты проекта, от новых к старым.
+
+    С limit/cursor — страница keyset-пагинации по version,
+    курсор следующей страницы приходит в заголовке X-Next-Cursor.
+    """
     user_id = UUID(user["internal_user_id"])
     await _get_owned_project(db, project_id, user_id)
-    return await snapshot_repo.list_by_project(db, project_id)
+    page_size = page_limit(limit, cursor)
+    before_version = decode_cursor(cursor, version=int)["version"] if cursor is not None else None
+    snapshots = await snapshot_repo.list_by_project(
+        db,
+        project_id,
+        limit=page_size + 1 if page_size is not None else None,
+        before_version=before_version,
+    )
+    return finish_page(snapshots, page_size, response, lambda snap: {"version": snap.version})
 
 
 @router.post("/{snapshot_id}/restore", response_model=RestoreResponse)
@@ -39,13 +57,13 @@ async def restore_snapshot(
 ) -> RestoreResponse:
     """Восстанавливает ПОЛНОЕ состояние проекта на момент версии target и запускает пересборку.
 
-    Для каждого файла, который существовал в версии <= target, берётся
-    его состояние из ближайшего снапшота <= target.  Это гарантирует, что
-    файлы, изменённые в более поздних версиях (например, all-files правка),
-    тоже будут корректно откачены.
-
-    minio_path снапшота имеет вид:
-        projects/{user_id}/{project_id}/snapshots/v{version}/{file_path}
+    Состав файлов берётся из манифеста версии (snapshot_files) одним запросом —
+    время восстановления не зависит от длины истории правок.  Содержимое
+    читается из content-addressed blob'а, у старых записей — из legacy_path.
+    Файл не перезаписывается, только если его хэш совпадает с активной
+    версией И с хэшем, который save_file записал в метаданные объекта в src/:
+    писатели меняют src/ до commit снапшота, и после сбоя между ними src/
+    может не совпадать с манифестом активной версии.
     """
     user_id = UUID(user["internal_user_id"])
 
@@ -53,40 +71,55 @@ async def restore_snapshot(
     if snapshot is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
 
-    await _get_owned_project(db, snapshot.project_id, user_id)
+    project = await _get_owned_project(db, snapshot.project_id, user_id)
 
     version = snapshot.version
-    snap_base = f"projects/{user_id}/{snapshot.project_id}/snapshots/"
-
-    # Все снапшоты версий <= target, от новых к старым.
-    # Для каждого файла берём первый встреченный (т.е. с наибольшей версией <= target).
-    all_prior_snapshots = await snapshot_repo.list_up_to_version(db, snapshot.project_id, version)
-
-    # Строим карту: относительный путь файла → снапшот, который надо восстановить.
-    file_to_snap: dict[str, SnapshotModel] = {}
-    for snap in all_prior_snapshots:
-        if not snap.minio_path.startswith(snap_base):
-            continue
-        after_base = snap.minio_path[len(snap_base):]  # "v{n}/{rel_path}"
-        slash = after_base.index("/")
-        rel_path = after_base[slash + 1:]              # "{rel_path}"
-        if rel_path and rel_path not in file_to_snap:
-            file_to_snap[rel_path] = snap
-
-    if not file_to_snap:
+    files = await snapshot_repo.list_files(db, snapshot.id)
+    if not files:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No snapshots found for this version or earlier",
+            detail="No files recorded for this snapshot",
         )
 
+    # Манифест активной версии: совпадающие по хэшу файлы, скорее всего, уже лежат в src/
+    current_hashes: dict[str, str] = {}
+    active_version = project.active_snapshot_version
+    if active_version and active_version != version:
+        current_hashes = {
+            f.rel_path: f.content_hash
+            for f in await snapshot_repo.list_files_at_version(db, snapshot.project_id, active_version)
+            if f.content_hash
+        }
+
     storage = StorageService()
-    first_relative_path = next(iter(file_to_snap))
+    first_relative_path = files[0].rel_path
+    src_prefix = f"projects/{user_id}/{snapshot.project_id}/src/"
+
+    # Кандидаты на пропуск сверяются с фактическим содержимым src/ (HEAD, без чтения)
+    candidates = [
+        file for file in files
+        if file.content_hash and current_hashes.get(file.rel_path) == file.content_hash
+    ]
+    stored_hashes = await asyncio.gather(
+        *(storage.get_content_hash("projects", f"{src_prefix}{file.rel_path}") for file in candidates)
+    )
+    in_sync = {
+        file.rel_path for file, stored in zip(candidates, stored_hashes) if stored == file.content_hash
+    }
 
-    for rel_path, snap in file_to_snap.items():
-        active_path = f"projects/{user_id}/{snap.project_id}/src/{rel_path}"
+    for file in files:
+        if file.rel_path in in_sync:
+            continue
+
+        active_path = f"{src_prefix}{file.rel_path}"
+        source_path = (
+            storage.blob_path(str(user_id), str(snapshot.project_id), file.content_hash)
+            if file.content_hash
+            else file.legacy_path
+        )
 
         try:
-            data = await storage.get_file("projects", snap.minio_path)
+            data = await storage.get_file("projects", source_path)
         except Exception as exc:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
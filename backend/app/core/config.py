@@ -13,6 +13,62 @@ class Settings(BaseSettings):
 
     OPENAI_API_KEY: str
     OPENAI_BASE_URL: str | None = None  # напр. https://api.proxyapi.ru/openai/v1
+    # Общий на event loop пул соединений к LLM (app/services/llm_client.py).
+    # max_connections — потолок параллельных запросов всех агентов к endpoint.
+    LLM_MAX_CONNECTIONS: int = 64
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    # Генерация большого файла идёт минутами — read timeout с запасом
+    LLM_READ_TIMEOUT: float = 600.0
+    # HTTP/2 (нужен пакет h2); без него — HTTP/1.1 keep-alive
+    LLM_HTTP2: bool = True
+    # Сколько живут в Redis метрики LLM процесса (llm:stats:*, GET /api/metrics/llm)
+    LLM_STATS_TTL: int = 24 * 3600
+    # Бюджет токенов в минуту на все LLM-вызовы задачи (0 — без лимита).
+    # Держим ниже TPM-лимита провайдера, чтобы не упираться в 429 и backoff.
+    LLM_TOKENS_PER_MINUTE: int = 200_000
+    # Сколько файлов A2 генерирует одновременно
+    A2_MAX_CONCURRENCY: int = 8
+    # Кэш ответов LLM (app/services/llm_cache.py): имена классов агентов через
+    # запятую, напр. "OptimizerAgent,ArchitectAgent"; "*" — все; пусто — выключен
+    LLM_CACHE_AGENTS: str = ""
+    LLM_CACHE_TTL: int = 7 * 24 * 3600
+    # Лимиты локального LRU процесса и максимальный размер одного ответа
+    LLM_CACHE_MEMORY_ENTRIES: int = 256
+    LLM_CACHE_MEMORY_BYTES: int = 32 * 1024 * 1024
+    LLM_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024
+    # Выбор модели по роли агента (app/services/model_router.py), напр.
+    # "PlannerAgent=gpt-5.4-mini,OptimizerAgent=gpt-5.4-mini,EditorAgent:8000=gpt-5.4-mini";
+    # :N — только для запросов не длиннее N символов; пусто — везде ai_model запроса
+    LLM_MODEL_ROUTES: str = ""
+    # Каскад "Agent=быстрая_модель": сначала быстрая, при невалидном ответе — основная
+    LLM_CASCADE: str = ""
+    # Порядок генерации файлов A2:
+    #   "parallel"     — все файлы сразу (в пределах A2_MAX_CONCURRENCY)
+    #   "dependencies" — по графу dependencies от A1: файл ждёт свои зависимости
+    #                    и получает их props/слоты, независимые ветки параллельно
+    A2_GENERATION_MODE: str = "parallel"
+    # Потоковая генерация A2: прогресс по байтам/токенам каждого файла в статусе
+    # (не чаще GENERATION_PROGRESS_INTERVAL секунд); False — если прокси LLM
+    # не поддерживает stream / stream_options
+    A2_STREAMING: bool = True
+    GENERATION_PROGRESS_INTERVAL: float = 0.5
+    # Сколько живёт чекпоинт незавершённой генерации (A0/A1/файлы A2) в Redis
+    GENERATION_CHECKPOINT_TTL: int = 24 * 3600
+    # Проверка исходников до сборки (app/services/astro_validator.py): после A2
+    # проблемные файлы перегенерируются, после правок — чинятся через A4
+    PREBUILD_VALIDATION: bool = True
+    # Режим правок A4: "patch" — модель возвращает SEARCH/REPLACE блоки
+    # (app/services/code_patch.py), при неприменимом патче — повтор полным файлом;
+    # "full" — всегда полный файл
+    EDITOR_EDIT_MODE: str = "patch"
+    # Правка элемента: в A4 уходит только элемент (найденный по data-editable-id,
+    # app/services/element_locator.py) и EDITOR_CONTEXT_LINES строк вокруг
+    EDITOR_ELEMENT_SCOPE: bool = True
+    EDITOR_CONTEXT_LINES: int = 10
+    # Сколько файлов правка «весь проект» (_edit_all_files) редактирует одновременно
+    EDITOR_MAX_CONCURRENCY: int = 6
 
     # MinIO settings
     MINIO_ENDPOINT: str
@@ -24,6 +80,29 @@ class Settings(BaseSettings):
     # По умолчанию совпадает с MINIO_ENDPOINT, для локальной разработки
     # с minikube нужно указать host.docker.internal:9000
     MINIO_ENDPOINT_K8S: str | None = None
+    # Пул соединений общего Minio-клиента (urllib3). Должен быть не меньше
+    # числа параллельных to_thread-вызовов, иначе лишние соединения не переиспользуются.
+    MINIO_POOL_MAXSIZE: int = 32
+    MINIO_CONNECT_TIMEOUT: float = 5.0
+    MINIO_READ_TIMEOUT: float = 60.0
+    MINIO_REGION: str = "us-east-1"
+    # Бэкенд объектных операций StorageService:
+    #   "minio" — синхронный клиент minio в asyncio.to_thread() (по умолчанию)
+    #   "async" — AsyncS3Client на httpx, без пула потоков
+    STORAGE_BACKEND: str = "minio"
+    STORAGE_ASYNC_MAX_CONNECTIONS: int = 64
+    # Если у удаляемого проекта больше объектов — удаление уходит в Celery
+    # (storage.delete_prefix), и DELETE /projects/{id} отвечает 204 сразу.
+    STORAGE_BACKGROUND_DELETE_THRESHOLD: int = 1000
+    # Сколько copy_object одновременно выполняет StorageService.copy_directory
+    STORAGE_COPY_CONCURRENCY: int = 32
+    # Сколько файлов GET /projects/{id}/export скачивает из MinIO наперёд
+    EXPORT_PREFETCH: int = 8
+
+    # Keyset-пагинация списков: размер страницы, если передан только cursor,
+    # и верхняя граница limit
+    PAGE_DEFAULT_LIMIT: int = 50
+    PAGE_MAX_LIMIT: int = 200
 
     # RabbitMQ settings
     RABBITMQ_URL: str 
@@ -34,6 +113,11 @@ class Settings(BaseSettings):
     # Если True — шаг сборки пропускается, проект сразу помечается "ready".
     # Используется в локальной разработке, когда K8s недоступен.
     BUILD_SKIP: bool = False
+    # Починка упавшей сборки через A4 (EditorAgent.fix_build_error): сколько раз
+    # подряд, сколько файлов из лога за раз и сколько символов ошибки отдавать модели
+    BUILD_REPAIR_MAX_ATTEMPTS: int = 2
+    BUILD_REPAIR_MAX_FILES: int = 3
+    BUILD_REPAIR_LOG_CHARS: int = 4000
     
     # Node.js builder settings
     NODE_VERSION: str 
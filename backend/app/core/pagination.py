@@ -0,0 +1,59 @@
+"""Keyset-пагинация списков (GET /projects/, /snapshots/{project_id}, /assets/).
+
+Страница — limit записей после ключа последней записи предыдущей страницы
+(created_at+id, version или id), без OFFSET.  Курсор следующей страницы —
+непрозрачная base64-строка в заголовке X-Next-Cursor; тело ответа остаётся
+массивом, а без limit и cursor отдаётся полный список, как раньше.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any, Callable, Sequence, TypeVar
+
+from fastapi import HTTPException, Response, status
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+def encode_cursor(key: dict[str, Any]) -> str:
+    raw = json.dumps(key, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, **fields: Callable[[Any], Any]) -> dict[str, Any]:
+    """Разбирает курсор клиента и приводит поля парсерами из fields.
+
+    Битый или чужой курсор — 400, а не 500.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {name: parse(raw[name]) for name, parse in fields.items()}
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def page_limit(limit: int | None, cursor: str | None) -> int | None:
+    """Размер страницы; None — клиент не просил пагинацию (полный список)."""
+    if limit is None and cursor is None:
+        return None
+    return min(limit or settings.PAGE_DEFAULT_LIMIT, settings.PAGE_MAX_LIMIT)
+
+
+def finish_page(
+    rows: Sequence[T],
+    limit: int | None,
+    response: Response,
+    key: Callable[[T], dict[str, Any]],
+) -> list[T]:
+    """Обрезает выборку limit + 1 до limit и выставляет X-Next-Cursor, если есть ещё."""
+    rows = list(rows)
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
@@ -2,7 +2,7 @@ from .user import User
 from .project import Project
 from .asset import Asset
 from .deployment import Deployment
-from .snapshot import Snapshot
+from .snapshot import Snapshot, SnapshotFile
 from .template import Template
 
 # Для правильной инициализации всех моделей
@@ -12,5 +12,6 @@ __all__ = [
     "Asset",
     "Deployment",
     "Snapshot",
+    "SnapshotFile",
     "Template"
 ]
\ No newline at end of file
@@ -7,8 +7,8 @@ class Asset(Base):
     __tablename__ = "assets"
     
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
-    project_id: Mapped[UUID] = mapped_column(ForeignKey("projects.id"))
-    s3_path: Mapped[str] = mapped_column(String(255), nullable=False)
+    project_id: Mapped[UUID] = mapped_column(ForeignKey("projects.id"), index=True)
+    s3_path: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     optimized_path: Mapped[str] = mapped_column(String(255), nullable=False)
 
     # Отношения
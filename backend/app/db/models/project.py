@@ -1,13 +1,19 @@
 
 from datetime import datetime
 from uuid import UUID, uuid4
-from sqlalchemy import String, DateTime, ForeignKey, Integer
+from sqlalchemy import String, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # list_projects: WHERE user_id ORDER BY created_at DESC (индекс читается в обратном порядке)
+        Index("ix_projects_user_id_created_at", "user_id", "created_at"),
+        # проверка дубликата имени в create_project / update_project
+        Index("ix_projects_user_id_name", "user_id", "name"),
+    )
     
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
@@ -19,6 +25,10 @@ class Project(Base):
         String(64), nullable=False, server_default="queued", default="queued"
     )
     active_snapshot_version: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
+    # Счётчик номеров версий снапшотов (см. snapshot_repo.allocate_version)
+    last_snapshot_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0", default=0
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now()
@@ -1,22 +1,48 @@
 from datetime import datetime
 from uuid import UUID, uuid4
-from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy import Integer, String, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 
 
 class Snapshot(Base):
+    """Версия проекта: одна запись на версию, состав файлов — в SnapshotFile."""
+
     __tablename__ = "snapshots"
+    __table_args__ = (
+        UniqueConstraint("project_id", "version", name="uq_snapshots_project_id_version"),
+    )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     project_id: Mapped[UUID] = mapped_column(ForeignKey("projects.id"))
     version: Mapped[int] = mapped_column(Integer, nullable=False)
-    minio_path: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String(500), nullable=True, default="")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
     )
 
-    project = relationship("Project", back_populates="snapshots")
\ No newline at end of file
+    project = relationship("Project", back_populates="snapshots")
+    files = relationship("SnapshotFile", back_populates="snapshot", passive_deletes=True)
+
+
+class SnapshotFile(Base):
+    """Полный манифест версии: каждый src-файл проекта на момент версии.
+
+    Содержимое лежит в content-addressed blob'е (StorageService.blob_path).
+    legacy_path — объект снапшота, созданного до перехода на blob'ы
+    (content_hash у таких записей пуст).
+    """
+
+    __tablename__ = "snapshot_files"
+
+    snapshot_id: Mapped[UUID] = mapped_column(
+        ForeignKey("snapshots.id", ondelete="CASCADE"), primary_key=True
+    )
+    rel_path: Mapped[str] = mapped_column(String(512), primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=True)
+    legacy_path: Mapped[str] = mapped_column(String(255), nullable=True)
+
+    snapshot = relationship("Snapshot", back_populates="files")
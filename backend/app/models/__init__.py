@@ -7,7 +7,7 @@ TODO (Фаза 1): перенести модели сюда и обновить
 from app.db.models.user import User
 from app.db.models.project import Project
 from app.db.models.template import Template
-from app.db.models.snapshot import Snapshot
+from app.db.models.snapshot import Snapshot, SnapshotFile
 from app.db.models.deployment import Deployment
 
-__all__ = ["User", "Project", "Template", "Snapshot", "Deployment"]
+__all__ = ["User", "Project", "Template", "Snapshot", "SnapshotFile", "Deployment"]
@@ -1,37 +1,74 @@
-"""Repository: CRUD операции со снапшотами версий проектов."""
+"""Repository: CRUD операции со снапшотами версий проектов.
+
+Снапшот — одна запись на версию (Snapshot) плюс полный манифест файлов
+версии (SnapshotFile: rel_path → content_hash, size).  Состояние проекта на
+версии N читается одним запросом по манифесту, без обхода истории правок.
+"""
 from __future__ import annotations
 
+from typing import NamedTuple
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models.snapshot import Snapshot
+from app.db.models.project import Project
+from app.db.models.snapshot import Snapshot, SnapshotFile
 
 
-async def list_by_project(db: AsyncSession, project_id: UUID) -> list[Snapshot]:
-    result = await db.execute(
+class FileVersion(NamedTuple):
+    """Содержимое файла в новой версии: хэш blob'а и размер в байтах."""
+
+    content_hash: str
+    size: int
+
+
+async def list_by_project(
+    db: AsyncSession,
+    project_id: UUID,
+    *,
+    limit: int | None = None,
+    before_version: int | None = None,
+) -> list[Snapshot]:
+    """Версии проекта от новых к старым; limit/before_version — keyset-страница."""
+    query = (
         select(Snapshot)
         .where(Snapshot.project_id == project_id)
         .order_by(Snapshot.version.desc())
     )
+    if before_version is not None:
+        query = query.where(Snapshot.version < before_version)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
     return list(result.scalars().all())
 
 
-async def list_by_version(db: AsyncSession, project_id: UUID, version: int) -> list[Snapshot]:
+async def get_by_version(db: AsyncSession, project_id: UUID, version: int) -> Snapshot | None:
     result = await db.execute(
         select(Snapshot)
         .where(Snapshot.project_id == project_id, Snapshot.version == version)
     )
+    return result.scalar_one_or_none()
+
+
+async def list_files(db: AsyncSession, snapshot_id: UUID) -> list[SnapshotFile]:
+    """Манифест версии по id снапшота (поиск по первичному ключу snapshot_files)."""
+    result = await db.execute(
+        select(SnapshotFile)
+        .where(SnapshotFile.snapshot_id == snapshot_id)
+        .order_by(SnapshotFile.rel_path)
+    )
     return list(result.scalars().all())
 
 
-async def list_up_to_version(db: AsyncSession, project_id: UUID, version: int) -> list[Snapshot]:
-    """All snapshots for the project at version <= given version, newest first."""
+async def list_files_at_version(db: AsyncSession, project_id: UUID, version: int) -> list[SnapshotFile]:
+    """Манифест версии по номеру — один запрос с join на snapshots."""
     result = await db.execute(
-        select(Snapshot)
-        .where(Snapshot.project_id == project_id, Snapshot.version <= version)
-        .order_by(Snapshot.version.desc())
+        select(SnapshotFile)
+        .join(Snapshot, Snapshot.id == SnapshotFile.snapshot_id)
+        .where(Snapshot.project_id == project_id, Snapshot.version == version)
+        .order_by(SnapshotFile.rel_path)
     )
     return list(result.scalars().all())
 
@@ -42,20 +79,69 @@ async def get_by_id(db: AsyncSession, snapshot_id: UUID) -> Snapshot | None:
 
 
 async def get_latest_version(db: AsyncSession, project_id: UUID) -> int:
-    snapshots = await list_by_project(db, project_id)
-    return snapshots[0].version if snapshots else 0
+    """Номер последней версии (MAX по уникальному индексу project_id, version)."""
+    result = await db.execute(
+        select(func.max(Snapshot.version)).where(Snapshot.project_id == project_id)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+async def allocate_version(db: AsyncSession, project_id: UUID) -> int:
+    """Атомарно выделяет номер следующей версии проекта.
+
+    UPDATE ... RETURNING по счётчику projects.last_snapshot_version: строка
+    проекта остаётся заблокированной до commit, поэтому параллельные правки
+    (edit_element и PUT /editor/file) получают разные номера.
+    """
+    result = await db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(last_snapshot_version=Project.last_snapshot_version + 1)
+        .returning(Project.last_snapshot_version)
+    )
+    return result.scalar_one()
 
 
 async def create(
-    db: AsyncSession, *, project_id: UUID, version: int, minio_path: str, description: str = ""
+    db: AsyncSession,
+    *,
+    project_id: UUID,
+    version: int,
+    files: dict[str, FileVersion],
+    description: str = "",
 ) -> Snapshot:
-    snapshot = Snapshot(
-        project_id=project_id,
-        version=version,
-        minio_path=minio_path,
-        description=description,
-    )
+    """Создаёт версию с полным манифестом.
+
+    files — только изменённые файлы (rel_path → FileVersion); остальные
+    наследуются из активной версии проекта (после restore это откатанная
+    версия, а не последняя по номеру).
+    """
+    base_version = (
+        await db.execute(select(Project.active_snapshot_version).where(Project.id == project_id))
+    ).scalar_one_or_none()
+
+    snapshot = Snapshot(project_id=project_id, version=version, description=description)
     db.add(snapshot)
     await db.flush()
+
+    manifest: dict[str, SnapshotFile] = {}
+    if base_version is not None:
+        for inherited in await list_files_at_version(db, project_id, base_version):
+            manifest[inherited.rel_path] = SnapshotFile(
+                snapshot_id=snapshot.id,
+                rel_path=inherited.rel_path,
+                content_hash=inherited.content_hash,
+                size=inherited.size,
+                legacy_path=inherited.legacy_path,
+            )
+    for rel_path, file_version in files.items():
+        manifest[rel_path] = SnapshotFile(
+            snapshot_id=snapshot.id,
+            rel_path=rel_path,
+            content_hash=file_version.content_hash,
+            size=file_version.size,
+        )
+    db.add_all(list(manifest.values()))
+    await db.flush()
     await db.refresh(snapshot)
     return snapshot
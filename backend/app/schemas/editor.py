@@ -1,7 +1,9 @@
 """Pydantic-схемы для эндпоинта /editor."""
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class ElementInfo(BaseModel):
@@ -10,12 +12,52 @@ class ElementInfo(BaseModel):
     element_html: str
 
 
+class ElementOperation(BaseModel):
+    """Структурная правка элемента без LLM (app/services/element_ops.py)."""
+    type: Literal["set_text", "set_attribute", "add_class", "remove_class"]
+    value: str = Field(..., max_length=2000)
+    name: Optional[str] = None  # имя атрибута для set_attribute
+
+
 class EditElementRequest(BaseModel):
     project_id: str
     element: ElementInfo
-    instruction: str = Field(..., min_length=1, max_length=2000)
+    # Свободная инструкция для A4; можно не указывать, если задан operation
+    instruction: str = Field(default="", max_length=2000)
+    operation: Optional[ElementOperation] = None
     ai_model: str = Field(default="gpt-5.4")
 
+    @model_validator(mode='after')
+    def check_instruction_or_operation(self) -> 'EditElementRequest':
+        if self.operation is None and not self.instruction.strip():
+            raise ValueError("Either instruction or operation must be provided")
+        return self
+
+
+class BatchEditItem(BaseModel):
+    element: ElementInfo
+    instruction: str = Field(default="", max_length=2000)
+    operation: Optional[ElementOperation] = None
+
+    @model_validator(mode='after')
+    def check_instruction_or_operation(self) -> 'BatchEditItem':
+        if self.operation is None and not self.instruction.strip():
+            raise ValueError("Either instruction or operation must be provided")
+        return self
+
+
+class BatchEditRequest(BaseModel):
+    project_id: str
+    edits: list[BatchEditItem] = Field(..., min_length=1, max_length=50)
+    ai_model: str = Field(default="gpt-5.4")
+
+
+class BatchEditResponse(BaseModel):
+    task_id: str
+    project_id: str
+    file_paths: list[str]
+    status: str = "queued"
+
 
 class EditElementResponse(BaseModel):
     task_id: str
@@ -10,7 +10,6 @@ class SnapshotResponse(BaseModel):
     id: UUID
     project_id: UUID
     version: int
-    minio_path: str
     description: str | None
     created_at: datetime
 
@@ -0,0 +1,174 @@
+"""Быстрая проверка сгенерированных исходников до сборки в K8s.
+
+Битый ответ LLM (незакрытый тег, потерянный ---, импорт несуществующего
+файла, getStaticPaths, [slug].astro) раньше обнаруживался только после
+npm install и astro build в build pod'е — минуты на каждую попытку.
+Здесь те же ошибки ловятся регулярками за миллисекунды на файл, и воркер
+перегенерирует или чинит именно проблемный файл до постановки сборки.
+
+Проверки консервативные: то, что не удаётся разобрать однозначно
+(например, "<" внутри выражения), пропускается, а не считается ошибкой.
+Пути — от корня проекта, с префиксом src/ (как в плане A1).
+"""
+from __future__ import annotations
+
+import posixpath
+import re
+
+_FENCE_RE = re.compile(r"^---[ \t]*$", re.M)
+_IMPORT_RE = re.compile(r"""^\s*import\s+(?:[^'";]*?\s+from\s+)?["']([^"']+)["']""", re.M)
+# Тела выражений к этому моменту уже свёрнуты _strip_expressions в {}
+_EXPRESSION_ATTR = r"\{\}"
+_TAG_RE = re.compile(
+    r"<(/?)([A-Za-z][\w.:-]*)"
+    r"((?:\s+(?:[^\s\"'>{}=/]+(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'|" + _EXPRESSION_ATTR + r"|[^\s\"'=<>`]+))?"
+    r"|" + _EXPRESSION_ATTR + r"))*)\s*(/?)>"
+)
+_RAW_BLOCK_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "source", "track", "wbr",
+}
+# Закрывающий тег необязателен по HTML — его отсутствие не ошибка
+_OPTIONAL_CLOSE = {"p", "li", "dt", "dd", "option", "tr", "td", "th"}
+_RESOLVE_SUFFIXES = ("", ".astro", ".ts", ".js", ".tsx", ".jsx", "/index.astro", "/index.ts", "/index.js")
+_TAILWIND_SCRIPT_RE = re.compile(r"<script\b[^>]*cdn\.tailwindcss\.com[^>]*>", re.I)
+# В шаблоне create-astro basics из пакетов есть только astro; его же файлы
+# лежат под сгенерированными и тоже доступны для импорта
+_ALLOWED_PACKAGE = "astro"
+_ALLOWED_PACKAGE_PREFIXES = ("astro:", "astro/")
+TEMPLATE_FILES = frozenset({
+    "src/layouts/Layout.astro",
+    "src/components/Welcome.astro",
+    "src/assets/astro.svg",
+    "src/assets/background.svg",
+})
+
+
+def _split_frontmatter(content: str) -> tuple[str | None, str, list[str]]:
+    """(frontmatter, шаблон, проблемы) — frontmatter None, если его нет."""
+    text = content.lstrip("\ufeff")
+    if not text.lstrip().startswith("---"):
+        return None, text, []
+    fences = list(_FENCE_RE.finditer(text))
+    if len(fences) < 2:
+        return None, text, ["frontmatter не закрыт: нет второй строки ---"]
+    return text[fences[0].end():fences[1].start()], text[fences[1].end():], []
+
+
+def _strip_expressions(template: str) -> str:
+    """Заменяет тела {…}-выражений на {} сбалансированным проходом.
+
+    Строки в выражениях ("<span>", '}') и вложенные скобки любой глубины
+    не мешают разбору тегов; незакрытая { оставляет хвост как есть.
+    """
+    out: list[str] = []
+    i, n = 0, len(template)
+    while i < n:
+        if template[i] != "{":
+            out.append(template[i])
+            i += 1
+            continue
+        depth, j, quote = 0, i, ""
+        while j < n:
+            ch = template[j]
+            if quote:
+                if ch == "\\":
+                    j += 1
+                elif ch == quote:
+                    quote = ""
+            elif ch in "\"'`":
+                quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        if j >= n:
+            out.append(template[i:])
+            break
+        out.append("{}")
+        i = j + 1
+    return "".join(out)
+
+
+def _check_tags(template: str) -> list[str]:
+    stack: list[str] = []
+    for match in _TAG_RE.finditer(_strip_expressions(_RAW_BLOCK_RE.sub("", template))):
+        closing, name, _, self_closing = match.groups()
+        if self_closing or name.lower() in _VOID_TAGS:
+            continue
+        if not closing:
+            stack.append(name)
+        elif name in stack:
+            unclosed = [tag for tag in stack[stack.index(name) + 1:] if tag.lower() not in _OPTIONAL_CLOSE]
+            del stack[stack.index(name):]
+            if unclosed:
+                return [f"тег <{unclosed[-1]}> не закрыт перед </{name}>"]
+        else:
+            return [f"лишний закрывающий тег </{name}>"]
+    stack = [tag for tag in stack if tag.lower() not in _OPTIONAL_CLOSE]
+    return [f"тег <{stack[-1]}> не закрыт"] if stack else []
+
+
+def _check_imports(path: str, frontmatter: str, known: set[str] | None) -> list[str]:
+    problems: list[str] = []
+    base = posixpath.dirname(path)
+    for spec in _IMPORT_RE.findall(frontmatter):
+        if spec.startswith("."):
+            if known is None:
+                continue
+            target = posixpath.normpath(posixpath.join(base, spec))
+            if not any(target + suffix in known for suffix in _RESOLVE_SUFFIXES):
+                problems.append(f"импорт {spec}: файла {target} нет в проекте")
+        elif not (spec.startswith(("/",) + _ALLOWED_PACKAGE_PREFIXES) or spec == _ALLOWED_PACKAGE):
+            problems.append(f"импорт внешнего пакета {spec} — в проекте есть только astro")
+    return problems
+
+
+def validate_file(path: str, content: str, known_paths: set[str] | None) -> list[str]:
+    """Проблемы файла (пустой список — файл в порядке).
+
+    known_paths=None — набор файлов проекта неизвестен, относительные импорты
+    не проверяются.
+    """
+    path = path.lstrip("/")
+    problems: list[str] = []
+    if re.search(r"\[[^/]*\]", posixpath.basename(path)):
+        problems.append("динамический маршрут — нужны только статические страницы")
+    if content.lstrip().startswith("```"):
+        problems.append("код обёрнут в markdown-блок ```")
+    if not path.endswith(".astro"):
+        if path.endswith((".ts", ".js", ".tsx", ".jsx", ".mjs")):
+            problems += _check_imports(path, content, known_paths)
+        return problems
+
+    frontmatter, template, fm_problems = _split_frontmatter(content)
+    problems += fm_problems
+    if frontmatter is None and not fm_problems and _IMPORT_RE.search(template):
+        problems.append("import вне frontmatter (---)")
+    if "getStaticPaths" in content:
+        problems.append("getStaticPaths() запрещён — только статические страницы")
+    if re.search(r"@apply\b", content):
+        problems.append("@apply в <style> — только utility-классы Tailwind в разметке")
+    tailwind_tags = _TAILWIND_SCRIPT_RE.findall(content)
+    if tailwind_tags and not any(re.search(r"\sis:inline\b", tag) for tag in tailwind_tags):
+        problems.append('<script src="https://cdn.tailwindcss.com"> без is:inline — Astro удалит его')
+    if frontmatter is not None:
+        problems += _check_imports(path, frontmatter, known_paths)
+    if not fm_problems:
+        problems += _check_tags(template)
+    return problems
+
+
+def validate_files(files: dict[str, str]) -> dict[str, list[str]]:
+    """{path: проблемы} только для файлов с проблемами; импорты — относительно этого набора."""
+    known = {path.lstrip("/") for path in files} | TEMPLATE_FILES
+    report = {}
+    for path, content in files.items():
+        problems = validate_file(path, content, known)
+        if problems:
+            report[path] = problems
+    return report
@@ -0,0 +1,61 @@
+"""Разбор логов упавшей сборки Astro: какие файлы чинить и что показать A4.
+
+Лог build pod'а — весь вывод скрипта из KubernetesService (mc, create-astro,
+npm install, astro build).  Для починки нужны только ошибка и файлы src/,
+на которые она указывает: пути вида /workspace/<id>/src/pages/index.astro:12:5
+или "src/components/Hero.astro" в сообщениях vite/rollup.
+
+До сборки скрипт печатает список всех файлов src/ (mc ls, find src/), поэтому
+искать пути и ошибку можно только в выводе после маркера pre-build.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+
+_SRC_PATH_RE = re.compile(
+    r"(?:^|[\s\"'(/])src/([\w@.\[\]/-]+?\.(?:astro|ts|tsx|js|jsx|mjs|css|md|mdx))(?=[\s\"'):,]|$)",
+    re.M,
+)
+# Маркер из скрипта сборки (KubernetesService): дальше — pre-build.cjs и npm run build
+_BUILD_MARKER = "=== pre-build:"
+# Строки-ошибки: [ERROR], "error:"/"error " в начале строки, SomethingError:, npm ERR!,
+# а не любое вхождение слова (src/components/ErrorState.astro — не ошибка)
+_ERROR_LINE_RE = re.compile(
+    r"\[ERROR\]|^\s*(?:\[[\w:-]+\]\s*)?error\b|\berror:|\b[A-Z]\w*Error:|\bERR!|\bFATAL\b",
+    re.I,
+)
+# Номера строк, время, хэши чанков меняются от сборки к сборке — не часть ошибки
+_VOLATILE_RE = re.compile(r"\d+(?:\.\d+)?(?:ms|s)\b|:\d+:\d+|\b[0-9a-f]{8,}\b")
+
+
+def build_output(logs: str) -> str:
+    """Часть лога после маркера pre-build (весь лог, если маркера нет)."""
+    start = logs.rfind(_BUILD_MARKER)
+    return logs if start == -1 else logs[start:]
+
+
+def failing_files(logs: str, known_paths: list[str]) -> list[str]:
+    """Файлы src/ из вывода сборки, которые есть в проекте, в порядке первого упоминания."""
+    known = set(known_paths)
+    found: list[str] = []
+    for match in _SRC_PATH_RE.finditer(build_output(logs)):
+        path = match.group(1)
+        if path in known and path not in found:
+            found.append(path)
+    return found
+
+
+def error_excerpt(logs: str, limit: int = 4000) -> str:
+    """Ошибка сборки: от первой строки-ошибки (и пары строк перед ней), не длиннее limit."""
+    logs = build_output(logs)
+    lines = logs.splitlines()
+    for index, line in enumerate(lines):
+        if _ERROR_LINE_RE.search(line):
+            return "\n".join(lines[max(0, index - 3):])[:limit]
+    return logs[-limit:]
+
+
+def failure_fingerprint(excerpt: str) -> str:
+    """Отпечаток ошибки без изменчивых деталей — чтобы узнать ту же самую ошибку."""
+    return hashlib.sha256(_VOLATILE_RE.sub("#", excerpt).encode("utf-8")).hexdigest()[:16]
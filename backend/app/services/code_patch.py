@@ -0,0 +1,68 @@
+"""Применение правок в формате SEARCH/REPLACE к исходнику файла.
+
+EditorAgent в режиме patch просит у модели не весь файл, а только блоки
+
+    <<<<<<< SEARCH
+    строки из текущего файла
+    =======
+    новые строки
+    >>>>>>> REPLACE
+
+Ответ в разы короче полного файла, а выходные токены — основная часть
+задержки правки.  Применение строгое: каждый SEARCH должен находиться в
+текущем коде ровно один раз (точно или с точностью до отступов), иначе
+PatchError — и агент откатывается на полную перегенерацию файла.
+"""
+from __future__ import annotations
+
+import re
+
+_BLOCK_RE = re.compile(r"^<{7} SEARCH\n(.*?)^={7}\n(.*?)^>{7} REPLACE\s*$", re.S | re.M)
+
+
+class PatchError(ValueError):
+    """Патч не разобран или не применяется к текущему коду."""
+
+
+def parse_search_replace(text: str) -> list[tuple[str, str]]:
+    """Блоки (search, replace) из ответа модели; без блоков — PatchError."""
+    blocks = [(search, replace) for search, replace in _BLOCK_RE.findall(text)]
+    if not blocks:
+        raise PatchError("No SEARCH/REPLACE blocks in response")
+    return blocks
+
+
+def _find_lines(code_lines: list[str], search_lines: list[str]) -> list[int]:
+    """Начала окон строк, совпадающих с search без учёта отступов и хвостовых пробелов."""
+    needle = [line.strip() for line in search_lines]
+    size = len(needle)
+    return [
+        start for start in range(len(code_lines) - size + 1)
+        if [line.strip() for line in code_lines[start:start + size]] == needle
+    ]
+
+
+def apply_search_replace(code: str, blocks: list[tuple[str, str]]) -> str:
+    """Применяет блоки по очереди; любой неоднозначный или ненайденный SEARCH — PatchError."""
+    for number, (search, replace) in enumerate(blocks, 1):
+        if not search.strip():
+            raise PatchError(f"Block {number}: empty SEARCH")
+        occurrences = code.count(search)
+        if occurrences == 1:
+            code = code.replace(search, replace, 1)
+            continue
+        if occurrences > 1:
+            raise PatchError(f"Block {number}: SEARCH matches {occurrences} places")
+
+        # модель часто сбивает отступы — ищем по строкам без учёта пробелов по краям
+        code_lines = code.splitlines(keepends=True)
+        search_lines = search.splitlines()
+        matches = _find_lines(code_lines, search_lines)
+        if len(matches) != 1:
+            raise PatchError(f"Block {number}: SEARCH {'not found' if not matches else 'is ambiguous'}")
+        start = matches[0]
+        end = start + len(search_lines)
+        # последняя строка окна без \n в конце файла — сохраняем как было
+        tail = "\n" if code_lines[end - 1].endswith("\n") and replace and not replace.endswith("\n") else ""
+        code = "".join(code_lines[:start]) + replace + tail + "".join(code_lines[end:])
+    return code
@@ -0,0 +1,156 @@
+"""Планировщик fan-out генерации файлов (A2) с ограничением параллелизма.
+
+Раньше _pipeline запускал asyncio.gather() сразу по всем файлам плана A1:
+на больших планах это упиралось в rate limit провайдера, tenacity уходил
+в backoff и хвост генерации растягивался.  Здесь одновременно
+генерируется не более concurrency файлов; токены дополнительно ограничивает
+TPM-бюджет в BaseAgent._call_llm (см. llm_client.TokenBudget).
+
+В режиме respect_dependencies файлы идут в топологическом порядке графа
+"dependencies" от A1: сначала листовые компоненты, затем файлы, которые их
+импортируют, — им передаются уже сгенерированные зависимости.
+
+Порядок запуска — сначала файлы, от которых (транзитивно) зависит больше
+других файлов плана, затем более объёмные по спецификации: они дольше
+всего генерируются и иначе оказываются в хвосте.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def _dependents(files: list[dict]) -> dict[str, int]:
+    """Для каждого пути — сколько файлов плана зависят от него прямо или транзитивно."""
+    paths = {f.get("path") for f in files}
+    reverse: dict[str, set[str]] = {}
+    for spec in files:
+        for dep in spec.get("dependencies") or []:
+            if dep in paths and dep != spec.get("path"):
+                reverse.setdefault(dep, set()).add(spec["path"])
+
+    counts: dict[str, int] = {}
+    for path in paths:
+        seen: set[str] = set()
+        stack = list(reverse.get(path, ()))
+        while stack:
+            current = stack.pop()
+            if current in seen or current == path:
+                continue
+            seen.add(current)
+            stack.extend(reverse.get(current, ()))
+        counts[path] = len(seen)
+    return counts
+
+
+def prioritize(files: list[dict]) -> list[int]:
+    """Индексы файлов плана в порядке запуска генерации."""
+    dependents = _dependents(files)
+    return sorted(
+        range(len(files)),
+        key=lambda i: (
+            -dependents.get(files[i].get("path"), 0),
+            -len(json.dumps(files[i], ensure_ascii=False)),
+            i,
+        ),
+    )
+
+
+def _plan_dependencies(files: list[dict]) -> list[set[int]]:
+    """Для каждого файла — индексы файлов плана, от которых он зависит."""
+    index_by_path = {spec.get("path"): i for i, spec in enumerate(files)}
+    return [
+        {index_by_path[dep] for dep in spec.get("dependencies") or [] if dep in index_by_path} - {i}
+        for i, spec in enumerate(files)
+    ]
+
+
+async def run_prioritized(
+    files: list[dict],
+    generate: Callable[[dict, dict[str, Any]], Awaitable[Any]],
+    *,
+    concurrency: int,
+    respect_dependencies: bool = False,
+    completed: dict[str, Any] | None = None,
+    on_progress: Callable[[dict[str, dict]], None] | None = None,
+) -> tuple[list[Any], dict[str, dict]]:
+    """Генерирует файлы не более чем в concurrency потоков.
+
+    generate(spec, deps) получает результаты уже сгенерированных зависимостей
+    файла {path: result}.  При respect_dependencies файл стартует только
+    после всех своих зависимостей из плана (топологический порядок,
+    независимые ветки идут параллельно); при цикле в графе ожидание
+    разрывается — запускается самый приоритетный из оставшихся файлов.
+    Без respect_dependencies deps всегда пуст.
+
+    completed — уже готовые результаты {path: result} (из чекпоинта):
+    такие файлы не генерируются, помечаются "skipped" и передаются
+    зависимым файлам как обычные результаты.
+
+    Возвращает результаты в порядке files и тайминги по путям:
+    {path: {"status": "pending|running|done|skipped|failed", "seconds": float}}.
+    on_progress вызывается при старте и завершении каждого файла.
+    При первой ошибке остальные файлы отменяются, ошибка пробрасывается.
+    """
+    results: list[Any] = [None] * len(files)
+    paths = [spec.get("path", str(i)) for i, spec in enumerate(files)]
+    timings: dict[str, dict] = {path: {"status": "pending"} for path in paths}
+    dependencies = _plan_dependencies(files) if respect_dependencies else [set() for _ in files]
+    pending = prioritize(files)
+    done: set[int] = set()
+    for index, path in enumerate(paths):
+        if completed and path in completed:
+            results[index] = completed[path]
+            done.add(index)
+            pending.remove(index)
+            timings[path] = {"status": "skipped"}
+    running: dict[asyncio.Task, tuple[int, float]] = {}
+    limit = max(1, concurrency)
+
+    def _report() -> None:
+        if on_progress is not None:
+            on_progress(timings)
+
+    def _start(index: int) -> None:
+        pending.remove(index)
+        deps = {paths[d]: results[d] for d in dependencies[index] if d in done}
+        task = asyncio.create_task(generate(files[index], deps))
+        running[task] = (index, time.monotonic())
+        timings[paths[index]] = {"status": "running"}
+
+    try:
+        while pending or running:
+            for index in [i for i in pending if dependencies[i] <= done]:
+                if len(running) >= limit:
+                    break
+                _start(index)
+            if not running:
+                # все оставшиеся файлы ждут друг друга — цикл в графе зависимостей
+                logger.warning("Dependency cycle among %s, starting %s", [paths[i] for i in pending], paths[pending[0]])
+                _start(pending[0])
+            _report()
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                index, started = running.pop(task)
+                seconds = round(time.monotonic() - started, 2)
+                if task.exception() is not None:
+                    timings[paths[index]] = {"status": "failed", "seconds": seconds}
+                    raise task.exception()
+                results[index] = task.result()
+                done.add(index)
+                timings[paths[index]] = {"status": "done", "seconds": seconds}
+                logger.info("A2 generated %s in %.2fs", paths[index], seconds)
+    except BaseException:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        _report()
+        raise
+    _report()
+    return results, timings
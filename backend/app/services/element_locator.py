@@ -0,0 +1,91 @@
+"""Поиск элемента по data-editable-id в исходнике .astro.
+
+ID ставит scripts/pre-build.cjs в build pod'е: sha256(relPath:tagIndex)[:16],
+где tagIndex — порядковый номер совпадения TAG_RE в файле.  Исходники в MinIO
+этих атрибутов обычно не содержат, поэтому здесь та же нумерация повторена на
+Python: по editable_id находим открывающий тег, его парный закрывающий и
+строки вокруг — A4 получает только этот фрагмент вместо всего файла.
+
+Смещения — индексы в str (символы, не байты): фрагмент вырезается и
+вставляется обратно срезами строки.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+
+# Должно совпадать с TAG_RE в scripts/pre-build.cjs — иначе разойдётся нумерация
+TAG_RE = re.compile(r"<(p|h[1-6]|section|div|button|a|img)(\s[^>]*)?(/?)>", re.I)
+_ID_ATTR_RE = re.compile(r"""data-editable-id\s*=\s*["']([^"']+)["']""", re.I)
+_VOID_TAGS = {"img"}
+
+
+@dataclass(frozen=True)
+class ElementSpan:
+    """Элемент в исходнике: code[start:end] — от "<tag" до "</tag>" включительно."""
+
+    tag: str
+    start: int
+    end: int
+    open_tag: str
+
+
+def stable_id(rel_path: str, index: int) -> str:
+    """Тот же ID, что stableId() в pre-build.cjs."""
+    return hashlib.sha256(f"{rel_path}:{index}".encode("utf-8")).hexdigest()[:16]
+
+
+def _element_end(code: str, tag: str, open_end: int) -> int | None:
+    """Конец парного </tag> с учётом вложенных одноимённых тегов."""
+    token_re = re.compile(rf"<(/?){tag}(?=[\s/>])[^>]*>", re.I)
+    depth = 1
+    for token in token_re.finditer(code, open_end):
+        if token.group(1):
+            depth -= 1
+            if depth == 0:
+                return token.end()
+        elif not token.group(0).endswith("/>"):
+            depth += 1
+    return None
+
+
+def locate_element(code: str, rel_path: str, editable_id: str) -> ElementSpan | None:
+    """Элемент с данным data-editable-id или None, если в файле его нет.
+
+    rel_path — путь относительно src/ (как в data-editable-file).
+    """
+    rel_path = rel_path.lstrip("/")
+    for index, match in enumerate(TAG_RE.finditer(code)):
+        attrs = match.group(2) or ""
+        explicit = _ID_ATTR_RE.search(attrs)
+        element_id = explicit.group(1) if explicit else stable_id(rel_path, index)
+        if element_id != editable_id:
+            continue
+        tag = match.group(1).lower()
+        if tag in _VOID_TAGS or match.group(0).endswith("/>"):
+            end = match.end()
+        else:
+            end = _element_end(code, match.group(1), match.end())
+            if end is None:
+                return None
+        return ElementSpan(tag=tag, start=match.start(), end=end, open_tag=match.group(0))
+    return None
+
+
+def line_window(code: str, span: ElementSpan, context_lines: int) -> tuple[int, int]:
+    """Границы фрагмента: строки элемента целиком плюс context_lines строк до и после."""
+    start = code.rfind("\n", 0, span.start) + 1
+    for _ in range(context_lines):
+        if start == 0:
+            break
+        start = code.rfind("\n", 0, start - 1) + 1
+
+    end = code.find("\n", span.end)
+    end = len(code) if end == -1 else end + 1
+    for _ in range(context_lines):
+        if end >= len(code):
+            break
+        nxt = code.find("\n", end)
+        end = len(code) if nxt == -1 else nxt + 1
+    return start, end
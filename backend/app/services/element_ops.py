@@ -0,0 +1,110 @@
+"""Детерминированные правки элемента без LLM: текст, атрибут, классы.
+
+Элемент ищется по data-editable-id (element_locator), правка применяется прямо
+к исходнику.  Всё, что нельзя изменить однозначно — вложенная разметка,
+Astro-выражения {…} в тексте или атрибуте, class:list — даёт ElementOpError:
+такие правки остаются за A4.  Новые теги не появляются, поэтому нумерация
+data-editable-id в файле не сдвигается.
+"""
+from __future__ import annotations
+
+import html
+import re
+
+from app.services.element_locator import ElementSpan, locate_element
+
+OPERATIONS = ("set_text", "set_attribute", "add_class", "remove_class")
+
+_ATTR_NAME_RE = re.compile(r"^[a-zA-Z_][-a-zA-Z0-9_.]*$")
+_PROTECTED_ATTRS = {"data-editable-id", "data-editable-file"}
+
+
+class ElementOpError(ValueError):
+    """Операцию нельзя применить к элементу детерминированно."""
+
+
+def _attr_re(name: str) -> re.Pattern[str]:
+    # name="…" | name='…' | name={…} | голый name
+    return re.compile(
+        rf"""\s{re.escape(name)}(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|(\{{[^}}]*\}})))?(?=[\s/>])""",
+        re.I,
+    )
+
+
+def _get_attr(open_tag: str, name: str) -> tuple[re.Match[str] | None, str | None]:
+    match = _attr_re(name).search(open_tag)
+    if match is None:
+        return None, None
+    if match.group(3) is not None:
+        raise ElementOpError(f"Attribute {name} is an Astro expression")
+    value = match.group(1) if match.group(1) is not None else match.group(2)
+    return match, value or ""
+
+
+def _set_attr(open_tag: str, name: str, value: str | None) -> str:
+    """Открывающий тег с новым значением атрибута (None — удалить атрибут)."""
+    match, _ = _get_attr(open_tag, name)
+    new_attr = "" if value is None else f' {name}="{html.escape(value, quote=True)}"'
+    if match is not None:
+        return open_tag[:match.start()] + new_attr + open_tag[match.end():]
+    if value is None:
+        return open_tag
+    close = "/>" if open_tag.endswith("/>") else ">"
+    body = open_tag[:-len(close)].rstrip()
+    return f"{body}{new_attr}{' ' if close == '/>' else ''}{close}"
+
+
+def _set_text(code: str, span: ElementSpan, text: str) -> str:
+    inner_start = span.start + len(span.open_tag)
+    inner_end = code.rfind("</", inner_start, span.end)
+    if span.open_tag.endswith("/>") or inner_end == -1:
+        raise ElementOpError(f"<{span.tag}> has no text content")
+    inner = code[inner_start:inner_end]
+    if "<" in inner or "{" in inner:
+        raise ElementOpError("Element contains markup or expressions")
+    # сохраняем пробелы/переносы вокруг текста, меняем только сам текст
+    lead = inner[:len(inner) - len(inner.lstrip())]
+    trail = inner[len(inner.rstrip()):]
+    escaped = html.escape(text, quote=False).replace("{", "&#123;").replace("}", "&#125;")
+    return code[:inner_start] + lead + escaped + trail + code[inner_end:]
+
+
+def apply_operation(
+    code: str,
+    rel_path: str,
+    editable_id: str,
+    operation: str,
+    value: str,
+    name: str | None = None,
+) -> str:
+    """Применяет операцию к элементу с editable_id и возвращает новый код файла."""
+    span = locate_element(code, rel_path, editable_id)
+    if span is None:
+        raise ElementOpError(f"Element {editable_id} not found in {rel_path}")
+
+    if operation == "set_text":
+        return _set_text(code, span, value)
+
+    if operation == "set_attribute":
+        if not name or not _ATTR_NAME_RE.match(name):
+            raise ElementOpError(f"Invalid attribute name: {name!r}")
+        if name.lower() in _PROTECTED_ATTRS or name.lower().startswith("on") or name.lower() == "class":
+            raise ElementOpError(f"Attribute {name} cannot be set directly")
+        new_tag = _set_attr(span.open_tag, name, value)
+    elif operation in ("add_class", "remove_class"):
+        if re.search(r"\sclass:list\b", span.open_tag):
+            raise ElementOpError("Element uses class:list")
+        _, current = _get_attr(span.open_tag, "class")
+        classes = (current or "").split()
+        wanted = value.split()
+        if not wanted:
+            raise ElementOpError("Empty class name")
+        if operation == "add_class":
+            classes += [c for c in wanted if c not in classes]
+        else:
+            classes = [c for c in classes if c not in wanted]
+        new_tag = _set_attr(span.open_tag, "class", " ".join(classes) or None)
+    else:
+        raise ElementOpError(f"Unknown operation: {operation}")
+
+    return code[:span.start] + new_tag + code[span.start + len(span.open_tag):]
@@ -0,0 +1,88 @@
+"""Чекпоинты pipeline генерации в Redis: результаты A0, A1 и каждого файла A2.
+
+При ошибке run_generation_pipeline делает self.retry(), и раньше вся цепочка
+A0 → A1 → A2 запускалась заново — с повтором всех LLM-вызовов, включая уже
+сгенерированные файлы.  Теперь каждая стадия сохраняет результат в hash
+generation:{project_id}:checkpoint, а повтор продолжает с места падения.
+
+Чекпоинт привязан к входным данным (промпт, модель, шаблон): если проект
+перезапущен с другими — старые результаты отбрасываются.  Redis здесь —
+оптимизация: при его ошибках pipeline просто работает без чекпоинтов.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any
+
+import redis as redis_lib
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_FINGERPRINT = "fingerprint"
+_FILE_PREFIX = "file:"
+
+
+class GenerationCheckpoint:
+    """Промежуточные результаты генерации проекта."""
+
+    def __init__(self, project_id: str, *inputs: Any) -> None:
+        self.key = f"generation:{project_id}:checkpoint"
+        self.fingerprint = hashlib.sha256(
+            json.dumps(inputs, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self._redis = redis_lib.from_url(settings.REDIS_URL)
+        try:
+            stored = self._redis.hget(self.key, _FINGERPRINT)
+            if stored is not None and _decode(stored) != self.fingerprint:
+                logger.info("Checkpoint %s was made for other inputs, discarding", self.key)
+                self._redis.delete(self.key)
+            self._redis.hset(self.key, _FINGERPRINT, self.fingerprint)
+            self._redis.expire(self.key, settings.GENERATION_CHECKPOINT_TTL)
+        except Exception as exc:
+            logger.warning("Checkpoint %s unavailable: %s", self.key, exc)
+
+    def load(self, stage: str) -> Any | None:
+        """Результат стадии или None, если её ещё не было."""
+        try:
+            raw = self._redis.hget(self.key, stage)
+            return json.loads(raw) if raw is not None else None
+        except Exception as exc:
+            logger.warning("Could not read checkpoint %s[%s]: %s", self.key, stage, exc)
+            return None
+
+    def save(self, stage: str, value: Any) -> None:
+        try:
+            self._redis.hset(self.key, stage, json.dumps(value, ensure_ascii=False))
+        except Exception as exc:
+            logger.warning("Could not write checkpoint %s[%s]: %s", self.key, stage, exc)
+
+    def load_files(self) -> dict[str, Any]:
+        """Уже сгенерированные файлы: {path: результат A2}."""
+        try:
+            fields = self._redis.hgetall(self.key)
+            return {
+                _decode(name)[len(_FILE_PREFIX):]: json.loads(value)
+                for name, value in fields.items()
+                if _decode(name).startswith(_FILE_PREFIX)
+            }
+        except Exception as exc:
+            logger.warning("Could not read file checkpoints %s: %s", self.key, exc)
+            return {}
+
+    def save_file(self, path: str, result: Any) -> None:
+        self.save(_FILE_PREFIX + path, result)
+
+    def clear(self) -> None:
+        """Удаляет чекпоинт после успешного завершения pipeline."""
+        try:
+            self._redis.delete(self.key)
+        except Exception as exc:
+            logger.warning("Could not delete checkpoint %s: %s", self.key, exc)
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
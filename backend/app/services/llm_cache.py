@@ -0,0 +1,154 @@
+"""Кэш ответов LLM: in-process LRU перед общим уровнем в Redis.
+
+Одинаковые запросы повторяются постоянно — генерации по шаблону
+(template_slug), повторные запуски упавших pipeline, A0/A1 по одинаковым
+спецификациям.  Ключ — sha256 от модели, температуры, system и user prompt,
+поэтому совпадение означает ровно тот же запрос.
+
+Кэш включается по агентам (LLM_CACHE_AGENTS) — ответы с temperature > 0
+недетерминированы, и кэшировать их имеет смысл только там, где повтор
+ответа допустим.  Ошибки Redis не ломают вызов: запрос считается промахом.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import weakref
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+from redis.asyncio import from_url as redis_from_url
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "llm:cache:"
+
+# LRU общий на процесс: {ключ: (истекает_в, ответ, размер в байтах)}
+_lru: "OrderedDict[str, tuple[float, str, int]]" = OrderedDict()
+_lru_bytes = 0
+
+_redis_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = weakref.WeakKeyDictionary()
+
+_stats: dict[str, int] = {
+    "hits_memory": 0,
+    "hits_redis": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions_memory": 0,
+    "expired_memory": 0,
+    "skipped_too_large": 0,
+    "redis_errors": 0,
+}
+
+
+def enabled_for(agent_name: str) -> bool:
+    """Включён ли кэш для агента (имя класса в LLM_CACHE_AGENTS, "*" — для всех)."""
+    agents = {name.strip() for name in settings.LLM_CACHE_AGENTS.split(",") if name.strip()}
+    return "*" in agents or agent_name in agents
+
+
+def make_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+    payload = json.dumps([model, temperature, system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _redis() -> Redis:
+    loop = asyncio.get_running_loop()
+    client = _redis_clients.get(loop)
+    if client is None:
+        client = redis_from_url(settings.REDIS_URL, decode_responses=True)
+        _redis_clients[loop] = client
+    return client
+
+
+def _lru_get(key: str) -> str | None:
+    entry = _lru.get(key)
+    if entry is None:
+        return None
+    expires_at, value, _ = entry
+    if expires_at <= time.monotonic():
+        _lru_pop(key)
+        _stats["expired_memory"] += 1
+        return None
+    _lru.move_to_end(key)
+    return value
+
+
+def _lru_pop(key: str) -> None:
+    global _lru_bytes
+    entry = _lru.pop(key, None)
+    if entry is not None:
+        _lru_bytes -= entry[2]
+
+
+def _lru_put(key: str, value: str) -> None:
+    global _lru_bytes
+    _lru_pop(key)
+    size = len(value.encode("utf-8"))
+    _lru[key] = (time.monotonic() + settings.LLM_CACHE_TTL, value, size)
+    _lru_bytes += size
+    # вытесняем самые старые по обращению записи, пока не уложимся в оба лимита
+    while _lru and (len(_lru) > settings.LLM_CACHE_MEMORY_ENTRIES or _lru_bytes > settings.LLM_CACHE_MEMORY_BYTES):
+        _lru_pop(next(iter(_lru)))
+        _stats["evictions_memory"] += 1
+
+
+async def lookup(key: str) -> str | None:
+    """Ответ из кэша или None; попадание в Redis прогревает локальный LRU."""
+    value = _lru_get(key)
+    if value is not None:
+        _stats["hits_memory"] += 1
+        return value
+    try:
+        value = await _redis().get(_KEY_PREFIX + key)
+    except Exception as exc:
+        _stats["redis_errors"] += 1
+        logger.warning("LLM cache: Redis get failed: %s", exc)
+        value = None
+    if value is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits_redis"] += 1
+    _lru_put(key, value)
+    return value
+
+
+async def store(key: str, value: str) -> None:
+    """Сохраняет ответ в оба уровня с TTL LLM_CACHE_TTL."""
+    if len(value.encode("utf-8")) > settings.LLM_CACHE_MAX_ENTRY_BYTES:
+        _stats["skipped_too_large"] += 1
+        return
+    _lru_put(key, value)
+    _stats["stores"] += 1
+    try:
+        await _redis().set(_KEY_PREFIX + key, value, ex=settings.LLM_CACHE_TTL)
+    except Exception as exc:
+        _stats["redis_errors"] += 1
+        logger.warning("LLM cache: Redis set failed: %s", exc)
+
+
+def llm_cache_stats() -> dict[str, int | float]:
+    """Счётчики попаданий/промахов/вытеснений за время жизни процесса и размер LRU.
+
+    Отдаются в составе llm_client_stats() — в том числе через GET /api/metrics/llm.
+    """
+    hits = _stats["hits_memory"] + _stats["hits_redis"]
+    lookups = hits + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "memory_entries": len(_lru),
+        "memory_bytes": _lru_bytes,
+    }
+
+
+async def close_llm_cache() -> None:
+    """Закрывает Redis-клиент кэша текущего event loop (LRU остаётся на процесс)."""
+    client = _redis_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
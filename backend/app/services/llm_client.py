@@ -0,0 +1,265 @@
+"""Общий пул HTTP-соединений к LLM для всех агентов.
+
+Раньше каждый агент создавал свой AsyncOpenAI — со своим httpx-пулом, поэтому
+в одном pipeline (A0 → A1 → A2 с параллельной генерацией файлов) каждый агент
+заново открывал TCP/TLS-соединения к одному и тому же endpoint.  Здесь клиент
+один на (base_url, api_key): агенты берут его из реестра, keep-alive
+соединения переиспользуются, при наличии пакета h2 запросы мультиплексируются
+по HTTP/2.
+
+Пул httpx привязан к event loop, а Celery-задачи запускают новый loop через
+asyncio.run() — поэтому реестр, как и в s3_async, ведётся на loop.
+
+Метрики каждого процесса (API и воркеров) в конце задачи пишутся в Redis
+под llm:stats:<host>:<pid> — их отдаёт GET /api/metrics/llm.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+from redis.asyncio import Redis
+from redis.asyncio import from_url as redis_from_url
+
+from app.core.config import settings
+from app.services.llm_cache import close_llm_cache, llm_cache_stats
+from app.services.s3_async import close_async_s3_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_ClientKey = tuple[str | None, str]
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[_ClientKey, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Счётчики накапливаются за всё время жизни процесса
+_stats: dict[str, int] = {
+    "clients_created": 0,
+    "requests": 0,
+    "responses": 0,
+    "errors": 0,
+    "budget_waits": 0,
+    # usage из ответов: prompt-токены и сколько из них провайдер взял из кэша префиксов
+    "usage_reports": 0,
+    "prompt_tokens": 0,
+    "cached_prompt_tokens": 0,
+}
+
+_budgets: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TokenBudget]" = weakref.WeakKeyDictionary()
+
+_http2_warned = False
+
+_STATS_KEY_PREFIX = "llm:stats:"
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["requests"] += 1
+
+
+async def _on_response(response: httpx.Response) -> None:
+    _stats["responses"] += 1
+    if response.status_code >= 400:
+        _stats["errors"] += 1
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    global _http2_warned
+    kwargs: dict[str, Any] = dict(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+    if settings.LLM_HTTP2:
+        try:
+            return httpx.AsyncClient(http2=True, **kwargs)
+        except ImportError:
+            # httpx без extra [http2] — работаем по HTTP/1.1 с keep-alive
+            if not _http2_warned:
+                logger.warning("LLM_HTTP2 is enabled but package 'h2' is not installed, using HTTP/1.1")
+                _http2_warned = True
+    return httpx.AsyncClient(**kwargs)
+
+
+def get_llm_client(base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+    """Отдаёт общий клиент для endpoint в текущем event loop, создаёт при первом обращении.
+
+    По умолчанию — OPENAI_BASE_URL / OPENAI_API_KEY из настроек.
+    """
+    if base_url is None:
+        base_url = settings.OPENAI_BASE_URL
+    if api_key is None:
+        api_key = settings.OPENAI_API_KEY
+    registry = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (base_url, api_key)
+    client = registry.get(key)
+    if client is None:
+        logger.info(
+            "Creating shared LLM client for %s (max connections: %d, http2: %s)",
+            base_url or "api.openai.com", settings.LLM_MAX_CONNECTIONS, settings.LLM_HTTP2,
+        )
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,  # None → дефолтный api.openai.com
+            http_client=_build_http_client(),
+        )
+        registry[key] = client
+        _stats["clients_created"] += 1
+    return client
+
+
+class TokenBudget:
+    """Скользящее окно токенов в минуту (TPM) для всех LLM-вызовов loop'а.
+
+    acquire() резервирует оценку токенов запроса и ждёт, пока она помещается
+    в окно; settle() заменяет оценку фактическим usage из ответа.  Ожидающие
+    обслуживаются по очереди (asyncio.Lock FIFO), поэтому порядок запуска,
+    заданный планировщиком A2, сохраняется.
+    """
+
+    def __init__(self, tokens_per_minute: int, window: float = 60.0, clock=time.monotonic) -> None:
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._clock = clock
+        self._entries: deque[list[float]] = deque()  # [время, токены]
+        self._lock = asyncio.Lock()
+
+    def used(self) -> int:
+        """Токены, учтённые за последнее окно."""
+        cutoff = self._clock() - self.window
+        while self._entries and self._entries[0][0] <= cutoff:
+            self._entries.popleft()
+        return int(sum(tokens for _, tokens in self._entries))
+
+    async def acquire(self, tokens: int) -> list[float] | None:
+        """Ждёт места в окне; возвращает резерв для settle() (None — лимит выключен)."""
+        if self.tokens_per_minute <= 0:
+            return None
+        async with self._lock:
+            # запрос больше всего лимита пропускаем, когда окно опустело
+            while self.used() + tokens > self.tokens_per_minute and self._entries:
+                _stats["budget_waits"] += 1
+                await asyncio.sleep(self._entries[0][0] + self.window - self._clock())
+            entry = [self._clock(), tokens]
+            self._entries.append(entry)
+            return entry
+
+    @staticmethod
+    def settle(entry: list[float] | None, tokens: int) -> None:
+        if entry is not None:
+            entry[1] = tokens
+
+
+def get_token_budget() -> TokenBudget:
+    """TPM-бюджет текущего event loop (LLM_TOKENS_PER_MINUTE, 0 — без лимита)."""
+    loop = asyncio.get_running_loop()
+    budget = _budgets.get(loop)
+    if budget is None:
+        budget = TokenBudget(settings.LLM_TOKENS_PER_MINUTE)
+        _budgets[loop] = budget
+    return budget
+
+
+def record_usage(usage: Any) -> tuple[int, int] | None:
+    """Учитывает usage ответа; возвращает (prompt_tokens, cached_tokens) или None.
+
+    cached_tokens — usage.prompt_tokens_details.cached_tokens (OpenAI и
+    совместимые API); провайдер без этого поля считается как 0 из кэша.
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    if not isinstance(prompt_tokens, int):
+        return None
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    cached = cached if isinstance(cached, int) else 0
+    _stats["usage_reports"] += 1
+    _stats["prompt_tokens"] += prompt_tokens
+    _stats["cached_prompt_tokens"] += cached
+    return prompt_tokens, cached
+
+
+def _pool_stats(client: AsyncOpenAI) -> dict[str, int]:
+    """Состояние пула соединений клиента (best effort — внутренности httpcore)."""
+    try:
+        connections = client._client._transport._pool.connections  # type: ignore[attr-defined]
+    except AttributeError:
+        return {}
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def llm_client_stats() -> dict[str, Any]:
+    """Метрики: счётчики запросов процесса и пулы клиентов текущего event loop."""
+    stats: dict[str, Any] = dict(_stats)
+    try:
+        registry = _clients.get(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        registry = {}
+    stats["pools"] = {
+        base_url or "default": _pool_stats(client) for (base_url, _), client in registry.items()
+    }
+    stats["cache"] = llm_cache_stats()
+    return stats
+
+
+async def publish_llm_stats() -> None:
+    """Пишет метрики процесса в Redis — воркеры Celery видны только так."""
+    key = f"{_STATS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+    client = redis_from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        try:
+            await client.set(key, json.dumps(llm_client_stats()), ex=settings.LLM_STATS_TTL)
+        finally:
+            await client.aclose()
+    except Exception as exc:
+        # метрики не должны ронять задачу
+        logger.warning("Could not publish LLM stats: %s", exc)
+
+
+async def collect_llm_stats(redis: Redis) -> dict[str, Any]:
+    """Метрики текущего процесса и последние опубликованные метрики всех процессов."""
+    processes: dict[str, Any] = {}
+    async for key in redis.scan_iter(match=f"{_STATS_KEY_PREFIX}*"):
+        raw = await redis.get(key)
+        if raw is not None:
+            processes[key.removeprefix(_STATS_KEY_PREFIX)] = json.loads(raw)
+    return {"current": llm_client_stats(), "processes": processes}
+
+
+async def close_llm_clients() -> None:
+    """Закрывает клиенты (и Redis-клиент кэша ответов) текущего event loop, публикует метрики."""
+    await close_llm_cache()
+    await publish_llm_stats()
+    loop = asyncio.get_running_loop()
+    if not _clients.get(loop):
+        return
+    logger.info("LLM client stats: %s", llm_client_stats())
+    for client in _clients.pop(loop).values():
+        await client.close()
+
+
+async def run_with_llm_clients(coro: Awaitable[T]) -> T:
+    """Выполняет корутину задачи и закрывает LLM-клиенты и S3-клиент её event loop.
+
+    Обёртка для asyncio.run() в Celery-задачах: loop после задачи умирает,
+    соединения нужно закрыть до этого, а не оставлять сборщику мусора.
+    """
+    try:
+        return await coro
+    finally:
+        await close_llm_clients()
+        await close_async_s3_client()
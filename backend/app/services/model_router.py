@@ -0,0 +1,59 @@
+"""Выбор модели LLM по роли агента и размеру запроса.
+
+Раньше ai_model из запроса уходил во все агенты одинаково, хотя планировщику
+и A0 с их короткими JSON-ответами самая большая модель не нужна.
+
+LLM_MODEL_ROUTES — правила через запятую, первое подходящее побеждает:
+
+    "PlannerAgent=gpt-5.4-mini, OptimizerAgent=gpt-5.4-mini, EditorAgent:8000=gpt-5.4-mini"
+
+Agent — имя класса агента или "*"; необязательное :N — правило действует,
+только если system + user prompt не длиннее N символов.  Без подходящего
+правила остаётся модель, с которой создан агент (ai_model запроса).
+
+LLM_CASCADE — "Agent=быстрая_модель": агент сначала пробует быструю модель,
+проверяет ответ (JSON, применимость патча, astro_validator — см. агенты)
+и только при неудаче повторяет запрос на основной модели.
+
+Каждое решение пишется в лог — по нему подбираются правила.
+"""
+from __future__ import annotations
+
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _rules(spec: str) -> list[tuple[str, int | None, str]]:
+    """[(агент, лимит символов | None, модель)] из строки правил."""
+    rules = []
+    for item in spec.split(","):
+        target, sep, model = item.partition("=")
+        if not sep or not model.strip():
+            continue
+        agent, _, limit = target.strip().partition(":")
+        rules.append((agent.strip(), int(limit) if limit.strip().isdigit() else None, model.strip()))
+    return rules
+
+
+def route(agent: str, requested: str, prompt_chars: int) -> str:
+    """Модель для вызова агента; requested — модель, с которой создан агент."""
+    for name, limit, model in _rules(settings.LLM_MODEL_ROUTES):
+        if name in (agent, "*") and (limit is None or prompt_chars <= limit):
+            logger.info(
+                "Model route: %s (%d chars) %s -> %s by rule %s%s",
+                agent, prompt_chars, requested, model, name, f":{limit}" if limit is not None else "",
+            )
+            return model
+    logger.info("Model route: %s (%d chars) keeps %s, no rule matched", agent, prompt_chars, requested)
+    return requested
+
+
+def cascade_model(agent: str) -> str | None:
+    """Быстрая модель для первой попытки агента или None, если каскада нет."""
+    for name, _, model in _rules(settings.LLM_CASCADE):
+        if name in (agent, "*"):
+            return model
+    return None
@@ -0,0 +1,323 @@
+"""Асинхронный S3-клиент для MinIO на httpx (AWS Signature V4).
+
+Альтернатива синхронному minio + asyncio.to_thread(): запросы идут напрямую
+из event loop через общий пул keep-alive соединений httpx, поэтому
+параллелизм ограничен размером пула, а не пулом потоков по умолчанию.
+Включается настройкой STORAGE_BACKEND=async (см. StorageService).
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import weakref
+from datetime import datetime, timezone
+from typing import Awaitable, Dict, List, TypeVar
+from urllib.parse import quote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+
+logger = logger.bind(context="minio")
+
+T = TypeVar("T")
+
+_S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class S3Error(Exception):
+    """Ошибка, которую вернул S3/MinIO (код и сообщение из XML-ответа)."""
+
+    def __init__(self, status_code: int, code: str, message: str, key: str = "") -> None:
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.key = key
+        super().__init__(f"{code}: {message} (HTTP {status_code}, key={key!r})")
+
+
+# ---------------------------------------------------------------------------
+# AWS Signature V4
+# ---------------------------------------------------------------------------
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def canonical_query(params: dict[str, str]) -> str:
+    return "&".join(
+        f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items())
+    )
+
+
+def sign_v4(
+    *,
+    method: str,
+    path: str,
+    query: dict[str, str],
+    headers: dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    amz_date: str,
+) -> str:
+    """Возвращает значение заголовка Authorization для запроса.
+
+    path — уже URI-кодированный путь (как он уйдёт в запросе),
+    headers — все подписываемые заголовки, включая host и x-amz-date.
+    """
+    date = amz_date[:8]
+    canonical_headers = {k.lower().strip(): " ".join(v.strip().split()) for k, v in headers.items()}
+    signed_headers = ";".join(sorted(canonical_headers))
+    canonical_request = "\n".join([
+        method,
+        path,
+        canonical_query(query),
+        "".join(f"{k}:{canonical_headers[k]}\n" for k in sorted(canonical_headers)),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    key = _hmac(key, region)
+    key = _hmac(key, "s3")
+    key = _hmac(key, "aws4_request")
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Клиент
+# ---------------------------------------------------------------------------
+
+class AsyncS3Client:
+    """Минимальный набор S3-операций, нужный StorageService (path-style адресация)."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        region: str = "us-east-1",
+        max_connections: int = 64,
+        timeout: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.host = endpoint
+        self.base_url = f"{'https' if secure else 'http'}://{endpoint}"
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        bucket: str,
+        key: str = "",
+        *,
+        query: dict[str, str] | None = None,
+        body: bytes = b"",
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        query = query or {}
+        path = quote(f"/{bucket}/{key}" if key else f"/{bucket}", safe="/~")
+        payload_hash = hashlib.sha256(body).hexdigest() if body else _EMPTY_SHA256
+        signed = {
+            "host": self.host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+            **(headers or {}),
+        }
+        signed["authorization"] = sign_v4(
+            method=method,
+            path=path,
+            query=query,
+            headers=signed,
+            payload_hash=payload_hash,
+            access_key=self.access_key,
+            secret_key=self.secret_key,
+            region=self.region,
+            amz_date=signed["x-amz-date"],
+        )
+        url = self.base_url + path
+        if query:
+            url += "?" + canonical_query(query)
+        response = await self.http.request(method, url, content=body, headers=signed)
+        if response.status_code >= 300:
+            raise self._error(response, key)
+        return response
+
+    @staticmethod
+    def _error(response: httpx.Response, key: str) -> S3Error:
+        code, message = "HTTPError", response.reason_phrase
+        try:
+            root = ElementTree.fromstring(response.content)
+            code = root.findtext("Code") or code
+            message = root.findtext("Message") or message
+        except ElementTree.ParseError:
+            pass
+        return S3Error(response.status_code, code, message, key)
+
+    async def put_object(
+        self, bucket: str, key: str, data: bytes, metadata: dict[str, str] | None = None,
+    ) -> None:
+        headers = {f"x-amz-meta-{name}": value for name, value in (metadata or {}).items()}
+        await self._request("PUT", bucket, key, body=data, headers=headers)
+
+    async def get_object(self, bucket: str, key: str) -> bytes:
+        response = await self._request("GET", bucket, key)
+        return response.content
+
+    async def object_exists(self, bucket: str, key: str) -> bool:
+        try:
+            await self._request("HEAD", bucket, key)
+        except S3Error as e:
+            if e.status_code == 404:
+                return False
+            raise
+        return True
+
+    async def object_metadata(self, bucket: str, key: str) -> dict[str, str] | None:
+        """Пользовательские метаданные объекта (x-amz-meta-*, без префикса); None — объекта нет."""
+        try:
+            response = await self._request("HEAD", bucket, key)
+        except S3Error as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return {
+            name.lower().removeprefix("x-amz-meta-"): value
+            for name, value in response.headers.items()
+            if name.lower().startswith("x-amz-meta-")
+        }
+
+    async def remove_object(self, bucket: str, key: str) -> None:
+        await self._request("DELETE", bucket, key)
+
+    async def delete_objects(self, bucket: str, keys: List[str]) -> Dict[str, str]:
+        """Multi-Object Delete (до 1000 ключей). Возвращает {ключ: ошибка} для неудалённых."""
+        body = (
+            "<Delete><Quiet>true</Quiet>"
+            + "".join(f"<Object><Key>{escape(k)}</Key></Object>" for k in keys)
+            + "</Delete>"
+        ).encode("utf-8")
+        response = await self._request(
+            "POST", bucket, query={"delete": ""}, body=body,
+            headers={"content-md5": base64.b64encode(hashlib.md5(body).digest()).decode()},
+        )
+        root = ElementTree.fromstring(response.content)
+        return {
+            el.findtext(f"{_S3_NS}Key") or "": (
+                f"{el.findtext(f'{_S3_NS}Code')}: {el.findtext(f'{_S3_NS}Message')}"
+            )
+            for el in root.iter(f"{_S3_NS}Error")
+        }
+
+    async def copy_object(self, bucket: str, src_key: str, dst_key: str) -> None:
+        # CopyObject может вернуть 200 с <Error> в теле — проверяем явно
+        response = await self._request(
+            "PUT", bucket, dst_key,
+            headers={"x-amz-copy-source": quote(f"/{bucket}/{src_key}", safe="/~")},
+        )
+        if b"<Error>" in response.content:
+            raise self._error(response, dst_key)
+
+    async def list_objects(self, bucket: str, prefix: str, recursive: bool = True) -> List[str]:
+        """ListObjectsV2 с постраничной выборкой по continuation-token."""
+        names: List[str] = []
+        query = {"list-type": "2", "prefix": prefix}
+        if not recursive:
+            query["delimiter"] = "/"
+        while True:
+            response = await self._request("GET", bucket, query=query)
+            root = ElementTree.fromstring(response.content)
+            names.extend(el.text or "" for el in root.iter(f"{_S3_NS}Key"))
+            names.extend(
+                el.findtext(f"{_S3_NS}Prefix") or "" for el in root.iter(f"{_S3_NS}CommonPrefixes")
+            )
+            token = root.findtext(f"{_S3_NS}NextContinuationToken")
+            if root.findtext(f"{_S3_NS}IsTruncated") != "true" or not token:
+                return names
+            query = {**query, "continuation-token": token}
+
+
+# ---------------------------------------------------------------------------
+# Один клиент на event loop
+# ---------------------------------------------------------------------------
+
+# Пул httpx привязан к event loop, а Celery-задачи запускают новый loop через
+# asyncio.run() — поэтому клиент кэшируется на loop, а не на процесс.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncS3Client]" = weakref.WeakKeyDictionary()
+
+
+def get_async_s3_client() -> AsyncS3Client:
+    """Отдаёт клиент для текущего event loop, создаёт при первом обращении."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        logger.info(
+            "Инициализация async S3 клиента, endpoint: {}, max connections: {}",
+            settings.MINIO_ENDPOINT, settings.STORAGE_ASYNC_MAX_CONNECTIONS,
+        )
+        client = AsyncS3Client(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+            region=settings.MINIO_REGION,
+            max_connections=settings.STORAGE_ASYNC_MAX_CONNECTIONS,
+            timeout=settings.MINIO_READ_TIMEOUT,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_s3_client() -> None:
+    """Закрывает клиент текущего event loop (lifespan shutdown, конец Celery-задачи).
+
+    Сам loop после asyncio.run() пул httpx не закрывает: без этого вызова
+    сокеты остаются сборщику мусора (с ResourceWarning).
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def run_with_s3_client(coro: Awaitable[T]) -> T:
+    """Выполняет корутину задачи и закрывает S3-клиент её event loop.
+
+    Обёртка для asyncio.run() в Celery-задачах без LLM; задачи с LLM
+    используют llm_client.run_with_llm_clients, которая закрывает и его.
+    """
+    try:
+        return await coro
+    finally:
+        await close_async_s3_client()
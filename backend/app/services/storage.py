@@ -1,21 +1,84 @@
 import asyncio
+import hashlib
 import json
+import threading
 from io import BytesIO
-from typing import List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 
+import urllib3
 from loguru import logger
 from minio import Minio
 from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
 
 from app.core.config import settings
+from app.services.s3_async import get_async_s3_client
 
 logger = logger.bind(context="minio")
 
 
+# ---------------------------------------------------------------------------
+# Общий на процесс клиент MinIO
+# ---------------------------------------------------------------------------
+
+_client: Minio | None = None
+_client_lock = threading.Lock()
+
+
+def get_minio_client() -> Minio:
+    """Отдаёт singleton Minio-клиент процесса, создаёт его при первом обращении.
+
+    Пул соединений urllib3 общий для всех StorageService — TCP/TLS-сессии
+    переиспользуются между запросами и параллельными to_thread-вызовами.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                logger.info(
+                    "Инициализация MinIO клиента, endpoint: {}, pool maxsize: {}",
+                    settings.MINIO_ENDPOINT, settings.MINIO_POOL_MAXSIZE,
+                )
+                http_client = urllib3.PoolManager(
+                    maxsize=settings.MINIO_POOL_MAXSIZE,
+                    block=False,
+                    timeout=urllib3.Timeout(
+                        connect=settings.MINIO_CONNECT_TIMEOUT,
+                        read=settings.MINIO_READ_TIMEOUT,
+                    ),
+                    retries=urllib3.Retry(
+                        total=3,
+                        backoff_factor=0.2,
+                        status_forcelist=[500, 502, 503, 504],
+                    ),
+                )
+                _client = Minio(
+                    settings.MINIO_ENDPOINT,
+                    access_key=settings.MINIO_ACCESS_KEY,
+                    secret_key=settings.MINIO_SECRET_KEY,
+                    secure=settings.MINIO_SECURE,
+                    http_client=http_client,
+                )
+    return _client
+
+
+def reset_minio_client() -> None:
+    """Сбрасывает singleton-клиент. Нужно после fork (пул сокетов не должен
+    наследоваться дочерним процессом) и в тестах."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
 class StorageService:
     """
     Работа с MinIO: три бакета — проекты, шаблоны, ассеты.
     Синхронный клиент minio оборачивается в asyncio.to_thread(), чтобы не блокировать event loop.
+    При STORAGE_BACKEND=async объектные операции идут через AsyncS3Client (httpx)
+    напрямую из event loop, без пула потоков.
+
+    Конструктор дешёвый: клиент общий на процесс (get_minio_client), бакеты
+    создаются один раз при старте — initialize_buckets() из lifespan / worker_init.
     """
 
     BUCKETS = {
@@ -25,17 +88,18 @@ class StorageService:
     }
 
     def __init__(self) -> None:
-        logger.info("Инициализация MinIO клиента, endpoint: {}", settings.MINIO_ENDPOINT)
-        self.client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_SECURE,
-        )
-        self._initialize_buckets()
+        self.client = get_minio_client()
+        self.async_backend = settings.STORAGE_BACKEND == "async"
 
     PUBLIC_BUCKETS = {"projects", "assets"}
 
+    # Лимит S3 Multi-Object Delete на один запрос
+    DELETE_BATCH_SIZE = 1000
+
+    # Повторы серверного копирования одного объекта (задержка растёт x2)
+    COPY_ATTEMPTS = 3
+    COPY_RETRY_DELAY = 0.2
+
     def _sync_initialize_buckets(self) -> None:
         for bucket_type, bucket_name in self.BUCKETS.items():
             try:
@@ -65,12 +129,15 @@ class StorageService:
         }
         self.client.set_bucket_policy(bucket_name, json.dumps(policy))
 
-    def _sync_put_object(self, bucket_name: str, object_name: str, data: bytes) -> None:
+    def _sync_put_object(
+        self, bucket_name: str, object_name: str, data: bytes, metadata: Optional[Dict[str, str]] = None,
+    ) -> None:
         self.client.put_object(
             bucket_name=bucket_name,
             object_name=object_name,
             data=BytesIO(data),
             length=len(data),
+            metadata=metadata,
         )
 
     def _sync_list_objects(self, bucket_name: str, prefix: str, recursive: bool = True) -> List[str]:
@@ -80,13 +147,42 @@ class StorageService:
     def _sync_remove_object(self, bucket_name: str, object_name: str) -> None:
         self.client.remove_object(bucket_name, object_name)
 
+    def _sync_remove_objects(self, bucket_name: str, object_names: List[str]) -> Dict[str, str]:
+        # remove_objects ленивый — ошибки приходят только при итерации
+        errors = self.client.remove_objects(
+            bucket_name, [DeleteObject(name) for name in object_names]
+        )
+        return {err.name: f"{err.code}: {err.message}" for err in errors}
+
     async def _delete_single_object(self, bucket_name: str, object_name: str) -> None:
         """Удаляет один объект по реальному имени бакета и ключу."""
-        await asyncio.to_thread(self._sync_remove_object, bucket_name, object_name)
+        await self._remove_object(bucket_name, object_name)
 
     def _sync_copy_object(self, bucket_name: str, src_object: str, dst_object: str) -> None:
         self.client.copy_object(bucket_name, dst_object, CopySource(bucket_name, src_object))
 
+    def _sync_object_exists(self, bucket_name: str, object_name: str) -> bool:
+        try:
+            self.client.stat_object(bucket_name, object_name)
+            return True
+        except Exception as e:
+            if getattr(e, "code", None) in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return False
+            raise
+
+    def _sync_object_metadata(self, bucket_name: str, object_name: str) -> Optional[Dict[str, str]]:
+        try:
+            stat = self.client.stat_object(bucket_name, object_name)
+        except Exception as e:
+            if getattr(e, "code", None) in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return None
+            raise
+        return {
+            name.lower().removeprefix("x-amz-meta-"): value
+            for name, value in (stat.metadata or {}).items()
+            if name.lower().startswith("x-amz-meta-")
+        }
+
     def _sync_get_object(self, bucket_name: str, object_name: str) -> bytes:
         response = self.client.get_object(bucket_name, object_name)
         try:
@@ -95,9 +191,57 @@ class StorageService:
             response.close()
             response.release_conn()
 
-    def _initialize_buckets(self) -> None:
+    def initialize_buckets(self) -> None:
+        """Создаёт бакеты и применяет политики. Вызывается один раз при старте процесса."""
         self._sync_initialize_buckets()
 
+    # --- Примитивы: выбор бэкенда (async httpx или minio в пуле потоков) ---
+
+    async def _put_object(
+        self, bucket_name: str, object_name: str, data: bytes, metadata: Optional[Dict[str, str]] = None,
+    ) -> None:
+        if self.async_backend:
+            await get_async_s3_client().put_object(bucket_name, object_name, data, metadata)
+        else:
+            await asyncio.to_thread(self._sync_put_object, bucket_name, object_name, data, metadata)
+
+    async def _get_object(self, bucket_name: str, object_name: str) -> bytes:
+        if self.async_backend:
+            return await get_async_s3_client().get_object(bucket_name, object_name)
+        return await asyncio.to_thread(self._sync_get_object, bucket_name, object_name)
+
+    async def _object_metadata(self, bucket_name: str, object_name: str) -> Optional[Dict[str, str]]:
+        if self.async_backend:
+            return await get_async_s3_client().object_metadata(bucket_name, object_name)
+        return await asyncio.to_thread(self._sync_object_metadata, bucket_name, object_name)
+
+    async def _object_exists(self, bucket_name: str, object_name: str) -> bool:
+        if self.async_backend:
+            return await get_async_s3_client().object_exists(bucket_name, object_name)
+        return await asyncio.to_thread(self._sync_object_exists, bucket_name, object_name)
+
+    async def _list_objects(self, bucket_name: str, prefix: str) -> List[str]:
+        if self.async_backend:
+            return await get_async_s3_client().list_objects(bucket_name, prefix)
+        return await asyncio.to_thread(self._sync_list_objects, bucket_name, prefix)
+
+    async def _copy_object(self, bucket_name: str, src_object: str, dst_object: str) -> None:
+        if self.async_backend:
+            await get_async_s3_client().copy_object(bucket_name, src_object, dst_object)
+        else:
+            await asyncio.to_thread(self._sync_copy_object, bucket_name, src_object, dst_object)
+
+    async def _remove_objects(self, bucket_name: str, object_names: List[str]) -> Dict[str, str]:
+        if self.async_backend:
+            return await get_async_s3_client().delete_objects(bucket_name, object_names)
+        return await asyncio.to_thread(self._sync_remove_objects, bucket_name, object_names)
+
+    async def _remove_object(self, bucket_name: str, object_name: str) -> None:
+        if self.async_backend:
+            await get_async_s3_client().remove_object(bucket_name, object_name)
+        else:
+            await asyncio.to_thread(self._sync_remove_object, bucket_name, object_name)
+
     async def create_project_structure(self, user_id: str, project_id: str = "000") -> None:
         base_path = f"projects/{user_id}/{project_id}"
         for directory in [f"{base_path}/src", f"{base_path}/build", f"{base_path}/snapshots"]:
@@ -120,11 +264,9 @@ class StorageService:
         try:
             logger.debug("Сохранение файла {} в бакет {}", object_name, self.BUCKETS[bucket_type])
             raw: bytes = data if isinstance(data, bytes) else data.getvalue()
-            await asyncio.to_thread(
-                self._sync_put_object,
-                self.BUCKETS[bucket_type],
-                object_name,
-                raw,
+            # SHA-256 содержимого в метаданных — по нему restore сверяет src/ с blob'ом
+            await self._put_object(
+                self.BUCKETS[bucket_type], object_name, raw, {"sha256": hashlib.sha256(raw).hexdigest()},
             )
             logger.info("Файл {} сохранён в бакет {}", object_name, self.BUCKETS[bucket_type])
         except Exception as e:
@@ -146,72 +288,183 @@ class StorageService:
             "Сохранено {} исходных файлов для проекта {}/{}", len(files), user_id, project_id
         )
 
+    @staticmethod
+    def blob_path(user_id: str, project_id: str, content_hash: str) -> str:
+        """Ключ content-addressed blob'а снапшота внутри проекта."""
+        return f"projects/{user_id}/{project_id}/blobs/{content_hash}"
+
+    async def save_blob(self, user_id: str, project_id: str, data: bytes) -> str:
+        """Сохраняет содержимое файла снапшота как blob по SHA-256 и возвращает хэш.
+
+        Если blob с таким хэшем уже есть, загрузка пропускается: одинаковые
+        версии файла хранятся один раз. Blob'ы лежат внутри префикса проекта,
+        поэтому удаляются вместе с ним.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        object_name = self.blob_path(user_id, project_id, content_hash)
+        bucket_name = self.BUCKETS["projects"]
+        try:
+            if await self._object_exists(bucket_name, object_name):
+                logger.debug("Blob {} уже существует, загрузка пропущена", object_name)
+                return content_hash
+            await self._put_object(bucket_name, object_name, data)
+            logger.info("Blob {} сохранён ({} байт)", object_name, len(data))
+        except Exception as e:
+            logger.error("Ошибка сохранения blob {}: {}", object_name, str(e))
+            raise Exception(f"Error saving blob to MinIO: {str(e)}")
+        return content_hash
+
     async def create_directory(self, bucket_type: str, directory: str) -> None:
         if bucket_type not in self.BUCKETS:
             raise ValueError(f"Invalid bucket type: {bucket_type}")
         try:
             dir_key = directory if directory.endswith("/") else directory + "/"
-            await asyncio.to_thread(
-                self._sync_put_object,
-                self.BUCKETS[bucket_type],
-                dir_key,
-                b"",
-            )
+            await self._put_object(self.BUCKETS[bucket_type], dir_key, b"")
         except Exception as e:
             logger.error("Ошибка создания директории {} в бакете {}: {}", directory, self.BUCKETS[bucket_type], str(e))
             raise Exception(f"Error creating directory in MinIO: {str(e)}")
 
-    async def delete_directory(self, bucket_type: str, prefix: str) -> None:
+    async def delete_objects(self, bucket_type: str, object_names: List[str]) -> Dict[str, str]:
+        """Удаляет объекты пачками по DELETE_BATCH_SIZE через S3 Multi-Object Delete.
+
+        Возвращает {ключ: ошибка} для объектов, которые удалить не удалось
+        (пустой dict — всё удалено). Ошибка транспорта пробрасывается как Exception.
+        """
         if bucket_type not in self.BUCKETS:
             raise ValueError(f"Invalid bucket type: {bucket_type}")
+        if not object_names:
+            return {}
+        bucket_name = self.BUCKETS[bucket_type]
+        batches = [
+            object_names[i:i + self.DELETE_BATCH_SIZE]
+            for i in range(0, len(object_names), self.DELETE_BATCH_SIZE)
+        ]
         try:
-            bucket_name = self.BUCKETS[bucket_type]
-            object_names: List[str] = await asyncio.to_thread(
-                self._sync_list_objects, bucket_name, prefix
+            results = await asyncio.gather(
+                *[self._remove_objects(bucket_name, batch) for batch in batches]
             )
-            for name in object_names:
-                await asyncio.to_thread(self._sync_remove_object, bucket_name, name)
+        except Exception as e:
+            logger.error("Ошибка пакетного удаления из бакета {}: {}", bucket_name, str(e))
+            raise Exception(f"Error deleting objects from MinIO: {str(e)}")
+
+        errors: Dict[str, str] = {}
+        for batch_errors in results:
+            errors.update(batch_errors)
+        for name, reason in errors.items():
+            logger.warning("Не удалось удалить {} из бакета {}: {}", name, bucket_name, reason)
+        logger.info(
+            "Удалено {}/{} объектов из бакета {} ({} запросов)",
+            len(object_names) - len(errors), len(object_names), bucket_name, len(batches),
+        )
+        return errors
+
+    async def delete_directory(self, bucket_type: str, prefix: str) -> Dict[str, str]:
+        """Удаляет все объекты под prefix. Возвращает {ключ: ошибка} — см. delete_objects."""
+        if bucket_type not in self.BUCKETS:
+            raise ValueError(f"Invalid bucket type: {bucket_type}")
+        try:
+            object_names: List[str] = await self._list_objects(self.BUCKETS[bucket_type], prefix)
         except Exception as e:
             logger.error("Ошибка удаления директории {} из бакета {}: {}", prefix, self.BUCKETS[bucket_type], str(e))
             raise Exception(f"Error deleting directory from MinIO: {str(e)}")
+        return await self.delete_objects(bucket_type, object_names)
 
     async def list_files(self, bucket_type: str, prefix: str) -> List[str]:
         if bucket_type not in self.BUCKETS:
             raise ValueError(f"Invalid bucket type: {bucket_type}")
         try:
-            return await asyncio.to_thread(
-                self._sync_list_objects, self.BUCKETS[bucket_type], prefix
-            )
+            return await self._list_objects(self.BUCKETS[bucket_type], prefix)
         except Exception as e:
             logger.error("Ошибка получения списка файлов в бакете {}: {}", self.BUCKETS[bucket_type], str(e))
             raise Exception(f"Error listing files in MinIO: {str(e)}")
 
-    async def copy_directory(self, bucket_type: str, src_prefix: str, dst_prefix: str) -> None:
-        """Копирует все объекты из src_prefix в dst_prefix внутри одного бакета."""
+    async def copy_directory(
+        self,
+        bucket_type: str,
+        src_prefix: str,
+        dst_prefix: str,
+        *,
+        move: bool = False,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """Копирует все объекты из src_prefix в dst_prefix внутри одного бакета.
+
+        Серверные copy_object идут параллельно — не больше concurrency
+        (по умолчанию STORAGE_COPY_CONCURRENCY) одновременно; каждый объект
+        повторяется до COPY_ATTEMPTS раз. on_progress(done, total) вызывается
+        после каждого скопированного объекта. move=True после успешного
+        копирования пакетно удаляет исходные объекты. Возвращает число объектов.
+        """
         if bucket_type not in self.BUCKETS:
             raise ValueError(f"Invalid bucket type: {bucket_type}")
         bucket_name = self.BUCKETS[bucket_type]
         src_prefix = src_prefix.rstrip("/") + "/"
         dst_prefix = dst_prefix.rstrip("/") + "/"
+        semaphore = asyncio.Semaphore(concurrency or settings.STORAGE_COPY_CONCURRENCY)
+        done = 0
+
+        async def _copy_one(src_obj: str, total: int) -> None:
+            nonlocal done
+            dst_obj = dst_prefix + src_obj[len(src_prefix):]
+            async with semaphore:
+                for attempt in range(1, self.COPY_ATTEMPTS + 1):
+                    try:
+                        await self._copy_object(bucket_name, src_obj, dst_obj)
+                        break
+                    except Exception as e:
+                        if attempt == self.COPY_ATTEMPTS:
+                            raise
+                        logger.warning(
+                            "Повтор копирования {} ({}/{}): {}", src_obj, attempt, self.COPY_ATTEMPTS, str(e)
+                        )
+                        await asyncio.sleep(self.COPY_RETRY_DELAY * 2 ** (attempt - 1))
+            done += 1
+            if on_progress is not None:
+                on_progress(done, total)
+
         try:
-            object_names: List[str] = await asyncio.to_thread(
-                self._sync_list_objects, bucket_name, src_prefix
+            object_names: List[str] = await self._list_objects(bucket_name, src_prefix)
+            total = len(object_names)
+            results = await asyncio.gather(
+                *[_copy_one(name, total) for name in object_names], return_exceptions=True
             )
-            for src_obj in object_names:
-                dst_obj = dst_prefix + src_obj[len(src_prefix):]
-                await asyncio.to_thread(self._sync_copy_object, bucket_name, src_obj, dst_obj)
-            logger.info("Скопировано {} объектов из {} в {}", len(object_names), src_prefix, dst_prefix)
+            failed = {name: res for name, res in zip(object_names, results) if isinstance(res, Exception)}
+            if failed:
+                first_name, first_error = next(iter(failed.items()))
+                raise RuntimeError(f"{len(failed)}/{total} objects failed, first {first_name}: {first_error}")
+            logger.info("Скопировано {} объектов из {} в {}", total, src_prefix, dst_prefix)
         except Exception as e:
             logger.error("Ошибка копирования директории {} -> {}: {}", src_prefix, dst_prefix, str(e))
             raise Exception(f"Error copying directory in MinIO: {str(e)}")
 
+        if move:
+            errors = await self.delete_objects(bucket_type, object_names)
+            if errors:
+                logger.warning("Перенос {} -> {}: не удалено {} исходных объектов", src_prefix, dst_prefix, len(errors))
+        return total
+
+    async def get_content_hash(self, bucket_type: str, object_name: str) -> Optional[str]:
+        """SHA-256 содержимого объекта, записанный save_file, без чтения самого объекта.
+
+        None — объекта нет, он записан без хэша (до появления метаданных) или
+        HEAD не удался: вызывающий должен считать содержимое неизвестным.
+        """
+        if bucket_type not in self.BUCKETS:
+            raise ValueError(f"Invalid bucket type: {bucket_type}")
+        try:
+            metadata = await self._object_metadata(self.BUCKETS[bucket_type], object_name)
+        except Exception as e:
+            logger.warning("Не удалось прочитать метаданные {}: {}", object_name, str(e))
+            return None
+        return (metadata or {}).get("sha256")
+
     async def get_file(self, bucket_type: str, object_name: str) -> Optional[bytes]:
         if bucket_type not in self.BUCKETS:
             raise ValueError(f"Invalid bucket type: {bucket_type}")
         try:
-            return await asyncio.to_thread(
-                self._sync_get_object, self.BUCKETS[bucket_type], object_name
-            )
+            return await self._get_object(self.BUCKETS[bucket_type], object_name)
         except Exception as e:
             logger.error("Ошибка чтения файла {} из бакета {}: {}", object_name, self.BUCKETS[bucket_type], str(e))
-            raise Exception(f"Error reading file from MinIO: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error reading file from MinIO: {str(e)}")
+
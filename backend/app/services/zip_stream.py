@@ -0,0 +1,53 @@
+"""Потоковая запись ZIP: архив отдаётся кусками по мере добавления файлов.
+
+zipfile пишет в несикабельный поток с data descriptor'ами, поэтому весь
+архив в памяти не держится — только текущий файл и central directory
+(метаданные записей) до конца архива.
+"""
+from __future__ import annotations
+
+import asyncio
+import zipfile
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+
+class _ChunkSink:
+    """Несикабельный file-like для zipfile: копит записанное до drain()."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(
+    entries: AsyncIterable[Tuple[str, Optional[bytes]]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> AsyncIterator[bytes]:
+    """Превращает поток (имя в архиве, содержимое) в поток байт ZIP-архива.
+
+    Записи с содержимым None пропускаются. Сжатие выполняется в потоке,
+    чтобы крупные файлы не блокировали event loop.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as zf:
+        async for arc_name, data in entries:
+            if data is None:
+                continue
+            await asyncio.to_thread(zf.writestr, arc_name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    tail = sink.drain()  # central directory
+    if tail:
+        yield tail
@@ -1,5 +1,5 @@
 """Инициализация Celery — broker RabbitMQ, result backend Redis."""
-from celery import Celery
+from celery import Celery, signals
 
 from app.core.config import settings
 
@@ -13,6 +13,7 @@ celery_app = Celery(
         "app.workers.tasks.deploy",
         "app.workers.tasks.edit",
         "app.workers.tasks.sync_users",
+        "app.workers.tasks.storage",
     ],
 )
 
@@ -31,6 +32,7 @@ celery_app.conf.update(
         "build.run": {"queue": "build"},
         "deploy.run": {"queue": "deploy"},
         "edit.edit_element": {"queue": "generation"},
+        "edit.edit_batch": {"queue": "generation"},
     },
     # Периодические задачи (Celery Beat)
     beat_schedule={
@@ -40,3 +42,21 @@ celery_app.conf.update(
         },
     },
 )
+
+
+@signals.worker_init.connect
+def _bootstrap_storage(**kwargs) -> None:
+    """Создаёт бакеты MinIO один раз при старте воркера (до fork дочерних процессов)."""
+    from app.services.storage import StorageService, reset_minio_client  # noqa: PLC0415
+
+    StorageService().initialize_buckets()
+    # клиент создан в родительском процессе — дочерние должны открыть свой пул
+    reset_minio_client()
+
+
+@signals.worker_process_init.connect
+def _reset_storage_client(**kwargs) -> None:
+    """После fork сбрасываем унаследованный пул соединений MinIO."""
+    from app.services.storage import reset_minio_client  # noqa: PLC0415
+
+    reset_minio_client()
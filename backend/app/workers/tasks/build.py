@@ -8,10 +8,15 @@ from uuid import UUID
 
 import redis as redis_lib
 
+from app.agents.editor import EditorAgent
 from app.core.config import settings
 from app.db.database import AsyncSessionFactory, engine
 from app.repositories import project as project_repo
+from app.repositories import snapshot as snapshot_repo
+from app.services.build_repair import error_excerpt, failing_files, failure_fingerprint
 from app.services.kubernetes import KubernetesService
+from app.services.llm_client import run_with_llm_clients
+from app.services.storage import StorageService
 from app.workers.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
@@ -23,14 +28,34 @@ _BUILD_TIMEOUT = 600        # максимальное время ожидани
 _BUILD_LOCK_TTL = _BUILD_TIMEOUT + 120   # лок истекает даже если воркер упал
 
 
+class BuildFailedError(RuntimeError):
+    """Job сборки завершился с ошибкой (в отличие от сбоев K8s API и таймаутов)."""
+
+    def __init__(self, message: str, logs: str) -> None:
+        super().__init__(message)
+        self.logs = logs
+
+
 @celery_app.task(bind=True, name="build.run", max_retries=10, time_limit=900)
-def run_build(self, project_id: str, user_id: str) -> dict:
+def run_build(
+    self,
+    project_id: str,
+    user_id: str,
+    repair_attempt: int = 0,
+    last_failure: str = "",
+) -> dict:
     """
     1. Захватывает Redis-лок на project_id, чтобы одновременно выполнялся только один билд.
     2. Создаёт K8s Job через KubernetesService (job копирует dist/ в MinIO внутри контейнера).
     3. Ждёт завершения Job (polling).
     4. Обновляет project.status = "ready" в БД.
     5. Пишет финальный статус в Redis.
+
+    Если упала сама сборка (BuildFailedError), те же исходники повторно не
+    собираются: A4 чинит файлы из лога (_repair), правка пишется версией
+    снапшота, и только тогда — пересборка; не больше BUILD_REPAIR_MAX_ATTEMPTS
+    раз.  Та же ошибка после починки или нечего чинить — сразу "failed".
+    Сбои K8s API и таймауты по-прежнему просто повторяются.
     """
     r = redis_lib.from_url(settings.REDIS_URL)
     lock = r.lock(f"build:{project_id}:lock", timeout=_BUILD_LOCK_TTL, blocking=False)
@@ -42,6 +67,32 @@ def run_build(self, project_id: str, user_id: str) -> dict:
 
     try:
         asyncio.run(_run(project_id, user_id))
+    except BuildFailedError as exc:
+        excerpt = error_excerpt(exc.logs, settings.BUILD_REPAIR_LOG_CHARS)
+        fingerprint = failure_fingerprint(excerpt)
+        repaired = False
+        if fingerprint == last_failure:
+            logger.error("Build for project %s failed with the same error after repair", project_id)
+        elif repair_attempt >= settings.BUILD_REPAIR_MAX_ATTEMPTS:
+            logger.error("Build for project %s still failing after %d repair(s)", project_id, repair_attempt)
+        else:
+            try:
+                repaired = asyncio.run(run_with_llm_clients(
+                    _repair(project_id, user_id, exc.logs, excerpt, repair_attempt + 1)
+                ))
+            except Exception:
+                logger.exception("Build repair failed for project %s", project_id)
+
+        if not repaired:
+            _set_redis_status(project_id, "failed", 0, error=excerpt[-1000:])
+            raise
+        _set_redis_status(project_id, "building", 80, repair=repair_attempt + 1)
+        raise self.retry(
+            exc=exc,
+            countdown=5,
+            args=(project_id, user_id),
+            kwargs={"repair_attempt": repair_attempt + 1, "last_failure": fingerprint},
+        )
     except Exception as exc:
         logger.exception("Build failed for project %s: %s", project_id, exc)
         is_last_retry = self.request.retries >= self.max_retries
@@ -112,7 +163,7 @@ async def _build(project_id: str, user_id: str) -> None:
         if status == "Failed":
             logs = await k8s.get_pod_logs(job_name)
             logger.error("Build job %s failed. Logs:\n%s", job_name, logs)
-            raise RuntimeError(f"Build job {job_name} failed. See logs above.")
+            raise BuildFailedError(f"Build job {job_name} failed. See logs above.", logs)
     else:
         raise TimeoutError(f"Build job {job_name} did not finish within {_BUILD_TIMEOUT}s")
 
@@ -127,3 +178,65 @@ async def _build(project_id: str, user_id: str) -> None:
     preview_url = f"{settings.MINIO_PUBLIC_URL}/astro-projects/projects/{user_id}/{project_id}/build/index.html"
     _set_redis_status(project_id, "done", 100, preview_url=preview_url)
     logger.info("Project %s is ready, preview_url=%s", project_id, preview_url)
+
+
+async def _repair(project_id: str, user_id: str, logs: str, excerpt: str, attempt: int) -> bool:
+    """A4 чинит файлы, на которые указывает лог сборки; True — исходники изменены.
+
+    Исправленные файлы пишутся в src/ и одной новой версией снапшота.
+    """
+    await engine.dispose()
+    storage = StorageService()
+    prefix = f"projects/{user_id}/{project_id}/src/"
+    all_paths = await storage.list_files("projects", prefix)
+    relative_paths = [p[len(prefix):] for p in all_paths if not p.endswith("/") and p[len(prefix):]]
+
+    paths = failing_files(logs, relative_paths)[:settings.BUILD_REPAIR_MAX_FILES]
+    if not paths:
+        logger.warning("Build log of project %s names no source files, nothing to repair", project_id)
+        return False
+    logger.info("Build repair #%d for project %s: %s", attempt, project_id, paths)
+
+    raws = await asyncio.gather(*(storage.get_file("projects", f"{prefix}{p}") for p in paths))
+    agent = EditorAgent()
+
+    async def _fix(rel_path: str, raw: bytes | None) -> bytes | None:
+        if raw is None:
+            return None
+        try:
+            fixed = await agent.fix_build_error(
+                edited_code=raw.decode("utf-8"),
+                stderr=excerpt,
+                prompt=f"Исправь ошибку сборки в файле {rel_path}, не меняя содержимое и вёрстку.",
+                file_path=rel_path,
+            )
+        except Exception:
+            logger.warning("fix_build_error failed for %s", rel_path, exc_info=True)
+            return None
+        new_bytes = fixed.encode("utf-8")
+        return new_bytes if new_bytes.strip() and new_bytes != raw else None
+
+    results = await asyncio.gather(*(_fix(p, raw) for p, raw in zip(paths, raws)))
+    fixed = [(p, new_bytes) for p, new_bytes in zip(paths, results) if new_bytes is not None]
+    if not fixed:
+        return False
+
+    # I/O MinIO — до allocate_version: она держит блокировку строки проекта до commit
+    changed: dict[str, snapshot_repo.FileVersion] = {}
+    for rel_path, new_bytes in fixed:
+        await storage.save_file("projects", f"{prefix}{rel_path}", new_bytes)
+        content_hash = await storage.save_blob(user_id, project_id, new_bytes)
+        changed[rel_path] = snapshot_repo.FileVersion(content_hash, len(new_bytes))
+    async with AsyncSessionFactory() as db:
+        new_version = await snapshot_repo.allocate_version(db, UUID(project_id))
+        await snapshot_repo.create(
+            db,
+            project_id=UUID(project_id),
+            version=new_version,
+            files=changed,
+            description=f"Build repair #{attempt}: {', '.join(changed)}",
+        )
+        await project_repo.set_active_snapshot_version(db, UUID(project_id), new_version)
+        await db.commit()
+    logger.info("Snapshot v%d created by build repair of project %s", new_version, project_id)
+    return True
@@ -14,6 +14,10 @@ from app.core.config import settings
 from app.db.database import AsyncSessionFactory, engine
 from app.repositories import project as project_repo
 from app.repositories import snapshot as snapshot_repo
+from app.services.astro_validator import TEMPLATE_FILES, validate_file
+from app.services.element_locator import line_window, locate_element
+from app.services.element_ops import ElementOpError, apply_operation
+from app.services.llm_client import run_with_llm_clients
 from app.services.storage import StorageService
 from app.workers.celery_app import celery_app
 
@@ -51,7 +55,7 @@ def edit_element(
     try:
         asyncio.run(engine.dispose())
         if file_path == "*":
-            asyncio.run(
+            asyncio.run(run_with_llm_clients(
                 _edit_all_files(
                     project_id=project_id,
                     user_id=user_id,
@@ -60,9 +64,9 @@ def edit_element(
                     project_context=project_context,
                     storage=storage,
                 )
-            )
+            ))
         else:
-            asyncio.run(
+            asyncio.run(run_with_llm_clients(
                 _edit(
                     project_id=project_id,
                     user_id=user_id,
@@ -74,7 +78,7 @@ def edit_element(
                     project_context=project_context,
                     storage=storage,
                 )
-            )
+            ))
     except Exception as exc:
         logger.exception("Edit task failed for project %s: %s", project_id, exc)
         _set_redis_status(project_id, "failed", 0)
@@ -83,21 +87,112 @@ def edit_element(
     return {"project_id": project_id, "file_path": file_path, "status": "building"}
 
 
+@celery_app.task(bind=True, name="edit.edit_batch", max_retries=2)
+def edit_batch(
+    self,
+    project_id: str,
+    user_id: str,
+    edits: list[dict],
+    ai_model: str = "gpt-5.4",
+    project_context: str = "",
+) -> dict:
+    """Пакет правок элементов (POST /editor/edit/batch): одна версия, одна сборка.
+
+    edits: [{"file_path", "element_id", "element_html", "instruction",
+             "operation": {"type", "value", "name"} | None}]
+    """
+    try:
+        storage = StorageService()
+    except Exception as exc:
+        logger.exception("Failed to initialize StorageService for project %s", project_id)
+        _set_redis_status(project_id, "failed", 0)
+        raise self.retry(exc=exc, countdown=10)
+
+    try:
+        asyncio.run(engine.dispose())
+        report = asyncio.run(run_with_llm_clients(
+            _edit_batch(
+                project_id=project_id,
+                user_id=user_id,
+                edits=edits,
+                ai_model=ai_model,
+                project_context=project_context,
+                storage=storage,
+            )
+        ))
+    except Exception as exc:
+        logger.exception("Batch edit task failed for project %s: %s", project_id, exc)
+        _set_redis_status(project_id, "failed", 0)
+        raise self.retry(exc=exc, countdown=10)
+
+    return {
+        "project_id": project_id,
+        "edits": len(report["applied"]),
+        **report,
+        "status": "building",
+    }
+
+
 # ---------------------------------------------------------------------------
 # Вспомогательные функции
 # ---------------------------------------------------------------------------
 
-def _set_redis_status(project_id: str, stage: str, progress: int) -> None:
+def _set_redis_status(project_id: str, stage: str, progress: int, **extra) -> None:
     try:
         r = redis_lib.from_url(settings.REDIS_URL)
         r.set(
             f"generation:{project_id}:status",
-            json.dumps({"stage": stage, "progress": progress}),
+            json.dumps({"stage": stage, "progress": progress, **extra}),
         )
     except Exception:
         logger.warning("Could not write Redis status for project %s", project_id)
 
 
+async def _list_sources(storage: StorageService, prefix: str) -> list[str]:
+    """Пути src/-файлов проекта относительно prefix; при ошибке MinIO — пусто."""
+    try:
+        all_paths = await storage.list_files("projects", prefix)
+    except Exception:
+        logger.warning("Could not list %s for validation", prefix, exc_info=True)
+        return []
+    return [p[len(prefix):] for p in all_paths if not p.endswith("/") and p[len(prefix):]]
+
+
+async def _validate_edit(
+    agent: EditorAgent,
+    rel_path: str,
+    original: str,
+    code: str,
+    known_paths: list[str],
+    prompt: str,
+) -> str:
+    """Проверка правки до сборки (astro_validator).
+
+    Новые проблемы — которых не было в original — отдаются A4 на одну попытку
+    починки; если она не помогла, остаётся правка как есть (дальше сработает
+    починка по логу сборки).
+    """
+    if not settings.PREBUILD_VALIDATION:
+        return code
+    path = f"src/{rel_path.lstrip('/')}"
+    known = {f"src/{p.lstrip('/')}" for p in known_paths} | TEMPLATE_FILES | {path}
+    before = set(validate_file(path, original, known))
+    problems = [p for p in validate_file(path, code, known) if p not in before]
+    if not problems:
+        return code
+
+    logger.warning("Edit of %s introduced problems: %s", rel_path, problems)
+    try:
+        fixed = await agent.fix_build_error(
+            edited_code=code, stderr="\n".join(problems), prompt=prompt, file_path=rel_path.lstrip("/"),
+        )
+    except Exception:
+        logger.warning("fix_build_error failed for %s", rel_path, exc_info=True)
+        return code
+    remaining = [p for p in validate_file(path, fixed, known) if p not in before]
+    return fixed if len(remaining) < len(problems) else code
+
+
 async def _edit(
     project_id: str,
     user_id: str,
@@ -124,17 +219,47 @@ async def _edit(
     logger.info("Downloaded file %s (%d bytes)", minio_src_path, len(raw))
     _set_redis_status(project_id, "editing", 20)
 
-    # 2. A4 — генерируем новый код файла
+    # 2. A4 — генерируем новый код: только фрагмент вокруг элемента, если он найден
     _set_redis_status(project_id, "editing", 25)
     agent = EditorAgent(model=ai_model)
-    new_code = await agent.edit(
-        current_code=current_code,
-        element_id=element_id,
-        element_html=element_html,
-        prompt=prompt,
-        project_context=project_context,
-    )
+    span = None
+    if element_id and settings.EDITOR_ELEMENT_SCOPE:
+        span = locate_element(current_code, file_path, element_id)
+        if span is None:
+            logger.info("Element %s not located in %s, sending whole file", element_id, file_path)
+
+    if span is not None:
+        start, end = line_window(current_code, span, settings.EDITOR_CONTEXT_LINES)
+        new_fragment = await agent.edit(
+            current_code=current_code[start:end],
+            element_id=element_id,
+            element_html=element_html,
+            prompt=prompt,
+            project_context=project_context,
+            fragment_of=file_path.lstrip("/"),
+            element_tag=span.open_tag,
+        )
+        if current_code[end - 1:end] == "\n" and not new_fragment.endswith("\n"):
+            new_fragment += "\n"
+        new_code = current_code[:start] + new_fragment + current_code[end:]
+        logger.info(
+            "EditorAgent edited %d-char fragment of %s (%d chars total)",
+            end - start, file_path, len(current_code),
+        )
+    else:
+        new_code = await agent.edit(
+            current_code=current_code,
+            element_id=element_id,
+            element_html=element_html,
+            prompt=prompt,
+            project_context=project_context,
+            file_path=file_path.lstrip("/"),
+        )
     logger.info("EditorAgent produced %d chars for %s", len(new_code), file_path)
+    known_paths = (
+        await _list_sources(storage, f"projects/{user_id}/{project_id}/src/") if settings.PREBUILD_VALIDATION else []
+    )
+    new_code = await _validate_edit(agent, file_path, current_code, new_code, known_paths, prompt)
     _set_redis_status(project_id, "editing", 55)
 
     # 3. Сохранить обновлённый файл в MinIO
@@ -143,20 +268,19 @@ async def _edit(
     logger.info("Updated file saved: %s", minio_src_path)
     _set_redis_status(project_id, "editing", 65)
 
-    # 4. Создать снапшот нового состояния (версия = результат правки)
+    # 4. Создать снапшот нового состояния (версия = результат правки).
+    # Blob пишется до allocate_version: она держит блокировку строки проекта
+    # до commit, и I/O MinIO под ней задерживал бы другие правки проекта
+    content_hash = await storage.save_blob(user_id, project_id, new_bytes)
     async with AsyncSessionFactory() as db:
-        latest_version = await snapshot_repo.get_latest_version(db, UUID(project_id))
-        new_version = latest_version + 1
-        snapshot_path = f"projects/{user_id}/{project_id}/snapshots/v{new_version}/{file_path.lstrip('/')}"
-
-        await storage.save_file("projects", snapshot_path, new_bytes)
-        logger.info("Snapshot saved: %s", snapshot_path)
+        new_version = await snapshot_repo.allocate_version(db, UUID(project_id))
+        logger.info("Snapshot v%d: %s (blob %s)", new_version, file_path, content_hash)
 
         await snapshot_repo.create(
             db,
             project_id=UUID(project_id),
             version=new_version,
-            minio_path=snapshot_path,
+            files={file_path.lstrip("/"): snapshot_repo.FileVersion(content_hash, len(new_bytes))},
             description=f"AI edit: {prompt[:200]}",
         )
         await project_repo.set_active_snapshot_version(db, UUID(project_id), new_version)
@@ -223,55 +347,73 @@ async def _edit_all_files(
 
     total = len(plan)
     agent = EditorAgent(model=ai_model)
-    edited: list[tuple[str, bytes]] = []
 
-    # 3. Редактируем только файлы из плана, каждый со своей инструкцией
-    for i, (rel_path, file_instruction) in enumerate(plan.items()):
-        progress = 15 + int(50 * i / total)
-        _set_redis_status(project_id, "editing", progress)
+    # 3. Читаем все файлы плана разом, правим параллельно (не больше
+    #    EDITOR_MAX_CONCURRENCY LLM-вызовов), прогресс — по мере готовности
+    raws = await asyncio.gather(*(
+        storage.get_file("projects", f"{prefix}{rel_path}") for rel_path in plan
+    ))
+    semaphore = asyncio.Semaphore(max(1, settings.EDITOR_MAX_CONCURRENCY))
+    done = 0
 
+    async def _edit_one(rel_path: str, file_instruction: str, raw: bytes | None) -> bytes | None:
+        nonlocal done
         minio_path = f"{prefix}{rel_path}"
-        raw = await storage.get_file("projects", minio_path)
         if raw is None:
             logger.warning("File not found, skipping: %s", minio_path)
-            continue
-
-        try:
-            new_code = await agent.edit(
-                current_code=raw.decode("utf-8"),
-                element_id="",
-                prompt=file_instruction,
-                project_context=project_context,
-            )
-            new_bytes = new_code.encode("utf-8")
-        except Exception:
-            logger.warning("EditorAgent failed for %s, keeping original", rel_path, exc_info=True)
-            new_bytes = raw
+            return None
+
+        async with semaphore:
+            try:
+                new_code = await agent.edit(
+                    current_code=raw.decode("utf-8"),
+                    element_id="",
+                    prompt=file_instruction,
+                    project_context=project_context,
+                    file_path=rel_path,
+                )
+                new_code = await _validate_edit(
+                    agent, rel_path, raw.decode("utf-8"), new_code, relative_paths, file_instruction,
+                )
+                new_bytes = new_code.encode("utf-8")
+            except Exception:
+                logger.warning("EditorAgent failed for %s, keeping original", rel_path, exc_info=True)
+                new_bytes = raw
 
         await storage.save_file("projects", minio_path, new_bytes)
-        edited.append((rel_path, new_bytes))
-        logger.info("Edited %s (%d/%d)", rel_path, i + 1, total)
+        done += 1
+        _set_redis_status(project_id, "editing", 15 + int(50 * done / total))
+        logger.info("Edited %s (%d/%d)", rel_path, done, total)
+        return new_bytes
+
+    results = await asyncio.gather(*(
+        _edit_one(rel_path, file_instruction, raw)
+        for (rel_path, file_instruction), raw in zip(plan.items(), raws)
+    ))
+    edited: list[tuple[str, bytes]] = [
+        (rel_path, new_bytes) for rel_path, new_bytes in zip(plan, results) if new_bytes is not None
+    ]
 
     _set_redis_status(project_id, "editing", 65)
 
     if not edited:
         raise RuntimeError(f"No files were successfully edited for project {project_id}")
 
-    # 3. Создать снапшот (по одной записи на файл, одинаковая версия)
+    # 3. Создать снапшот (одна версия, в манифесте — все изменённые файлы);
+    # blob'ы — до allocate_version, чтобы не держать блокировку строки проекта
+    changed: dict[str, snapshot_repo.FileVersion] = {}
+    for rel_path, new_bytes in edited:
+        content_hash = await storage.save_blob(user_id, project_id, new_bytes)
+        changed[rel_path] = snapshot_repo.FileVersion(content_hash, len(new_bytes))
     async with AsyncSessionFactory() as db:
-        latest_version = await snapshot_repo.get_latest_version(db, UUID(project_id))
-        new_version = latest_version + 1
-
-        for rel_path, new_bytes in edited:
-            snapshot_path = f"projects/{user_id}/{project_id}/snapshots/v{new_version}/{rel_path}"
-            await storage.save_file("projects", snapshot_path, new_bytes)
-            await snapshot_repo.create(
-                db,
-                project_id=UUID(project_id),
-                version=new_version,
-                minio_path=snapshot_path,
-                description=f"AI edit (all files): {prompt[:200]}",
-            )
+        new_version = await snapshot_repo.allocate_version(db, UUID(project_id))
+        await snapshot_repo.create(
+            db,
+            project_id=UUID(project_id),
+            version=new_version,
+            files=changed,
+            description=f"AI edit (all files): {prompt[:200]}",
+        )
 
         await project_repo.set_active_snapshot_version(db, UUID(project_id), new_version)
         await db.commit()
@@ -283,3 +425,142 @@ async def _edit_all_files(
     from app.workers.tasks.build import run_build  # noqa: PLC0415
     run_build.delay(project_id, user_id)
     logger.info("Build task queued for project %s after all-files edit", project_id)
+
+
+async def _edit_batch(
+    project_id: str,
+    user_id: str,
+    edits: list[dict],
+    ai_model: str,
+    project_context: str,
+    storage: StorageService,
+) -> dict[str, list[dict]]:
+    """Правки группируются по файлам: на файл — операции без LLM и не больше
+    одного вызова A4 (edit_many) на все его инструкции; затем один снапшот
+    и одна сборка на весь пакет.
+
+    Возвращает {"applied": [...], "skipped": [...]} — {"file_path", "element_id"}
+    каждой правки, у пропущенных ещё "reason"; то же уходит в статус сборки.
+    """
+    _set_redis_status(project_id, "editing", 10)
+    by_file: dict[str, list[dict]] = {}
+    for item in edits:
+        by_file.setdefault(item["file_path"].lstrip("/"), []).append(item)
+    logger.info(
+        "Batch edit started: project=%s user=%s edits=%d files=%d",
+        project_id, user_id, len(edits), len(by_file),
+    )
+
+    prefix = f"projects/{user_id}/{project_id}/src/"
+    raws = await asyncio.gather(*(
+        storage.get_file("projects", f"{prefix}{rel_path}") for rel_path in by_file
+    ))
+    for rel_path, raw in zip(by_file, raws):
+        if raw is None:
+            raise FileNotFoundError(f"File not found in MinIO: {prefix}{rel_path}")
+    _set_redis_status(project_id, "editing", 20)
+    known_paths = await _list_sources(storage, prefix) if settings.PREBUILD_VALIDATION else []
+
+    agent = EditorAgent(model=ai_model)
+    semaphore = asyncio.Semaphore(max(1, settings.EDITOR_MAX_CONCURRENCY))
+    total = len(by_file)
+    done = 0
+
+    applied: list[dict] = []
+    skipped: list[dict] = []
+
+    def _ref(rel_path: str, item: dict) -> dict:
+        return {"file_path": rel_path, "element_id": item["element_id"]}
+
+    async def _edit_file(rel_path: str, items: list[dict], raw: bytes) -> bytes | None:
+        nonlocal done
+        code = raw.decode("utf-8")
+        file_applied: list[dict] = []
+
+        # 1. Операции без LLM; неприменимые с инструкцией уходят в A4
+        ai_items: list[dict] = []
+        for item in items:
+            op = item.get("operation")
+            if op:
+                try:
+                    code = apply_operation(
+                        code, rel_path, item["element_id"], op["type"], op["value"], name=op.get("name"),
+                    )
+                    file_applied.append(_ref(rel_path, item))
+                    continue
+                except ElementOpError as exc:
+                    if not (item.get("instruction") or "").strip():
+                        logger.warning("Operation skipped for %s in %s: %s", item["element_id"], rel_path, exc)
+                        skipped.append({**_ref(rel_path, item), "reason": str(exc)})
+                        continue
+            ai_items.append(item)
+
+        # 2. Все инструкции файла — одним вызовом A4
+        if ai_items:
+            targets = []
+            for item in ai_items:
+                span = locate_element(code, rel_path, item["element_id"])
+                targets.append({
+                    "element_id": item["element_id"],
+                    "prompt": item["instruction"],
+                    "element_html": item.get("element_html", ""),
+                    "element_tag": span.open_tag if span else "",
+                })
+            async with semaphore:
+                try:
+                    edited = await agent.edit_many(
+                        code, targets, project_context=project_context, file_path=rel_path,
+                    )
+                    code = await _validate_edit(
+                        agent, rel_path, code, edited, known_paths,
+                        "; ".join(item["instruction"] for item in ai_items),
+                    )
+                    file_applied += [_ref(rel_path, item) for item in ai_items]
+                except Exception as exc:
+                    logger.warning("EditorAgent failed for %s, keeping original", rel_path, exc_info=True)
+                    skipped.extend({**_ref(rel_path, item), "reason": f"AI edit failed: {exc}"} for item in ai_items)
+
+        done += 1
+        _set_redis_status(project_id, "editing", 20 + int(45 * done / total))
+        new_bytes = code.encode("utf-8")
+        if new_bytes == raw:
+            skipped.extend({**ref, "reason": "no changes"} for ref in file_applied)
+            return None
+        applied.extend(file_applied)
+        await storage.save_file("projects", f"{prefix}{rel_path}", new_bytes)
+        logger.info("Batch edited %s: %d edit(s)", rel_path, len(items))
+        return new_bytes
+
+    results = await asyncio.gather(*(
+        _edit_file(rel_path, items, raw) for (rel_path, items), raw in zip(by_file.items(), raws)
+    ))
+    edited = [(rel_path, new_bytes) for rel_path, new_bytes in zip(by_file, results) if new_bytes is not None]
+    if not edited:
+        raise RuntimeError(f"No files were changed by batch edit for project {project_id}")
+
+    # 3. Одна версия снапшота на весь пакет; blob'ы — до allocate_version
+    changed: dict[str, snapshot_repo.FileVersion] = {}
+    for rel_path, new_bytes in edited:
+        content_hash = await storage.save_blob(user_id, project_id, new_bytes)
+        changed[rel_path] = snapshot_repo.FileVersion(content_hash, len(new_bytes))
+    async with AsyncSessionFactory() as db:
+        new_version = await snapshot_repo.allocate_version(db, UUID(project_id))
+        await snapshot_repo.create(
+            db,
+            project_id=UUID(project_id),
+            version=new_version,
+            files=changed,
+            description=f"Batch edit: {len(applied)} edit(s) in {len(edited)} file(s)",
+        )
+        await project_repo.set_active_snapshot_version(db, UUID(project_id), new_version)
+        await db.commit()
+    logger.info("Snapshot v%d created for batch edit of project %s", new_version, project_id)
+    if skipped:
+        logger.warning("Batch edit of project %s skipped %d edit(s): %s", project_id, len(skipped), skipped)
+    _set_redis_status(project_id, "building", 70, applied=len(applied), skipped=skipped)
+
+    # 4. Одна пересборка
+    from app.workers.tasks.build import run_build  # noqa: PLC0415
+    run_build.delay(project_id, user_id)
+    logger.info("Build task queued for project %s after batch edit", project_id)
+    return {"applied": applied, "skipped": skipped}
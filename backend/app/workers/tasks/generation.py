@@ -4,6 +4,7 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import time
 from uuid import UUID
 
 import redis as redis_lib
@@ -15,6 +16,10 @@ from app.core.config import settings
 from app.db.database import AsyncSessionFactory, engine
 from app.repositories import project as project_repo
 from app.repositories import snapshot as snapshot_repo
+from app.services.astro_validator import validate_files
+from app.services.codegen_scheduler import run_prioritized
+from app.services.generation_checkpoint import GenerationCheckpoint
+from app.services.llm_client import run_with_llm_clients
 from app.services.storage import StorageService
 from app.workers.celery_app import celery_app
 
@@ -28,6 +33,11 @@ def run_generation_pipeline(
     """
     Запускает полный pipeline: A0 → A1 → A2 → MinIO → build.
     Прогресс пишется в Redis: generation:{project_id}:status = {"stage": ..., "progress": ...}
+    На стадии code_generator в payload есть "files": {path: {"status": ..., "seconds": ...}}.
+
+    Результаты стадий сохраняются в чекпоинт (generation_checkpoint), поэтому
+    повтор после ошибки продолжает с места падения; пропущенное попадает
+    в "resumed" статуса и в результат задачи.
     """
     try:
         storage = StorageService()
@@ -37,39 +47,45 @@ def run_generation_pipeline(
         raise self.retry(exc=exc, countdown=10)
 
     try:
-        asyncio.run(_run_pipeline(project_id, user_id, prompt, ai_model, storage, template_prompt=template_prompt))
+        resumed = asyncio.run(
+            _run_pipeline(project_id, user_id, prompt, ai_model, storage, template_prompt=template_prompt)
+        )
     except Exception as exc:
         logger.exception("Generation pipeline failed for project %s: %s", project_id, exc)
         _set_redis_status(project_id, "failed", 0)
         raise self.retry(exc=exc, countdown=10)
-    return {"project_id": project_id, "status": "building"}
+    return {"project_id": project_id, "status": "building", "resumed": resumed}
 
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _set_redis_status(project_id: str, stage: str, progress: int) -> None:
+def _set_redis_status(project_id: str, stage: str, progress: int, **extra) -> None:
+    payload: dict = {"stage": stage, "progress": progress, **extra}
     try:
         r = redis_lib.from_url(settings.REDIS_URL)
-        r.set(
-            f"generation:{project_id}:status",
-            json.dumps({"stage": stage, "progress": progress}),
-        )
+        r.set(f"generation:{project_id}:status", json.dumps(payload))
     except Exception:
         logger.warning("Could not write Redis status for project %s", project_id)
 
 
 async def _run_pipeline(
     project_id: str, user_id: str, prompt: str, ai_model: str, storage: StorageService, template_prompt: str | None = None
-) -> None:
+) -> dict:
     await engine.dispose()
-    await _pipeline(project_id, user_id, prompt, ai_model, storage, template_prompt=template_prompt)
+    return await run_with_llm_clients(
+        _pipeline(project_id, user_id, prompt, ai_model, storage, template_prompt=template_prompt)
+    )
 
 
 async def _pipeline(
     project_id: str, user_id: str, prompt: str, ai_model: str, storage: StorageService, template_prompt: str | None = None
-) -> None:
+) -> dict:
+    """Возвращает пропущенное благодаря чекпоинту: {"stages": [...], "files": [...]}."""
+    checkpoint = GenerationCheckpoint(project_id, prompt, ai_model, template_prompt)
+    resumed: dict[str, list[str]] = {"stages": [], "files": []}
+
     async with AsyncSessionFactory() as db:
         await project_repo.update_status(db, UUID(project_id), "generating")
         await db.commit()
@@ -78,18 +94,28 @@ async def _pipeline(
     logger.info("Pipeline started: project=%s user=%s model=%s", project_id, user_id, ai_model)
 
     # A0 — разбираем промпт пользователя в структурированную спецификацию
-    optimizer = OptimizerAgent(model=ai_model)
-    optimizer_input: dict = {"prompt": prompt}
-    if template_prompt:
-        optimizer_input["template_slug"] = template_prompt
-    structured_spec: dict = await optimizer.run(optimizer_input)
+    structured_spec: dict | None = checkpoint.load("spec")
+    if structured_spec is None:
+        optimizer = OptimizerAgent(model=ai_model)
+        optimizer_input: dict = {"prompt": prompt}
+        if template_prompt:
+            optimizer_input["template_slug"] = template_prompt
+        structured_spec = await optimizer.run(optimizer_input)
+        checkpoint.save("spec", structured_spec)
+    else:
+        resumed["stages"].append("optimizer")
     logger.info("A0 structured spec: %s", json.dumps(structured_spec, ensure_ascii=False, indent=2))
     _set_redis_status(project_id, "optimizer", 25)
 
     # A1 — по спецификации строим список файлов проекта
     _set_redis_status(project_id, "architect", 30)
-    architect = ArchitectAgent(model=ai_model)
-    file_specs: dict = await architect.run(structured_spec)
+    file_specs: dict | None = checkpoint.load("plan")
+    if file_specs is None:
+        architect = ArchitectAgent(model=ai_model)
+        file_specs = await architect.run(structured_spec)
+        checkpoint.save("plan", file_specs)
+    else:
+        resumed["stages"].append("architect")
     files_list: list[dict] = file_specs.get("files", [])
     if not files_list:
         logger.error("A1 returned empty files list! Full response: %s", file_specs)
@@ -97,45 +123,143 @@ async def _pipeline(
         logger.info("A1 file plan (%d files): %s", len(files_list), json.dumps(files_list, ensure_ascii=False, indent=2))
     _set_redis_status(project_id, "architect", 45)
 
-    # A2 — генерируем код всех файлов параллельно
+    # A2 — генерируем код файлов параллельно, не больше A2_MAX_CONCURRENCY одновременно;
+    # в режиме dependencies — по графу зависимостей A1, листовые компоненты первыми.
+    # Каждый файл сохраняется в MinIO сразу после генерации, не дожидаясь остальных.
     _set_redis_status(project_id, "code_generator", 50)
     code_gen = CodeGeneratorAgent(model=ai_model)
-    results: list[dict] = await asyncio.gather(
-        *[
-            code_gen.run({"file": file_spec, "project_spec": structured_spec})
-            for file_spec in files_list
-        ]
+    timings_view: dict[str, dict] = {}
+    streamed: dict[str, dict] = {}  # {path: {"bytes", "tokens"}} для файлов, которые ещё пишутся
+    last_published = 0.0
+
+    def _publish_files() -> None:
+        nonlocal last_published
+        last_published = time.monotonic()
+        files = {
+            path: {**t, **streamed[path]} if t["status"] == "running" and path in streamed else t
+            for path, t in timings_view.items()
+        }
+        done = sum(1 for t in files.values() if t["status"] in ("done", "skipped"))
+        _set_redis_status(project_id, "code_generator", 50 + 15 * done // max(len(files), 1), files=files)
+
+    def _report_files(timings: dict[str, dict]) -> None:
+        timings_view.update(timings)
+        _publish_files()
+
+    def _stream_progress(path: str):
+        def _on_delta(received: int, tokens: int) -> None:
+            # tokens — число фрагментов потока, у OpenAI это ~1 токен на фрагмент
+            streamed[path] = {"bytes": received, "tokens": tokens}
+            if time.monotonic() - last_published >= settings.GENERATION_PROGRESS_INTERVAL:
+                _publish_files()
+        return _on_delta
+
+    async def _generate(file_spec: dict, deps: dict[str, dict]) -> dict:
+        path = file_spec["path"]
+        result = await code_gen.run(
+            {
+                "file": file_spec,
+                "project_spec": structured_spec,
+                "dependencies": {
+                    dep: CodeGeneratorAgent.extract_interface(dep, r["content"]) for dep, r in deps.items()
+                },
+            },
+            on_progress=_stream_progress(path) if settings.A2_STREAMING else None,
+        )
+        streamed.pop(path, None)
+        # файл виден в редакторе сразу; чекпоинт — только после успешной записи
+        await storage.save_source_files(user_id, project_id, {result["path"]: result["content"]})
+        checkpoint.save_file(path, result)
+        return result
+
+    # файлы, сгенерированные до падения предыдущей попытки, не генерируем заново
+    completed = checkpoint.load_files()
+    resumed["files"] = sorted(path for path in completed if any(f.get("path") == path for f in files_list))
+    if resumed["stages"] or resumed["files"]:
+        logger.info(
+            "Resuming pipeline for project %s: skipped stages %s and %d file(s)",
+            project_id, resumed["stages"], len(resumed["files"]),
+        )
+
+    results, timings = await run_prioritized(
+        files_list,
+        _generate,
+        concurrency=settings.A2_MAX_CONCURRENCY,
+        respect_dependencies=settings.A2_GENERATION_MODE == "dependencies",
+        completed=completed,
+        on_progress=_report_files,
     )
     generated_files: dict[str, str] = {r["path"]: r["content"] for r in results}
     logger.info("A2 generated %d files: %s", len(generated_files), list(generated_files.keys()))
-    _set_redis_status(project_id, "code_generator", 65)
+    _set_redis_status(project_id, "code_generator", 65, files=timings)
+
+    # быстрая проверка до сборки: файлы с проблемами перегенерируем один раз
+    if settings.PREBUILD_VALIDATION:
+        report = validate_files(generated_files)
+        if report:
+            logger.warning("Validator found problems in %d file(s): %s", len(report), report)
+            _set_redis_status(project_id, "validating", 67, problems=report)
+            specs = {f.get("path"): f for f in files_list}
+            semaphore = asyncio.Semaphore(max(1, settings.A2_MAX_CONCURRENCY))
+
+            async def _regenerate(path: str) -> None:
+                try:
+                    async with semaphore:
+                        result = await code_gen.run({
+                            "file": specs[path],
+                            "project_spec": structured_spec,
+                            "problems": report[path],
+                            "previous": generated_files[path],
+                        })
+                except Exception:
+                    logger.warning("Regeneration of %s failed, keeping first version", path, exc_info=True)
+                    return
+                remaining = validate_files({**generated_files, path: result["content"]}).get(path, [])
+                if len(remaining) >= len(report[path]):
+                    logger.warning("Regenerated %s still has problems: %s", path, remaining)
+                    return
+                generated_files[path] = result["content"]
+                await storage.save_source_files(user_id, project_id, {path: result["content"]})
+                checkpoint.save_file(path, result)
+
+            await asyncio.gather(*(_regenerate(path) for path in report if path in specs))
 
-    # сохраняем исходники в MinIO
+    # исходники уже в MinIO (каждый файл записан сразу после генерации)
     _set_redis_status(project_id, "saving", 70)
-    await storage.save_source_files(user_id, project_id, generated_files)
-    logger.info("Source files saved for project %s", project_id)
-    _set_redis_status(project_id, "saving", 80)
 
     # создаём снапшот v1 — начальное состояние проекта (только src/-файлы, остальные не редактируются)
     src_files = {p: c for p, c in generated_files.items() if p.lstrip("/").startswith("src/")}
-    async with AsyncSessionFactory() as db:
-        for path, content in src_files.items():
-            file_path = path.lstrip("/").removeprefix("src/")
-            snap_path = f"projects/{user_id}/{project_id}/snapshots/v1/{file_path}"
-            await storage.save_file("projects", snap_path, content.encode("utf-8"))
+    content_hashes = await asyncio.gather(
+        *[storage.save_blob(user_id, project_id, content.encode("utf-8")) for content in src_files.values()]
+    )
+    manifest = {
+        path.lstrip("/").removeprefix("src/"): snapshot_repo.FileVersion(content_hash, len(content.encode("utf-8")))
+        for (path, content), content_hash in zip(src_files.items(), content_hashes)
+    }
+    _set_redis_status(project_id, "saving", 80)
+    # повтор после падения на постановке сборки не должен создавать вторую v1
+    version: int | None = checkpoint.load("snapshot_version")
+    if version is None:
+        async with AsyncSessionFactory() as db:
+            version = await snapshot_repo.allocate_version(db, UUID(project_id))
             await snapshot_repo.create(
                 db,
                 project_id=UUID(project_id),
-                version=1,
-                minio_path=snap_path,
+                version=version,
+                files=manifest,
                 description=f"Первоначальная генерация: {prompt[:200]}",
             )
-        await project_repo.set_active_snapshot_version(db, UUID(project_id), 1)
-        await db.commit()
-    logger.info("Initial snapshot v1 created for project %s (%d src files)", project_id, len(src_files))
+            await project_repo.set_active_snapshot_version(db, UUID(project_id), version)
+            await db.commit()
+        checkpoint.save("snapshot_version", version)
+        logger.info("Initial snapshot v%d created for project %s (%d src files)", version, project_id, len(src_files))
+    else:
+        resumed["stages"].append("snapshot")
 
     # запускаем сборку (импорт здесь, чтобы не было circular import на уровне модуля)
     from app.workers.tasks.build import run_build  # noqa: PLC0415
     run_build.delay(project_id, user_id)
-    _set_redis_status(project_id, "building", 85)
+    checkpoint.clear()
+    _set_redis_status(project_id, "building", 85, resumed=resumed)
     logger.info("Build task queued for project %s", project_id)
+    return resumed
@@ -0,0 +1,33 @@
+"""Celery tasks: фоновые операции с MinIO (массовое удаление объектов)."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.services.s3_async import run_with_s3_client
+from app.services.storage import StorageService
+from app.workers.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, name="storage.delete_prefix", max_retries=5)
+def delete_prefix(self, bucket_type: str, prefix: str) -> dict:
+    """Удаляет все объекты под prefix пакетами Multi-Object Delete.
+
+    Используется API, когда объектов слишком много, чтобы удалять их
+    в рамках запроса. Если часть ключей не удалилась — задача повторяется:
+    повторный проход заново листит prefix и добивает оставшиеся объекты.
+    """
+    try:
+        errors = asyncio.run(run_with_s3_client(StorageService().delete_directory(bucket_type, prefix)))
+    except Exception as exc:
+        logger.exception("Background delete failed for %s: %s", prefix, exc)
+        raise self.retry(exc=exc, countdown=30)
+
+    if errors:
+        logger.warning("Background delete of %s: %d object(s) left, retrying", prefix, len(errors))
+        raise self.retry(exc=RuntimeError(f"{len(errors)} objects not deleted"), countdown=30)
+
+    logger.info("Background delete of %s completed", prefix)
+    return {"bucket_type": bucket_type, "prefix": prefix, "status": "deleted"}
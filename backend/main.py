@@ -1,15 +1,19 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1 import auth, users, projects, assets, templates, snapshots, deployments
 from app.api.v1.generation.router import router as generation_router
 from app.api.v1.editor.router import router as editor_router
 from app.core.config import settings
-from app.core.dependencies import close_redis, init_redis
+from app.core.dependencies import RedisClient, close_redis, init_redis, require_role
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.core.logging import setup_logging
 from app.db import models
+from app.services.llm_client import close_llm_clients, collect_llm_stats
+from app.services.s3_async import close_async_s3_client
 from app.services.storage import StorageService
 
 logger = setup_logging()
@@ -19,9 +23,12 @@ logger = setup_logging()
 async def lifespan(app: FastAPI):
     logger.info("Starting application")
     await init_redis()
-    StorageService()  # инициализирует бакеты и применяет политики доступа
+    # Бакеты и политики доступа — один раз на процесс, а не на каждый StorageService()
+    await asyncio.to_thread(StorageService().initialize_buckets)
     yield
     logger.info("Shutting down application")
+    await close_async_s3_client()
+    await close_llm_clients()
     await close_redis()
 
 
@@ -49,6 +56,7 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
     
     api_v1_prefix = "/api/v1"
@@ -69,4 +77,15 @@ app = create_application()
 @app.get("/api/health")
 async def health_check():
     """Просто проверка что апи живой."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/api/metrics/llm", dependencies=[Depends(require_role("admin"))])
+async def llm_metrics(redis: RedisClient):
+    """Метрики LLM: пулы соединений, запросы, TPM-бюджет, кэш ответов
+    (попадания, промахи, вытеснения, hit_rate — в поле cache).
+
+    current — процесс API, processes — последние метрики каждого процесса
+    (воркеры Celery публикуют их в конце задачи).
+    """
+    return await collect_llm_stats(redis)
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""add content_hash to snapshots (content-addressed blobs)
+
+Revision ID: c4d8e2f1a7b3
+Revises: b1c2d3e4f5a6
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c4d8e2f1a7b3"
+down_revision: Union[str, None] = "b1c2d3e4f5a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL — старые снапшоты, чьё содержимое лежит по minio_path
+    op.add_column(
+        "snapshots",
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("snapshots", "content_hash")
@@ -0,0 +1,99 @@
+"""snapshot manifests: one snapshots row per version + snapshot_files
+
+Revision ID: d5e9f3a2b8c4
+Revises: c4d8e2f1a7b3
+Create Date: 2026-10-18
+
+До этой ревизии в snapshots была одна строка на файл в версии, а состояние
+версии N собиралось обходом всех строк <= N.  Теперь в snapshots одна строка
+на версию, а snapshot_files хранит полный манифест версии
+(rel_path → content_hash, size).  Существующая история переносится:
+для каждой версии манифест строится так же, как это делал restore
+(для каждого файла — запись с наибольшей версией <= N).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d5e9f3a2b8c4"
+down_revision: Union[str, None] = "c4d8e2f1a7b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "snapshot_files",
+        sa.Column("snapshot_id", sa.Uuid(), nullable=False),
+        sa.Column("rel_path", sa.String(length=512), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+        sa.Column("size", sa.Integer(), nullable=True),
+        sa.Column("legacy_path", sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(["snapshot_id"], ["snapshots.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("snapshot_id", "rel_path"),
+    )
+
+    # Строки старого формата: относительный путь — хвост minio_path после snapshots/v{n}/
+    op.execute(
+        """
+        CREATE TEMP TABLE _snapshot_rows ON COMMIT DROP AS
+        SELECT project_id, version, content_hash, minio_path,
+               regexp_replace(minio_path, '^.*?/snapshots/v[0-9]+/', '') AS rel_path
+        FROM snapshots
+        WHERE minio_path ~ '/snapshots/v[0-9]+/.'
+        """
+    )
+    # Остаётся одна строка на версию — самая ранняя
+    op.execute(
+        """
+        CREATE TEMP TABLE _snapshot_keep ON COMMIT DROP AS
+        SELECT DISTINCT ON (project_id, version) id, project_id, version
+        FROM snapshots
+        ORDER BY project_id, version, created_at, id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO snapshot_files (snapshot_id, rel_path, content_hash, legacy_path)
+        SELECT k.id, f.rel_path, f.content_hash,
+               CASE WHEN f.content_hash IS NULL THEN f.minio_path END
+        FROM _snapshot_keep k
+        CROSS JOIN LATERAL (
+            SELECT DISTINCT ON (r.rel_path) r.rel_path, r.content_hash, r.minio_path
+            FROM _snapshot_rows r
+            WHERE r.project_id = k.project_id AND r.version <= k.version
+            ORDER BY r.rel_path, r.version DESC
+        ) f
+        """
+    )
+    op.execute("DELETE FROM snapshots WHERE id NOT IN (SELECT id FROM _snapshot_keep)")
+
+    op.drop_column("snapshots", "content_hash")
+    op.drop_column("snapshots", "minio_path")
+
+
+def downgrade() -> None:
+    op.add_column("snapshots", sa.Column("minio_path", sa.String(length=255), nullable=True))
+    op.add_column("snapshots", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+    # Обратно в строку на файл: каждая запись манифеста → строка snapshots
+    op.execute(
+        """
+        INSERT INTO snapshots (id, project_id, version, minio_path, content_hash, description, created_at)
+        SELECT gen_random_uuid(), s.project_id, s.version,
+               COALESCE(
+                   f.legacy_path,
+                   'projects/' || p.user_id || '/' || s.project_id
+                   || '/snapshots/v' || s.version || '/' || f.rel_path
+               ),
+               f.content_hash, s.description, s.created_at
+        FROM snapshots s
+        JOIN snapshot_files f ON f.snapshot_id = s.id
+        JOIN projects p ON p.id = s.project_id
+        """
+    )
+    op.drop_table("snapshot_files")
+    op.execute("DELETE FROM snapshots WHERE minio_path IS NULL")
+    op.alter_column("snapshots", "minio_path", existing_type=sa.String(length=255), nullable=False)
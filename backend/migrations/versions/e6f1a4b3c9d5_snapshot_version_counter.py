@@ -0,0 +1,46 @@
+"""snapshot version counter on projects + unique (project_id, version)
+
+Revision ID: e6f1a4b3c9d5
+Revises: d5e9f3a2b8c4
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "e6f1a4b3c9d5"
+down_revision: Union[str, None] = "d5e9f3a2b8c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "projects",
+        sa.Column("last_snapshot_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        UPDATE projects p
+        SET last_snapshot_version = s.max_version
+        FROM (
+            SELECT project_id, MAX(version) AS max_version
+            FROM snapshots
+            GROUP BY project_id
+        ) s
+        WHERE s.project_id = p.id
+        """
+    )
+    # Путь файла входит в первичный ключ snapshot_files (snapshot_id, rel_path),
+    # поэтому уникальность (project_id, version, path) сводится к (project_id, version)
+    op.create_unique_constraint(
+        "uq_snapshots_project_id_version", "snapshots", ["project_id", "version"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_snapshots_project_id_version", "snapshots", type_="unique")
+    op.drop_column("projects", "last_snapshot_version")
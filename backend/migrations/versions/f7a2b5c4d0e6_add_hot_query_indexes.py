@@ -0,0 +1,48 @@
+"""add composite indexes for hot queries (projects, assets)
+
+Revision ID: f7a2b5c4d0e6
+Revises: e6f1a4b3c9d5
+Create Date: 2026-10-18
+
+snapshots(project_id, version) уже покрыт уникальным ограничением
+uq_snapshots_project_id_version (ревизия e6f1a4b3c9d5), snapshot_files —
+первичным ключом (snapshot_id, rel_path).
+
+Индексы строятся CONCURRENTLY, чтобы не блокировать запись на больших
+таблицах, поэтому миграция выполняется вне транзакции (autocommit_block).
+Сравнение планов до/после: scripts/bench_indexes.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "f7a2b5c4d0e6"
+down_revision: Union[str, None] = "e6f1a4b3c9d5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, таблица, колонки)
+INDEXES = [
+    # GET /projects/: WHERE user_id = ? ORDER BY created_at DESC
+    ("ix_projects_user_id_created_at", "projects", ["user_id", "created_at"]),
+    # create_project / update_project: WHERE user_id = ? AND name = ?
+    ("ix_projects_user_id_name", "projects", ["user_id", "name"]),
+    # GET /assets/ и удаление проекта: WHERE project_id = ?
+    ("ix_assets_project_id", "assets", ["project_id"]),
+    # upload_asset: upsert по WHERE s3_path = ?
+    ("ix_assets_s3_path", "assets", ["s3_path"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,172 @@
+"""
+Бенчмарк индексов для горячих запросов: EXPLAIN ANALYZE до и после.
+
+Создаёт во временной схеме bench_indexes копии таблиц projects / snapshots /
+assets (только колонки, участвующие в запросах, без индексов и FK), заливает
+синтетические данные, снимает планы горячих запросов, затем строит индексы
+из миграции f7a2b5c4d0e6 (плюс уникальный индекс snapshots из e6f1a4b3c9d5)
+и снимает планы повторно.  Схема удаляется в конце — рабочие таблицы
+не затрагиваются.
+
+Запуск (нужен PostgreSQL из docker compose, SYNC_DATABASE_URL из .env):
+    cd backend
+    python scripts/bench_indexes.py --projects 100000 --snapshots-per-project 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+
+SCHEMA = "bench_indexes"
+
+TABLES = """
+CREATE TABLE projects (
+    id uuid PRIMARY KEY,
+    user_id uuid NOT NULL,
+    name varchar(255) NOT NULL,
+    s3_path varchar(255) NOT NULL,
+    prompt varchar NOT NULL,
+    created_at timestamptz NOT NULL
+);
+CREATE TABLE snapshots (
+    id uuid PRIMARY KEY,
+    project_id uuid NOT NULL,
+    version integer NOT NULL,
+    description varchar(500),
+    created_at timestamptz NOT NULL
+);
+CREATE TABLE assets (
+    id uuid PRIMARY KEY,
+    project_id uuid NOT NULL,
+    s3_path varchar(255) NOT NULL,
+    optimized_path varchar(255) NOT NULL
+);
+"""
+
+# Данные: пользователи по 100 проектов, у каждого проекта N версий и один ассет
+SEED = """
+INSERT INTO projects (id, user_id, name, s3_path, prompt, created_at)
+SELECT gen_random_uuid(),
+       md5('user-' || (i / 100))::uuid,
+       'project-' || i,
+       'projects/' || i,
+       'prompt',
+       now() - (i || ' seconds')::interval
+FROM generate_series(1, :projects) AS i;
+
+INSERT INTO snapshots (id, project_id, version, description, created_at)
+SELECT gen_random_uuid(), p.id, v, 'v' || v, p.created_at + (v || ' minutes')::interval
+FROM projects p CROSS JOIN generate_series(1, :versions) AS v;
+
+INSERT INTO assets (id, project_id, s3_path, optimized_path)
+SELECT gen_random_uuid(), p.id, p.s3_path || '/assets/logo.png', p.s3_path || '/assets/logo.webp'
+FROM projects p;
+"""
+
+# Те же индексы, что в миграциях e6f1a4b3c9d5 и f7a2b5c4d0e6
+INDEXES = """
+CREATE UNIQUE INDEX uq_snapshots_project_id_version ON snapshots (project_id, version);
+CREATE INDEX ix_projects_user_id_created_at ON projects (user_id, created_at);
+CREATE INDEX ix_projects_user_id_name ON projects (user_id, name);
+CREATE INDEX ix_assets_project_id ON assets (project_id);
+CREATE INDEX ix_assets_s3_path ON assets (s3_path);
+"""
+
+QUERIES = {
+    "list_projects": (
+        "SELECT * FROM projects WHERE user_id = :user_id ORDER BY created_at DESC"
+    ),
+    "project_name_dup": (
+        "SELECT * FROM projects WHERE user_id = :user_id AND name = :name"
+    ),
+    "list_snapshots": (
+        "SELECT * FROM snapshots WHERE project_id = :project_id ORDER BY version DESC"
+    ),
+    "latest_version": (
+        "SELECT max(version) FROM snapshots WHERE project_id = :project_id"
+    ),
+    "list_assets": "SELECT * FROM assets WHERE project_id = :project_id",
+    "asset_by_s3_path": "SELECT * FROM assets WHERE s3_path = :s3_path",
+}
+
+_EXECUTION_TIME = re.compile(r"Execution Time: ([\d.]+) ms")
+
+
+def _explain(conn, params: dict) -> dict[str, tuple[float, list[str]]]:
+    plans: dict[str, tuple[float, list[str]]] = {}
+    for label, sql in QUERIES.items():
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).scalars().all()
+        match = _EXECUTION_TIME.search(rows[-1])
+        plans[label] = (float(match.group(1)) if match else 0.0, list(rows))
+    return plans
+
+
+def _print_plans(title: str, plans: dict[str, tuple[float, list[str]]]) -> None:
+    print(f"\n===== {title} =====")
+    for label, (_, rows) in plans.items():
+        print(f"\n--- {label}")
+        for row in rows:
+            print(f"  {row}")
+
+
+def main(projects: int, versions: int) -> None:
+    engine = create_engine(settings.SYNC_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL search_path TO {SCHEMA}"))
+            conn.execute(text(TABLES))
+            print(f"Заливка: {projects} проектов × {versions} версий, {projects} ассетов...")
+            for statement in SEED.split(";"):
+                if statement.strip():
+                    conn.execute(text(statement), {"projects": projects, "versions": versions})
+            conn.execute(text("ANALYZE"))
+
+            # Параметры — «средний» пользователь и его проект
+            row = conn.execute(
+                text("SELECT user_id, name, id, s3_path FROM projects ORDER BY name OFFSET :n LIMIT 1"),
+                {"n": projects // 2},
+            ).one()
+            params = {
+                "user_id": row.user_id,
+                "name": row.name,
+                "project_id": row.id,
+                "s3_path": f"{row.s3_path}/assets/logo.png",
+            }
+
+            before = _explain(conn, params)
+            _print_plans("БЕЗ ИНДЕКСОВ", before)
+
+            conn.execute(text(INDEXES))
+            conn.execute(text("ANALYZE"))
+            after = _explain(conn, params)
+            _print_plans("С ИНДЕКСАМИ", after)
+
+        print("\nquery               before (ms)   after (ms)   speedup")
+        for label in QUERIES:
+            b, a = before[label][0], after[label][0]
+            print(f"{label:<18} {b:12.3f} {a:12.3f} {b / a if a else 0:9.1f}x")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=100_000, help="число проектов (по умолчанию 100000)")
+    parser.add_argument(
+        "--snapshots-per-project", type=int, default=3, help="версий на проект (по умолчанию 3)"
+    )
+    args = parser.parse_args()
+    main(args.projects, args.snapshots_per_project)
@@ -0,0 +1,82 @@
+"""
+Бенчмарк бэкендов StorageService: minio + asyncio.to_thread() против AsyncS3Client (httpx).
+
+Гоняет одинаковую нагрузку через оба бэкенда на локальном MinIO
+(docker compose -f infrastructure/docker-compose.yml up minio):
+параллельный save_file, list_files, параллельный get_file и copy_directory.
+Все объекты пишутся во временный префикс bench/{uuid}/ и удаляются в конце.
+
+Запуск:
+    cd backend
+    python scripts/bench_storage.py --objects 500 --size 4096
+
+Переменные окружения — как у приложения (.env): MINIO_ENDPOINT, MINIO_ACCESS_KEY, ...
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.storage import StorageService  # noqa: E402
+
+
+async def _timed(label: str, coro) -> float:
+    started = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<16} {elapsed * 1000:9.1f} ms")
+    return elapsed
+
+
+async def _bench(svc: StorageService, objects: int, size: int) -> dict[str, float]:
+    prefix = f"bench/{uuid.uuid4()}"
+    payload = os.urandom(size)
+    keys = [f"{prefix}/src/file-{i:05d}.bin" for i in range(objects)]
+    results: dict[str, float] = {}
+
+    results["save_file"] = await _timed(
+        "save_file", asyncio.gather(*(svc.save_file("projects", k, payload) for k in keys))
+    )
+    results["list_files"] = await _timed("list_files", svc.list_files("projects", f"{prefix}/src/"))
+    results["get_file"] = await _timed(
+        "get_file", asyncio.gather(*(svc.get_file("projects", k) for k in keys))
+    )
+    results["copy_directory"] = await _timed(
+        "copy_directory", svc.copy_directory("projects", f"{prefix}/src", f"{prefix}/copy")
+    )
+
+    await svc.delete_directory("projects", f"{prefix}/")
+    return results
+
+
+async def main(objects: int, size: int) -> None:
+    svc = StorageService()
+    svc.initialize_buckets()
+
+    report: dict[str, dict[str, float]] = {}
+    for backend in ("minio", "async"):
+        svc.async_backend = backend == "async"
+        print(f"\n[{backend}] {objects} objects × {size} bytes")
+        report[backend] = await _bench(svc, objects, size)
+
+    print("\noperation          minio (ms)   async (ms)   speedup")
+    for op, minio_time in report["minio"].items():
+        async_time = report["async"][op]
+        print(
+            f"{op:<16} {minio_time * 1000:12.1f} {async_time * 1000:12.1f}"
+            f" {minio_time / async_time:9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=500, help="число объектов (по умолчанию 500)")
+    parser.add_argument("--size", type=int, default=4096, help="размер объекта в байтах (по умолчанию 4096)")
+    args = parser.parse_args()
+    asyncio.run(main(args.objects, args.size))
@@ -3,6 +3,8 @@ import os
 import sys
 from unittest.mock import MagicMock
 
+import pytest
+
 # ---------------------------------------------------------------------------
 # Заглушки для пакетов, не установленных в тестовом окружении.
 # ОБЯЗАТЕЛЬНО до импорта любого модуля приложения в тест-файлах.
@@ -21,6 +23,10 @@ _minio.Minio = MagicMock  # оставляем как вызываемый кл
 _minio_common = _stub("minio.commonconfig")
 _minio_common.CopySource = MagicMock
 _minio.commonconfig = _minio_common
+_minio_delete = _stub("minio.deleteobjects")
+_minio_delete.DeleteObject = MagicMock
+_minio.deleteobjects = _minio_delete
+_stub("urllib3")  # http_client общего Minio-клиента
 
 # --- redis ---
 _redis_mod = _stub("redis")
@@ -126,8 +132,11 @@ _fastapi_security.HTTPAuthorizationCredentials = MagicMock
 
 
 async def _fake_streaming_body(content):
-    """Async generator: читает BytesIO или другой контент за один чанк."""
-    if hasattr(content, "read"):
+    """Async generator: читает BytesIO, async-итератор или итерируемый контент."""
+    if hasattr(content, "__aiter__"):
+        async for chunk in content:
+            yield chunk
+    elif hasattr(content, "read"):
         data = content.read()
         if data:
             yield data
@@ -186,3 +195,11 @@ _TEST_ENV = {
 
 for key, value in _TEST_ENV.items():
     os.environ.setdefault(key, value)
+
+
+@pytest.fixture(autouse=True)
+def _reset_minio_singleton():
+    """Каждый тест получает свежий общий Minio-клиент (тесты патчат storage.Minio)."""
+    yield
+    if "app.services.storage" in sys.modules:
+        sys.modules["app.services.storage"].reset_minio_client()
@@ -15,6 +15,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import UUID, uuid4
 
 import pytest
+from fastapi import Response
 
 # fastapi.responses не заглушен в conftest — нужен для импорта projects/router
 _fr = MagicMock()
@@ -374,7 +375,8 @@ class TestListAssets:
         session = _session_for_list(proj, assets)
 
         result = await list_assets(
-            project_id=proj.id, user=_user(uid), session=session
+            project_id=proj.id, user=_user(uid), session=session,
+            response=Response(),
         )
 
         assert result == assets
@@ -387,7 +389,8 @@ class TestListAssets:
         session = _session_for_list(proj, [])
 
         result = await list_assets(
-            project_id=proj.id, user=_user(uid), session=session
+            project_id=proj.id, user=_user(uid), session=session,
+            response=Response(),
         )
 
         assert result == []
@@ -400,7 +403,8 @@ class TestListAssets:
 
         with pytest.raises(HTTPException) as exc_info:
             await list_assets(
-                project_id=uuid4(), user=_user(), session=session
+                project_id=uuid4(), user=_user(), session=session,
+                response=Response(),
             )
 
         assert exc_info.value.status_code == 404
@@ -413,7 +417,7 @@ class TestListAssets:
         proj = _project(user_id=uid)
         session = _session_for_list(proj, [])
 
-        await list_assets(project_id=proj.id, user=_user(uid), session=session)
+        await list_assets(project_id=proj.id, user=_user(uid), session=session, response=Response())
 
         assert session.execute.call_count == 2
 
@@ -0,0 +1,105 @@
+"""Unit-тесты для app/services/astro_validator.py и проверки правок в workers/tasks/edit.
+
+Запуск:
+    cd backend
+    pytest tests/test_astro_validator.py -v
+"""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.astro_validator import validate_file, validate_files
+
+_PAGE = """\
+---
+import Layout from '../layouts/Layout.astro';
+import Card from '../components/Card.astro';
+const items = [1, 2, 3];
+---
+<Layout title="Меню">
+  <ul class="grid gap-4">
+    {items.map((i) => <li class={i > 1 ? "wide" : ""}><Card n={i} /></li>)}
+  </ul>
+  <img src="/cup.png" alt="">
+  <button onclick={() => count > 0}>ок</button>
+  <script>const a = "<div>";</script>
+</Layout>
+"""
+
+
+class TestValidateFile:
+    def test_valid_page(self):
+        files = {"src/pages/index.astro": _PAGE, "src/components/Card.astro": "<div><slot /></div>"}
+        assert validate_files(files) == {}
+
+    def test_unclosed_and_stray_tags(self):
+        assert validate_file("src/a.astro", "<section><div>x</section>", set()) == [
+            "тег <div> не закрыт перед </section>",
+        ]
+        assert validate_file("src/a.astro", "<div>x</div></span>", set()) == ["лишний закрывающий тег </span>"]
+
+    def test_expression_bodies_do_not_break_tags(self):
+        assert validate_file("src/a.astro", "<div style={{ a: f({b: 1}) }}>x</div>", set()) == []
+        assert validate_file("src/a.astro", '<div>{"<span>"}</div>', set()) == []
+        assert validate_file("src/a.astro", "<p title={'}'}>{`<b>${x}`}</p>", set()) == []
+
+    def test_optional_closing_tags_are_not_errors(self):
+        assert validate_file("src/a.astro", "<ul><li>a<li>b</ul>", set()) == []
+
+    def test_frontmatter_fence_missing(self):
+        problems = validate_file("src/a.astro", "---\nconst a = 1;\n<div></div>", set())
+        assert problems == ["frontmatter не закрыт: нет второй строки ---"]
+
+    def test_missing_import_and_external_package(self):
+        code = "---\nimport Hero from '../components/Hero.astro';\nimport Swiper from 'swiper';\n---\n<Hero />"
+        problems = validate_file("src/pages/index.astro", code, {"src/pages/index.astro"})
+        assert problems == [
+            "импорт ../components/Hero.astro: файла src/components/Hero.astro нет в проекте",
+            "импорт внешнего пакета swiper — в проекте есть только astro",
+        ]
+
+    def test_only_astro_itself_is_allowed(self):
+        code = (
+            "---\nimport { Image } from 'astro:assets';\nimport type { HTMLAttributes } from 'astro/types';\n"
+            "import { Icon } from 'astro-icon';\n---\n<Icon />"
+        )
+        assert validate_file("src/a.astro", code, set()) == [
+            "импорт внешнего пакета astro-icon — в проекте есть только astro",
+        ]
+
+    def test_system_prompt_constraints(self):
+        code = (
+            "---\nexport function getStaticPaths() { return []; }\n---\n"
+            '<script src="https://cdn.tailwindcss.com"></script><style>.a { @apply p-4; }</style>'
+        )
+        problems = validate_file("src/pages/[slug].astro", code, set())
+        assert len(problems) == 4
+        assert problems[0].startswith("динамический маршрут")
+
+    def test_markdown_fence(self):
+        assert validate_file("src/a.astro", "```astro\n<div></div>\n```", set())[0].startswith("код обёрнут")
+
+
+@pytest.mark.asyncio
+class TestValidateEdit:
+    async def test_new_problem_sent_to_fix_build_error(self):
+        from app.workers.tasks.edit import _validate_edit
+
+        agent = MagicMock()
+        agent.fix_build_error = AsyncMock(return_value="<div>fixed</div>")
+        result = await _validate_edit(agent, "pages/a.astro", "<div>old</div>", "<div>new", [], "p")
+
+        assert result == "<div>fixed</div>"
+        assert agent.fix_build_error.call_args.kwargs["stderr"] == "тег <div> не закрыт"
+
+    async def test_problems_already_in_original_are_ignored(self):
+        from app.workers.tasks.edit import _validate_edit
+
+        agent = MagicMock()
+        agent.fix_build_error = AsyncMock()
+        result = await _validate_edit(agent, "pages/a.astro", "<div>old", "<div>new", [], "p")
+
+        assert result == "<div>new"
+        agent.fix_build_error.assert_not_awaited()
@@ -0,0 +1,186 @@
+"""Unit-тесты для починки упавшей сборки: app/services/build_repair.py,
+workers/tasks/build._repair() и ветка BuildFailedError в run_build.
+
+Запуск:
+    cd backend
+    pytest tests/test_build_repair.py -v
+"""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.build_repair import error_excerpt, failing_files, failure_fingerprint
+
+_PROJ_ID = "aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa"
+_USER_ID = "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb"
+
+_LOGS = f"""\
+=== Source files in MinIO ===
+[2024-05-01 10:00:00 UTC]  1.2KiB src/pages/index.astro
+npm install
+added 312 packages in 14s
+=== pre-build: injecting editable IDs into source files ===
+pre-build: done
+> astro build
+12:01:02 [build] Building static entrypoints...
+[ERROR] [vite] Could not resolve "../components/Missing.astro" from "src/pages/index.astro"
+file: /workspace/{_PROJ_ID}/src/pages/index.astro:3:20
+  Stack trace:
+    at /workspace/{_PROJ_ID}/node_modules/vite/dist/node/chunks/dep-abc12345.js:100:5
+"""
+
+
+# ===========================================================================
+# Разбор лога
+# ===========================================================================
+
+class TestLogParsing:
+    def test_failing_files_only_known_sources_in_order(self):
+        known = ["pages/index.astro", "components/Hero.astro"]
+        assert failing_files(_LOGS, known) == ["pages/index.astro"]
+
+    def test_source_listing_before_build_is_ignored(self):
+        """Список src/ до сборки называет все файлы — чинить надо только тот, что в ошибке."""
+        known = ["components/ErrorState.astro", "components/Footer.astro", "layouts/Base.astro", "pages/index.astro"]
+        logs = (
+            "=== Final src/ contents ===\n"
+            + "".join(f"src/{path}\n" for path in known)
+            + _LOGS.split("src/pages/index.astro\n", 1)[1]
+        )
+
+        assert failing_files(logs, known) == ["pages/index.astro"]
+        assert "ErrorState" not in error_excerpt(logs)
+        assert "Could not resolve" in error_excerpt(logs)
+
+    def test_excerpt_starts_near_first_error(self):
+        excerpt = error_excerpt(_LOGS)
+        assert excerpt.startswith("pre-build: done")
+        assert "Could not resolve" in excerpt
+        assert "Source files in MinIO" not in excerpt
+        assert len(error_excerpt(_LOGS, limit=50)) == 50
+
+    def test_fingerprint_ignores_timings_and_positions(self):
+        other_run = _LOGS.replace("14s", "19s").replace(":3:20", ":4:20").replace("abc12345", "ffee0011")
+        assert failure_fingerprint(error_excerpt(_LOGS)) == failure_fingerprint(error_excerpt(other_run))
+        assert failure_fingerprint("error A") != failure_fingerprint("error B")
+
+
+# ===========================================================================
+# _repair()
+# ===========================================================================
+
+def _db_ctx():
+    db = AsyncMock()
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=db)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return ctx
+
+
+@pytest.mark.asyncio
+class TestRepair:
+    async def _run(self, fixed_code: str):
+        from app.workers.tasks.build import _repair
+
+        prefix = f"projects/{_USER_ID}/{_PROJ_ID}/src/"
+        storage = MagicMock()
+        storage.list_files = AsyncMock(return_value=[f"{prefix}pages/index.astro", f"{prefix}components/Hero.astro"])
+        storage.get_file = AsyncMock(return_value=b"---\nimport X from '../components/Missing.astro';\n---\n")
+        storage.save_file = AsyncMock()
+        storage.save_blob = AsyncMock(return_value="c" * 64)
+        agent = MagicMock()
+        agent.fix_build_error = AsyncMock(return_value=fixed_code)
+
+        with patch("app.workers.tasks.build.engine.dispose", new=AsyncMock()), \
+             patch("app.workers.tasks.build.StorageService", return_value=storage), \
+             patch("app.workers.tasks.build.EditorAgent", return_value=agent), \
+             patch("app.workers.tasks.build.AsyncSessionFactory", return_value=_db_ctx()), \
+             patch("app.workers.tasks.build.snapshot_repo.allocate_version",
+                   new=AsyncMock(return_value=5)), \
+             patch("app.workers.tasks.build.snapshot_repo.create", new=AsyncMock()) as mock_create, \
+             patch("app.workers.tasks.build.project_repo.set_active_snapshot_version",
+                   new=AsyncMock()) as mock_active:
+            repaired = await _repair(_PROJ_ID, _USER_ID, _LOGS, "the error", 1)
+        return repaired, storage, agent, mock_create, mock_active
+
+    async def test_fixes_file_from_log_and_records_snapshot(self):
+        repaired, storage, agent, mock_create, mock_active = await self._run("---\n---\n<h1>ok</h1>\n")
+
+        assert repaired is True
+        agent.fix_build_error.assert_awaited_once()
+        assert agent.fix_build_error.call_args.kwargs["stderr"] == "the error"
+        storage.save_file.assert_awaited_once_with(
+            "projects", f"projects/{_USER_ID}/{_PROJ_ID}/src/pages/index.astro", b"---\n---\n<h1>ok</h1>\n",
+        )
+        kwargs = mock_create.call_args.kwargs
+        assert (kwargs["version"], list(kwargs["files"])) == (5, ["pages/index.astro"])
+        assert kwargs["description"].startswith("Build repair #1")
+        mock_active.assert_awaited_once()
+
+    async def test_unchanged_code_is_not_a_repair(self):
+        repaired, storage, _, mock_create, _ = await self._run(
+            "---\nimport X from '../components/Missing.astro';\n---\n"
+        )
+        assert repaired is False
+        storage.save_file.assert_not_awaited()
+        mock_create.assert_not_awaited()
+
+
+# ===========================================================================
+# run_build: ветка BuildFailedError
+# ===========================================================================
+
+class TestRunBuildRepairLoop:
+    def _call(self, *, repaired: bool, repair_attempt: int = 0, last_failure: str = ""):
+        from app.workers.tasks.build import BuildFailedError, run_build
+
+        task = MagicMock()
+        task.retry = MagicMock(return_value=RuntimeError("retry"))
+        redis = MagicMock()
+        redis.lock.return_value.acquire.return_value = True
+
+        async def _failing_build(project_id, user_id):
+            raise BuildFailedError("job failed", _LOGS)
+
+        with patch("app.workers.tasks.build.redis_lib.from_url", return_value=redis), \
+             patch("app.workers.tasks.build._run", new=_failing_build), \
+             patch("app.workers.tasks.build._repair", new=AsyncMock(return_value=repaired)) as mock_repair, \
+             patch("app.workers.tasks.build._set_redis_status") as mock_status:
+            with pytest.raises(Exception) as exc_info:
+                run_build(task, _PROJ_ID, _USER_ID, repair_attempt=repair_attempt, last_failure=last_failure)
+        return exc_info.value, task, mock_repair, mock_status
+
+    def test_repaired_sources_are_rebuilt(self):
+        exc, task, mock_repair, _ = self._call(repaired=True)
+
+        assert str(exc) == "retry"
+        mock_repair.assert_awaited_once()
+        kwargs = task.retry.call_args.kwargs
+        assert kwargs["args"] == (_PROJ_ID, _USER_ID)
+        assert kwargs["kwargs"]["repair_attempt"] == 1
+        assert kwargs["kwargs"]["last_failure"] == failure_fingerprint(error_excerpt(_LOGS))
+
+    def test_nothing_repaired_fails_without_retry(self):
+        exc, task, _, mock_status = self._call(repaired=False)
+
+        task.retry.assert_not_called()
+        assert str(exc) == "job failed"
+        assert mock_status.call_args[0][1] == "failed"
+
+    def test_same_error_after_repair_is_not_repaired_again(self):
+        fingerprint = failure_fingerprint(error_excerpt(_LOGS))
+        _, task, mock_repair, _ = self._call(repaired=True, repair_attempt=1, last_failure=fingerprint)
+
+        mock_repair.assert_not_awaited()
+        task.retry.assert_not_called()
+
+    def test_attempts_are_capped(self):
+        from app.workers.tasks.build import settings
+
+        _, task, mock_repair, _ = self._call(
+            repaired=True, repair_attempt=settings.BUILD_REPAIR_MAX_ATTEMPTS, last_failure="other",
+        )
+        mock_repair.assert_not_awaited()
+        task.retry.assert_not_called()
@@ -0,0 +1,62 @@
+"""Unit-тесты для app/services/code_patch.py (SEARCH/REPLACE патчи A4).
+
+Запуск:
+    cd backend
+    pytest tests/test_code_patch.py -v
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.services.code_patch import PatchError, apply_search_replace, parse_search_replace
+
+_CODE = """\
+<header>
+  <nav data-editable-id="nav">
+    <a href="/">Главная</a>
+  </nav>
+</header>
+<footer data-editable-id="footer">© 2024</footer>
+"""
+
+
+def _block(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n"
+
+
+class TestParseSearchReplace:
+    def test_several_blocks_with_surrounding_text(self):
+        text = "```\n" + _block("a\n", "b\n") + "\n" + _block("c\n", "") + "```"
+        assert parse_search_replace(text) == [("a\n", "b\n"), ("c\n", "")]
+
+    def test_no_blocks_is_error(self):
+        with pytest.raises(PatchError):
+            parse_search_replace("<h1>полный файл вместо патча</h1>")
+
+
+class TestApplySearchReplace:
+    def test_exact_match(self):
+        result = apply_search_replace(_CODE, [("© 2024", "© 2025")])
+        assert result == _CODE.replace("© 2024", "© 2025")
+
+    def test_indentation_tolerant_match(self):
+        search = '      <a href="/">Главная</a>\n  </nav>\n'
+        replace = '    <a href="/">Главная</a>\n    <a href="/menu">Меню</a>\n  </nav>\n'
+        result = apply_search_replace(_CODE, [(search, replace)])
+        assert result == _CODE.replace("  </nav>", '    <a href="/menu">Меню</a>\n  </nav>')
+
+    def test_blocks_applied_in_order(self):
+        result = apply_search_replace(_CODE, [("Главная", "Home"), ("Home</a>", "Start</a>")])
+        assert ">Start</a>" in result
+
+    def test_missing_search_is_error(self):
+        with pytest.raises(PatchError, match="not found"):
+            apply_search_replace(_CODE, [("<aside>", "")])
+
+    def test_ambiguous_search_is_error(self):
+        with pytest.raises(PatchError, match="2 places"):
+            apply_search_replace(_CODE, [("data-editable-id", "data-id")])
+
+    def test_empty_search_is_error(self):
+        with pytest.raises(PatchError):
+            apply_search_replace(_CODE, [("\n", "x")])
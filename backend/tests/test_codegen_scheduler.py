@@ -0,0 +1,259 @@
+"""Unit-тесты для app/services/codegen_scheduler.py, интерфейсов A2 и TPM-бюджета llm_client.
+
+Запуск:
+    cd backend
+    pytest tests/test_codegen_scheduler.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.codegen_scheduler import prioritize, run_prioritized
+from app.services.llm_client import TokenBudget
+
+
+def _plan() -> list[dict]:
+    return [
+        {"path": "src/pages/index.astro", "dependencies": ["src/components/Card.astro", "src/layouts/Layout.astro"]},
+        {"path": "src/components/Card.astro", "dependencies": ["src/components/Button.astro"]},
+        {"path": "src/layouts/Layout.astro", "dependencies": []},
+        {"path": "src/components/Button.astro", "dependencies": []},
+        {"path": "src/pages/about.astro", "content_hint": "x" * 500, "dependencies": ["src/layouts/Layout.astro"]},
+    ]
+
+
+# ===========================================================================
+# Порядок запуска
+# ===========================================================================
+
+class TestPrioritize:
+    def test_most_depended_on_first(self):
+        files = _plan()
+        order = [files[i]["path"] for i in prioritize(files)]
+
+        # Layout нужен двум страницам, Button — Card и (транзитивно) index
+        assert set(order[:2]) == {"src/layouts/Layout.astro", "src/components/Button.astro"}
+        assert order[2] == "src/components/Card.astro"
+
+    def test_larger_spec_first_among_leaves(self):
+        files = _plan()
+        order = [files[i]["path"] for i in prioritize(files)]
+
+        assert order[-2:] == ["src/pages/about.astro", "src/pages/index.astro"]
+
+    def test_cycles_and_unknown_dependencies_ignored(self):
+        files = [
+            {"path": "a", "dependencies": ["b", "missing"]},
+            {"path": "b", "dependencies": ["a"]},
+        ]
+        assert sorted(prioritize(files)) == [0, 1]
+
+
+# ===========================================================================
+# run_prioritized
+# ===========================================================================
+
+@pytest.mark.asyncio
+class TestRunPrioritized:
+    async def test_concurrency_cap_respected(self):
+        running = peak = 0
+
+        async def _generate(spec, deps):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return spec["path"]
+
+        files = [{"path": f"f{i}"} for i in range(10)]
+        results, _ = await run_prioritized(files, _generate, concurrency=3)
+
+        assert peak == 3
+        assert results == [f"f{i}" for i in range(10)]
+
+    async def test_started_in_priority_order(self):
+        started: list[str] = []
+
+        async def _generate(spec, deps):
+            started.append(spec["path"])
+
+        files = _plan()
+        await run_prioritized(files, _generate, concurrency=1)
+
+        assert started == [files[i]["path"] for i in prioritize(files)]
+
+    async def test_timings_reported(self):
+        snapshots: list[dict] = []
+
+        async def _generate(spec, deps):
+            return spec["path"]
+
+        _, timings = await run_prioritized(
+            [{"path": "a"}, {"path": "b"}], _generate, concurrency=2,
+            on_progress=lambda t: snapshots.append({p: v["status"] for p, v in t.items()}),
+        )
+
+        assert {t["status"] for t in timings.values()} == {"done"}
+        assert all(t["seconds"] >= 0 for t in timings.values())
+        assert snapshots[-1] == {"a": "done", "b": "done"}
+
+    async def test_failure_cancels_remaining(self):
+        started: list[str] = []
+
+        async def _generate(spec, deps):
+            started.append(spec["path"])
+            if spec["path"] == "f0":
+                raise RuntimeError("boom")
+            await asyncio.sleep(1)
+
+        files = [{"path": f"f{i}"} for i in range(5)]
+        with pytest.raises(RuntimeError):
+            await run_prioritized(files, _generate, concurrency=2)
+
+        assert len(started) == 2
+
+    async def test_dependencies_generated_first_and_passed(self):
+        started: list[str] = []
+        seen_deps: dict[str, set[str]] = {}
+
+        async def _generate(spec, deps):
+            started.append(spec["path"])
+            seen_deps[spec["path"]] = set(deps)
+            await asyncio.sleep(0.01)
+            return spec["path"].upper()
+
+        files = _plan()
+        results, _ = await run_prioritized(files, _generate, concurrency=8, respect_dependencies=True)
+
+        assert started.index("src/components/Button.astro") < started.index("src/components/Card.astro")
+        assert started.index("src/components/Card.astro") < started.index("src/pages/index.astro")
+        assert seen_deps["src/pages/index.astro"] == {"src/components/Card.astro", "src/layouts/Layout.astro"}
+        assert results[0] == "SRC/PAGES/INDEX.ASTRO"
+
+    async def test_independent_branches_run_in_parallel(self):
+        running = peak = 0
+
+        async def _generate(spec, deps):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await run_prioritized(_plan(), _generate, concurrency=8, respect_dependencies=True)
+
+        # первая волна — Layout и Button, у них нет зависимостей
+        assert peak == 2
+
+    async def test_dependency_cycle_does_not_deadlock(self):
+        async def _generate(spec, deps):
+            return spec["path"]
+
+        files = [
+            {"path": "a", "dependencies": ["b"]},
+            {"path": "b", "dependencies": ["a"]},
+        ]
+        results, _ = await asyncio.wait_for(
+            run_prioritized(files, _generate, concurrency=2, respect_dependencies=True), timeout=1,
+        )
+        assert results == ["a", "b"]
+
+    async def test_without_dependency_mode_deps_empty(self):
+        seen: list[dict] = []
+
+        async def _generate(spec, deps):
+            seen.append(deps)
+
+        await run_prioritized(_plan(), _generate, concurrency=1)
+        assert all(deps == {} for deps in seen)
+
+    async def test_completed_files_skipped_and_passed_to_dependents(self):
+        seen: dict[str, dict] = {}
+
+        async def _generate(spec, deps):
+            seen[spec["path"]] = deps
+            return spec["path"]
+
+        files = _plan()
+        results, timings = await run_prioritized(
+            files, _generate, concurrency=4, respect_dependencies=True,
+            completed={"src/components/Button.astro": "cached"},
+        )
+
+        assert "src/components/Button.astro" not in seen
+        assert seen["src/components/Card.astro"] == {"src/components/Button.astro": "cached"}
+        assert results[3] == "cached"
+        assert timings["src/components/Button.astro"] == {"status": "skipped"}
+
+    async def test_empty_plan(self):
+        async def _generate(spec, deps):
+            raise AssertionError("not called")
+
+        assert await run_prioritized([], _generate, concurrency=4) == ([], {})
+
+
+# ===========================================================================
+# Интерфейс сгенерированного компонента
+# ===========================================================================
+
+class TestExtractInterface:
+    def test_props_and_named_slots(self):
+        from app.agents.code_generator import CodeGeneratorAgent
+
+        content = (
+            "---\n"
+            "interface Props {\n  title: string;\n  href?: string;\n}\n"
+            "const { title, href = \"#\" } = Astro.props;\n"
+            "---\n"
+            "<a href={href}>{title}<slot /><slot name=\"icon\" /></a>\n"
+        )
+        summary = CodeGeneratorAgent.extract_interface("src/components/Button.astro", content)
+
+        assert summary.startswith("src/components/Button.astro")
+        assert "title: string;" in summary
+        assert 'Astro.props: { title, href = "#" }' in summary
+        assert "Слоты: default, icon" in summary
+
+    def test_plain_markup(self):
+        from app.agents.code_generator import CodeGeneratorAgent
+
+        summary = CodeGeneratorAgent.extract_interface("src/components/Footer.astro", "<footer>©</footer>")
+
+        assert "Props: нет" in summary
+        assert "Слоты: нет" in summary
+
+
+# ===========================================================================
+# TokenBudget
+# ===========================================================================
+
+@pytest.mark.asyncio
+class TestTokenBudget:
+    async def test_disabled_budget_never_waits(self):
+        budget = TokenBudget(0)
+        assert await budget.acquire(10**9) is None
+
+    async def test_waits_until_window_frees(self):
+        now = [0.0]
+        budget = TokenBudget(100, window=60.0, clock=lambda: now[0])
+        await budget.acquire(80)
+
+        async def _advance(delay):
+            now[0] += delay
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("app.services.llm_client.asyncio.sleep", _advance)
+            await budget.acquire(50)
+
+        assert now[0] == 60.0
+
+    async def test_settle_replaces_estimate(self):
+        budget = TokenBudget(100, clock=lambda: 0.0)
+        entry = await budget.acquire(90)
+        budget.settle(entry, 10)
+
+        assert budget.used() == 10
+        await asyncio.wait_for(budget.acquire(80), timeout=0.1)
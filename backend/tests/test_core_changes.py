@@ -41,6 +41,56 @@ class TestConfig:
 
 
 
+# Keyset-пагинация (core-pagination)
+
+
+class TestPagination:
+    def test_cursor_round_trip(self):
+        from uuid import uuid4
+        from app.core.pagination import decode_cursor, encode_cursor
+
+        key_id = uuid4()
+        cursor = encode_cursor({"version": 7, "id": key_id})
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor, version=int) == {"version": 7}
+        assert decode_cursor(cursor, id=str) == {"id": str(key_id)}
+
+    @pytest.mark.parametrize("cursor", ["not-base64!!", "e30", "bnVsbA"])  # мусор, {}, null
+    def test_invalid_cursor_is_400(self, cursor):
+        from fastapi import HTTPException
+        from app.core.pagination import decode_cursor
+
+        with pytest.raises(HTTPException) as exc_info:
+            decode_cursor(cursor, version=int)
+        assert exc_info.value.status_code == 400
+
+    def test_no_limit_no_cursor_means_full_list(self):
+        from app.core.pagination import page_limit
+
+        assert page_limit(None, None) is None
+
+    def test_limit_clamped_and_defaulted(self):
+        from app.core.config import settings
+        from app.core.pagination import page_limit
+
+        assert page_limit(10_000, None) == settings.PAGE_MAX_LIMIT
+        assert page_limit(None, "cursor") == settings.PAGE_DEFAULT_LIMIT
+
+    def test_finish_page_sets_next_cursor_only_when_more_rows(self):
+        from types import SimpleNamespace
+        from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, finish_page
+
+        full, last = SimpleNamespace(headers={}), SimpleNamespace(headers={})
+        page = finish_page([3, 2, 1], 2, full, lambda v: {"version": v})
+        tail = finish_page([1], 2, last, lambda v: {"version": v})
+
+        assert page == [3, 2]
+        assert decode_cursor(full.headers[NEXT_CURSOR_HEADER], version=int) == {"version": 2}
+        assert tail == [1]
+        assert NEXT_CURSOR_HEADER not in last.headers
+
+
 # Базовый агент: _extract_json
 
 
@@ -151,6 +201,127 @@ class TestCallLlm:
         assert result == "ok after retries"
         assert call_count == 3
 
+    async def test_streaming_reports_progress(self):
+        agent = self._make_agent()
+        agent.client = MagicMock()
+
+        def _chunk(text=None, usage=None):
+            chunk = MagicMock()
+            chunk.usage = usage
+            choice = MagicMock()
+            choice.delta.content = text
+            chunk.choices = [choice] if text is not None else []
+            return chunk
+
+        async def _stream():
+            for chunk in (_chunk("<h1>"), _chunk("Привет"), _chunk("</h1>"), _chunk(usage=MagicMock(total_tokens=42))):
+                yield chunk
+
+        mock_create = AsyncMock(return_value=_stream())
+        agent.client.chat.completions.create = mock_create
+        progress: list[tuple[int, int]] = []
+
+        result = await agent._call_llm("sys", "user", on_delta=lambda b, t: progress.append((b, t)))
+
+        assert result == "<h1>Привет</h1>"
+        assert progress == [(4, 1), (16, 2), (21, 3)]
+        assert mock_create.call_args.kwargs["stream"] is True
+
+    async def test_cached_prompt_tokens_recorded(self):
+        from app.services import llm_client
+
+        agent = self._make_agent()
+        agent.client = MagicMock()
+        response = self._mock_response("ok")
+        response.usage = MagicMock(total_tokens=1200, prompt_tokens=1000)
+        response.usage.prompt_tokens_details.cached_tokens = 768
+        agent.client.chat.completions.create = AsyncMock(return_value=response)
+        before = dict(llm_client._stats)
+
+        await agent._call_llm("sys", "user")
+
+        assert llm_client._stats["prompt_tokens"] - before["prompt_tokens"] == 1000
+        assert llm_client._stats["cached_prompt_tokens"] - before["cached_prompt_tokens"] == 768
+        assert llm_client.record_usage(MagicMock(spec=[])) is None
+
+
+
+# Общий пул LLM-клиентов
+
+
+@pytest.mark.asyncio
+class TestLlmClientRegistry:
+    async def test_agents_share_one_client(self):
+        from app.agents.architect import ArchitectAgent
+        from app.agents.optimizer import OptimizerAgent
+        from app.services.llm_client import close_llm_clients
+
+        try:
+            assert OptimizerAgent().client is ArchitectAgent().client
+        finally:
+            await close_llm_clients()
+
+    async def test_client_per_endpoint(self):
+        from app.services.llm_client import close_llm_clients, get_llm_client
+
+        try:
+            a = get_llm_client("https://a.example/v1", "key")
+            assert get_llm_client("https://a.example/v1", "key") is a
+            assert get_llm_client("https://b.example/v1", "key") is not a
+            assert get_llm_client("https://a.example/v1", "other") is not a
+        finally:
+            await close_llm_clients()
+
+    async def test_close_drops_clients_of_loop(self):
+        from app.services.llm_client import close_llm_clients, get_llm_client, llm_client_stats
+
+        first = get_llm_client("https://a.example/v1", "key")
+        assert "https://a.example/v1" in llm_client_stats()["pools"]
+        await close_llm_clients()
+
+        assert llm_client_stats()["pools"] == {}
+        try:
+            assert get_llm_client("https://a.example/v1", "key") is not first
+        finally:
+            await close_llm_clients()
+
+    async def test_run_with_llm_clients_closes_on_error(self):
+        from app.services import llm_client
+
+        async def _failing():
+            llm_client.get_llm_client("https://a.example/v1", "key")
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await llm_client.run_with_llm_clients(_failing())
+        assert llm_client.llm_client_stats()["pools"] == {}
+
+    async def test_stats_published_and_collected(self):
+        """Метрики воркеров доходят до API через Redis (llm:stats:*)."""
+        from app.services import llm_client
+
+        stored: dict[str, str] = {}
+        redis = MagicMock()
+        redis.set = AsyncMock(side_effect=lambda key, value, ex: stored.__setitem__(key, value))
+        redis.aclose = AsyncMock()
+
+        async def _scan_iter(match):
+            for key in list(stored):
+                yield key
+
+        redis.scan_iter = _scan_iter
+        redis.get = AsyncMock(side_effect=lambda key: stored.get(key))
+
+        with patch("app.services.llm_client.redis_from_url", return_value=redis):
+            await llm_client.close_llm_clients()
+        collected = await llm_client.collect_llm_stats(redis)
+
+        assert len(collected["processes"]) == 1
+        (process,) = collected["processes"].values()
+        assert process["requests"] == collected["current"]["requests"]
+        assert "hits_memory" in process["cache"]
+        redis.aclose.assert_awaited_once()
+
 
 
 # Агент A0: OptimizerAgent.run()
@@ -264,6 +435,30 @@ class TestCodeGeneratorAgent:
         _, user_prompt = agent._call_llm.call_args[0]
         assert "#ff0000" in user_prompt
 
+    async def test_shared_project_context_is_prompt_prefix(self):
+        """Общее начало запросов A2 не зависит от файла — его кэширует провайдер."""
+        spec = {"global_style": {"primary_color": "#ff0000"}}
+        prompts = []
+        for path in ("src/pages/index.astro", "src/components/Hero.astro"):
+            agent = self._make_agent("code")
+            await agent.run({"file": {"path": path, "description": "x"}, "project_spec": spec})
+            prompts.append(agent._call_llm.call_args[0][1])
+
+        prefix = prompts[0].split("Файл для генерации")[0]
+        assert "#ff0000" in prefix
+        assert prompts[1].startswith(prefix)
+
+    async def test_dependency_interfaces_in_prompt(self):
+        agent = self._make_agent("code")
+        await agent.run({
+            "file": {"path": "src/pages/index.astro", "description": "Main"},
+            "project_spec": {},
+            "dependencies": {"src/components/Button.astro": "src/components/Button.astro\nProps: нет"},
+        })
+        _, user_prompt = agent._call_llm.call_args[0]
+        assert "Зависимости уже сгенерированы" in user_prompt
+        assert "src/components/Button.astro\nProps: нет" in user_prompt
+
     async def test_content_is_raw_not_parsed(self):
         """A2 возвращает сырой код, не парсит JSON."""
         raw_code = "const x = 1;\nexport default x;"
@@ -30,6 +30,7 @@ def _make_storage(
 
     svc.get_file = AsyncMock(return_value=get_file_return)
     svc.save_file = AsyncMock()
+    svc.save_blob = AsyncMock(return_value="a" * 64)
     return svc
 
 
@@ -45,6 +46,7 @@ def _edit_body(project_id: str | None = None) -> MagicMock:
     body.element.file_path = "src/pages/index.astro"
     body.element.editable_id = "hero-title"
     body.instruction = "Измени заголовок"
+    body.operation = None
     body.ai_model = "gpt-4o-mini"
     return body
 
@@ -150,6 +152,106 @@ class TestEditElementRouter:
         _, kwargs = mock_celery.delay.call_args
         assert kwargs["user_id"] == internal_id
 
+    async def test_operation_applied_without_celery_edit(self):
+        """operation правит исходник сразу: снапшот + run_build, без A4."""
+        from app.api.v1.editor.router import edit_element
+        from app.schemas.editor import ElementOperation
+        from app.services.element_locator import stable_id
+
+        uid, project_id = str(uuid4()), str(uuid4())
+        body = _edit_body(project_id)
+        body.element.file_path = "pages/index.astro"
+        body.element.editable_id = stable_id("pages/index.astro", 0)
+        body.operation = ElementOperation(type="set_text", value="Новый заголовок")
+        storage = _make_storage(get_file_return=b"<h1>Old</h1>\n")
+        redis = AsyncMock()
+        db = AsyncMock()
+        blobs_at_allocate: list[int] = []
+
+        async def _allocate(db, project_id):
+            blobs_at_allocate.append(storage.save_blob.await_count)
+            return 4
+
+        with (
+            patch("app.api.v1.editor.router.StorageService", return_value=storage),
+            patch("app.api.v1.editor.router.snapshot_repo.allocate_version", new=_allocate),
+            patch("app.api.v1.editor.router.snapshot_repo.create", new=AsyncMock()) as mock_create,
+            patch("app.api.v1.editor.router.project_repo.set_active_snapshot_version",
+                  new=AsyncMock()),
+            patch("app.api.v1.editor.router.run_build_task") as mock_build,
+            patch("app.api.v1.editor.router.edit_element_task") as mock_celery,
+        ):
+            mock_build.delay.return_value = MagicMock(id="build-task")
+            result = await edit_element(body=body, db=db, redis=redis, user=_user(uid))
+
+        storage.save_file.assert_awaited_once_with(
+            "projects", f"projects/{uid}/{project_id}/src/pages/index.astro",
+            "<h1>Новый заголовок</h1>\n".encode(),
+        )
+        assert mock_create.call_args.kwargs["version"] == 4
+        # blob записан до allocate_version — I/O MinIO не под блокировкой строки проекта
+        assert blobs_at_allocate == [1]
+        db.commit.assert_awaited_once()
+        mock_build.delay.assert_called_once_with(project_id, uid)
+        mock_celery.delay.assert_not_called()
+        assert (result.task_id, result.status) == ("build-task", "building")
+
+    async def test_operation_on_missing_file_returns_404(self):
+        from fastapi import HTTPException
+
+        from app.api.v1.editor.router import edit_element
+        from app.schemas.editor import ElementOperation
+
+        body = _edit_body()
+        body.operation = ElementOperation(type="set_text", value="x")
+        storage = _make_storage()
+        storage.get_file = AsyncMock(side_effect=Exception("Error reading file from MinIO: NoSuchKey"))
+
+        with patch("app.api.v1.editor.router.StorageService", return_value=storage), \
+             patch("app.api.v1.editor.router.run_build_task") as mock_build:
+            with pytest.raises(HTTPException) as exc_info:
+                await edit_element(body=body, db=AsyncMock(), redis=AsyncMock(), user=_user())
+
+        assert exc_info.value.status_code == 404
+        mock_build.delay.assert_not_called()
+
+    async def test_unappliable_operation_falls_back_to_ai(self):
+        from app.api.v1.editor.router import edit_element
+        from app.schemas.editor import ElementOperation
+
+        body = _edit_body()
+        body.operation = ElementOperation(type="set_text", value="x")
+        storage = _make_storage(get_file_return=b"<h1>Old</h1>")
+
+        with (
+            patch("app.api.v1.editor.router.StorageService", return_value=storage),
+            patch("app.api.v1.editor.router.edit_element_task") as mock_celery,
+        ):
+            mock_celery.delay.return_value = MagicMock(id="t")
+            result = await edit_element(body=body, db=AsyncMock(), redis=AsyncMock(), user=_user())
+
+        mock_celery.delay.assert_called_once()
+        storage.save_file.assert_not_awaited()
+        assert result.status == "queued"
+
+    async def test_unappliable_operation_without_instruction_is_422(self):
+        from fastapi import HTTPException
+        from app.api.v1.editor.router import edit_element
+        from app.schemas.editor import ElementOperation
+
+        body = _edit_body()
+        body.instruction = ""
+        body.operation = ElementOperation(type="add_class", value="red")
+        storage = _make_storage(get_file_return=b"<h1>Old</h1>")
+
+        with (
+            patch("app.api.v1.editor.router.StorageService", return_value=storage),
+            pytest.raises(HTTPException) as exc_info,
+        ):
+            await edit_element(body=body, db=AsyncMock(), redis=AsyncMock(), user=_user())
+
+        assert exc_info.value.status_code == 422
+
 
 # ===========================================================================
 # workers/tasks/edit._edit() — async core logic
@@ -175,8 +277,8 @@ class TestEditTaskCore:
         # run_build импортируется локально внутри _edit(), поэтому патчим в build-модуле
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=snapshot_latest_version)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=snapshot_latest_version + 1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -250,9 +352,9 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=2)),
-            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=3)),
+            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()) as mock_create,
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
             patch("app.workers.tasks.edit.AsyncSessionFactory") as msf,
@@ -273,10 +375,12 @@ class TestEditTaskCore:
                 storage=storage,
             )
 
-        # первый save_file — обновлённый src-файл
-        assert len(saved_paths) == 2
+        # save_file — только обновлённый src-файл; снапшот ссылается на blob
+        assert len(saved_paths) == 1
         assert "snapshots" not in saved_paths[0]
-        assert f"snapshots/v3/" in saved_paths[1]
+        kwargs = mock_create.call_args.kwargs
+        assert kwargs["version"] == 3
+        assert kwargs["files"] == {"pages/index.astro": ("a" * 64, len(b"new code"))}
 
     async def test_snapshot_contains_original_content(self):
         from app.workers.tasks.edit import _edit
@@ -295,8 +399,8 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -318,13 +422,11 @@ class TestEditTaskCore:
                 storage=storage,
             )
 
-        # saved_calls[0] — src-файл с новым кодом; saved_calls[1] — снапшот с новым кодом
+        # saved_calls[0] — src-файл с новым кодом; снапшот — blob с новым кодом
         src_path, src_data = saved_calls[0]
-        snap_path, snap_data = saved_calls[1]
         assert "snapshots" not in src_path
-        assert "snapshots/v1/" in snap_path
         # снапшот хранит новый код (состояние после правки)
-        assert snap_data == b"new"
+        storage.save_blob.assert_awaited_once_with(uid, pid, b"new")
 
     async def test_calls_editor_agent_with_file_content(self):
         from app.workers.tasks.edit import _edit
@@ -337,8 +439,8 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent) as MockAgent,
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -367,6 +469,7 @@ class TestEditTaskCore:
             element_html="",
             prompt="Сделай красным",
             project_context="",
+            file_path="src/index.astro",
         )
 
     async def test_saves_new_code_to_minio(self):
@@ -386,8 +489,8 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -409,8 +512,9 @@ class TestEditTaskCore:
                 storage=storage,
             )
 
-        # второй вызов save_file — обновлённый файл
-        _, final_path, final_data = saved_calls[1][0], saved_calls[1][0], saved_calls[1][1]
+        # save_file — обновлённый файл
+        final_path, final_data = saved_calls[0]
+        assert "snapshots" not in final_path
         assert final_data == new_code.encode("utf-8")
 
     async def test_queues_rebuild_after_save(self):
@@ -423,8 +527,8 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -464,9 +568,9 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=5)),
-            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=6)),
+            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()) as mock_create,
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
             patch("app.workers.tasks.edit.AsyncSessionFactory") as msf,
@@ -487,8 +591,8 @@ class TestEditTaskCore:
                 storage=storage,
             )
 
-        # saved_paths[0] — src-файл, saved_paths[1] — снапшот с версией
-        assert "snapshots/v6/" in saved_paths[1]
+        assert mock_create.call_args.kwargs["version"] == 6
+        assert list(mock_create.call_args.kwargs["files"]) == ["index.astro"]
 
     async def test_redis_progress_stages(self):
         """_set_redis_status вызывается на ключевых этапах pipeline."""
@@ -501,8 +605,8 @@ class TestEditTaskCore:
 
         with (
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -530,6 +634,51 @@ class TestEditTaskCore:
         # строго: editing появляется раньше building
         assert stages.index("editing") < stages.index("building")
 
+    async def test_element_edit_sends_only_fragment(self):
+        """Найденный по editable_id элемент правится фрагментом и вклеивается обратно."""
+        from app.services.element_locator import stable_id
+        from app.workers.tasks.edit import _edit
+
+        lines = [f"<p>Абзац {i}</p>" for i in range(8)]
+        code = "\n".join(lines) + "\n"
+        element_id = stable_id("pages/index.astro", 4)
+        uid, pid = str(uuid4()), str(uuid4())
+        storage = _make_storage(get_file_return=code.encode())
+        mock_agent = MagicMock()
+        mock_agent.edit = AsyncMock(return_value="<p>Абзац 3</p>\n<p>Новый</p>\n<p>Абзац 5</p>\n")
+
+        with (
+            patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
+            patch("app.workers.tasks.edit.settings.EDITOR_CONTEXT_LINES", 1),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
+            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
+            patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
+                  new=AsyncMock()),
+            patch("app.workers.tasks.edit.AsyncSessionFactory") as msf,
+            patch("app.workers.tasks.edit._set_redis_status"),
+            patch("app.workers.tasks.build.run_build") as mb,
+        ):
+            mock_db = AsyncMock()
+            mock_db.__aenter__ = AsyncMock(return_value=mock_db)
+            mock_db.__aexit__ = AsyncMock(return_value=False)
+            msf.return_value = mock_db
+            mb.delay = MagicMock()
+
+            await _edit(
+                project_id=pid, user_id=uid,
+                file_path="pages/index.astro", element_id=element_id,
+                prompt="p", ai_model="gpt-4o", project_context="",
+                storage=storage,
+            )
+
+        kwargs = mock_agent.edit.call_args.kwargs
+        assert kwargs["current_code"] == "<p>Абзац 3</p>\n<p>Абзац 4</p>\n<p>Абзац 5</p>\n"
+        assert kwargs["fragment_of"] == "pages/index.astro"
+        assert kwargs["element_tag"] == "<p>"
+        saved = storage.save_file.call_args[0][2].decode()
+        assert saved == code.replace("<p>Абзац 4</p>", "<p>Новый</p>")
+
 
 # ===========================================================================
 # workers/tasks/edit._edit_all_files() — "Весь проект"
@@ -591,8 +740,8 @@ class TestEditAllFilesCore:
         with (
             patch("app.workers.tasks.edit.PlannerAgent", return_value=mock_planner),
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=latest_version)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=latest_version + 1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=mock_create),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -657,6 +806,7 @@ class TestEditAllFilesCore:
             element_id="",
             prompt="Сделай всё синим",
             project_context="",
+            file_path="pages/index.astro",
         )
 
     async def test_saves_edited_content_to_src_for_each_file(self):
@@ -679,7 +829,7 @@ class TestEditAllFilesCore:
         assert f"{prefix}pages/index.astro" in saved_paths
         assert f"{prefix}components/Hero.astro" in saved_paths
 
-    async def test_creates_snapshot_record_per_file(self):
+    async def test_creates_one_snapshot_with_all_files(self):
         uid, pid = str(uuid4()), str(uuid4())
         prefix = f"projects/{uid}/{pid}/src/"
         files = {
@@ -691,7 +841,10 @@ class TestEditAllFilesCore:
 
         _, mock_create, _ = await self._run(uid, pid, storage)
 
-        assert mock_create.call_count == 3
+        mock_create.assert_awaited_once()
+        assert set(mock_create.call_args.kwargs["files"]) == {
+            "pages/index.astro", "components/Hero.astro", "styles/global.css",
+        }
 
     async def test_all_snapshots_share_same_version(self):
         uid, pid = str(uuid4()), str(uuid4())
@@ -705,7 +858,7 @@ class TestEditAllFilesCore:
         _, mock_create, _ = await self._run(uid, pid, storage, latest_version=3)
 
         versions = [c.kwargs["version"] for c in mock_create.call_args_list]
-        assert versions == [4, 4]  # latest + 1, одинаковый для всех
+        assert versions == [4]  # latest + 1, одна версия на все файлы
 
     async def test_snapshot_version_increments_from_latest(self):
         uid, pid = str(uuid4()), str(uuid4())
@@ -717,7 +870,7 @@ class TestEditAllFilesCore:
 
         assert mock_create.call_args.kwargs["version"] == 8
 
-    async def test_snapshot_paths_contain_version_and_relative_path(self):
+    async def test_manifest_keyed_by_relative_path(self):
         uid, pid = str(uuid4()), str(uuid4())
         prefix = f"projects/{uid}/{pid}/src/"
         files = {f"{prefix}pages/index.astro": b"A"}
@@ -725,9 +878,9 @@ class TestEditAllFilesCore:
 
         _, mock_create, _ = await self._run(uid, pid, storage, latest_version=1)
 
-        snap_path = mock_create.call_args.kwargs["minio_path"]
-        assert f"snapshots/v2/" in snap_path
-        assert snap_path.endswith("pages/index.astro")
+        kwargs = mock_create.call_args.kwargs
+        assert kwargs["version"] == 2
+        assert list(kwargs["files"]) == ["pages/index.astro"]
 
     async def test_queues_exactly_one_build(self):
         uid, pid = str(uuid4()), str(uuid4())
@@ -825,6 +978,29 @@ class TestEditAllFilesCore:
         # второй файл: LLM-результат
         assert saved_data[f"{prefix}components/Hero.astro"] == "edited B".encode()
 
+    async def test_edits_run_concurrently_up_to_limit(self):
+        """Файлы правятся параллельно, но не больше EDITOR_MAX_CONCURRENCY сразу."""
+        import asyncio
+
+        uid, pid = str(uuid4()), str(uuid4())
+        prefix = f"projects/{uid}/{pid}/src/"
+        files = {f"{prefix}pages/p{i}.astro": b"<p>x</p>" for i in range(5)}
+        storage = _make_multi_storage(files)
+        running = {"now": 0, "max": 0}
+
+        async def slow_edit(**kwargs):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return "edited"
+
+        with patch("app.workers.tasks.edit.settings.EDITOR_MAX_CONCURRENCY", 2):
+            _, mock_create, _ = await self._run(uid, pid, storage, agent_side_effect=slow_edit)
+
+        assert running["max"] == 2
+        assert len(mock_create.call_args.kwargs["files"]) == 5
+
     async def test_redis_reports_editing_then_building(self):
         uid, pid = str(uuid4()), str(uuid4())
         prefix = f"projects/{uid}/{pid}/src/"
@@ -844,8 +1020,8 @@ class TestEditAllFilesCore:
         with (
             patch("app.workers.tasks.edit.PlannerAgent", return_value=mock_planner),
             patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
-            patch("app.workers.tasks.edit.snapshot_repo.get_latest_version",
-                  new=AsyncMock(return_value=0)),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version",
+                  new=AsyncMock(return_value=1)),
             patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
             patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version",
                   new=AsyncMock()),
@@ -886,3 +1062,140 @@ class TestEditAllFilesCore:
 
         # агент должен быть вызван только для реального файла
         assert mock_agent.edit.call_count == 1
+
+
+# ===========================================================================
+# POST /editor/edit/batch и workers/tasks/edit._edit_batch()
+# ===========================================================================
+
+@pytest.mark.asyncio
+class TestEditBatch:
+
+    async def test_router_queues_one_task(self):
+        from app.api.v1.editor.router import edit_batch
+        from app.schemas.editor import BatchEditItem, BatchEditRequest, ElementInfo
+
+        uid, pid = str(uuid4()), str(uuid4())
+        body = BatchEditRequest(project_id=pid, edits=[
+            BatchEditItem(element=ElementInfo(editable_id="a", file_path="pages/index.astro", element_html=""),
+                          instruction="Сделай красным"),
+            BatchEditItem(element=ElementInfo(editable_id="b", file_path="pages/index.astro", element_html=""),
+                          operation={"type": "set_text", "value": "Привет"}),
+        ])
+
+        with patch("app.api.v1.editor.router.edit_batch_task") as mock_task:
+            mock_task.delay.return_value = MagicMock(id="batch-task")
+            result = await edit_batch(body=body, redis=AsyncMock(), user=_user(uid))
+
+        mock_task.delay.assert_called_once()
+        edits = mock_task.delay.call_args.kwargs["edits"]
+        assert [e["element_id"] for e in edits] == ["a", "b"]
+        assert edits[1]["operation"] == {"type": "set_text", "value": "Привет", "name": None}
+        assert result.file_paths == ["pages/index.astro"]
+
+    async def test_one_llm_call_per_file_one_snapshot_one_build(self):
+        from app.services.element_locator import stable_id
+        from app.workers.tasks.edit import _edit_batch
+
+        uid, pid = str(uuid4()), str(uuid4())
+        prefix = f"projects/{uid}/{pid}/src/"
+        files = {
+            f"{prefix}pages/index.astro": b"<h1>Title</h1>\n<p>Text</p>\n",
+            f"{prefix}components/Footer.astro": b"<p>Footer</p>\n",
+        }
+        storage = _make_multi_storage(files)
+        storage.save_blob = AsyncMock(return_value="a" * 64)
+        mock_agent = MagicMock()
+        mock_agent.edit_many = AsyncMock(side_effect=lambda code, targets, **kwargs: code + "<!-- ai -->\n")
+        edits = [
+            {"file_path": "pages/index.astro", "element_id": stable_id("pages/index.astro", 0),
+             "instruction": "", "operation": {"type": "set_text", "value": "New title", "name": None}},
+            {"file_path": "pages/index.astro", "element_id": stable_id("pages/index.astro", 1),
+             "instruction": "Сделай абзац длиннее", "operation": None},
+            {"file_path": "pages/index.astro", "element_id": "other",
+             "instruction": "Добавь иконку", "operation": None},
+            {"file_path": "components/Footer.astro", "element_id": stable_id("components/Footer.astro", 0),
+             "instruction": "", "operation": {"type": "add_class", "value": "muted", "name": None}},
+        ]
+
+        with (
+            patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version", new=AsyncMock(return_value=7)),
+            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()) as mock_create,
+            patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version", new=AsyncMock()),
+            patch("app.workers.tasks.edit.AsyncSessionFactory") as msf,
+            patch("app.workers.tasks.edit._set_redis_status"),
+            patch("app.workers.tasks.build.run_build") as mock_build,
+        ):
+            mock_db = AsyncMock()
+            mock_db.__aenter__ = AsyncMock(return_value=mock_db)
+            mock_db.__aexit__ = AsyncMock(return_value=False)
+            msf.return_value = mock_db
+            mock_build.delay = MagicMock()
+
+            report = await _edit_batch(
+                project_id=pid, user_id=uid, edits=edits,
+                ai_model="gpt-4o", project_context="", storage=storage,
+            )
+
+        assert len(report["applied"]) == 4
+        assert report["skipped"] == []
+        # index.astro: операция применена до A4, обе инструкции — одним вызовом
+        mock_agent.edit_many.assert_awaited_once()
+        code, targets = mock_agent.edit_many.call_args.args
+        assert code.startswith("<h1>New title</h1>")
+        assert [t["prompt"] for t in targets] == ["Сделай абзац длиннее", "Добавь иконку"]
+        assert targets[0]["element_tag"] == "<p>"
+        saved = {c.args[1]: c.args[2] for c in storage.save_file.call_args_list}
+        assert saved[f"{prefix}pages/index.astro"].endswith(b"<!-- ai -->\n")
+        assert saved[f"{prefix}components/Footer.astro"] == b'<p class="muted">Footer</p>\n'
+        assert set(mock_create.call_args.kwargs["files"]) == {"pages/index.astro", "components/Footer.astro"}
+        mock_create.assert_awaited_once()
+        mock_build.delay.assert_called_once_with(pid, uid)
+
+    async def test_failed_edits_reported_as_skipped(self):
+        """Неприменимая операция без инструкции и сбой A4 не считаются применёнными."""
+        from app.services.element_locator import stable_id
+        from app.workers.tasks.edit import _edit_batch
+
+        uid, pid = str(uuid4()), str(uuid4())
+        prefix = f"projects/{uid}/{pid}/src/"
+        storage = _make_multi_storage({
+            f"{prefix}pages/index.astro": b"<h1>Title</h1>\n",
+            f"{prefix}components/Footer.astro": b"<p>Footer</p>\n",
+        })
+        storage.save_blob = AsyncMock(return_value="a" * 64)
+        mock_agent = MagicMock()
+        mock_agent.edit_many = AsyncMock(side_effect=RuntimeError("LLM down"))
+        edits = [
+            {"file_path": "pages/index.astro", "element_id": stable_id("pages/index.astro", 0),
+             "instruction": "", "operation": {"type": "set_text", "value": "New", "name": None}},
+            {"file_path": "pages/index.astro", "element_id": "missing",
+             "instruction": "  ", "operation": {"type": "set_text", "value": "x", "name": None}},
+            {"file_path": "components/Footer.astro", "element_id": "f",
+             "instruction": "Сделай мельче", "operation": None},
+        ]
+
+        with (
+            patch("app.workers.tasks.edit.EditorAgent", return_value=mock_agent),
+            patch("app.workers.tasks.edit.snapshot_repo.allocate_version", new=AsyncMock(return_value=2)),
+            patch("app.workers.tasks.edit.snapshot_repo.create", new=AsyncMock()),
+            patch("app.workers.tasks.edit.project_repo.set_active_snapshot_version", new=AsyncMock()),
+            patch("app.workers.tasks.edit.AsyncSessionFactory") as msf,
+            patch("app.workers.tasks.edit._set_redis_status") as mock_status,
+            patch("app.workers.tasks.build.run_build"),
+        ):
+            mock_db = AsyncMock()
+            mock_db.__aenter__ = AsyncMock(return_value=mock_db)
+            mock_db.__aexit__ = AsyncMock(return_value=False)
+            msf.return_value = mock_db
+
+            report = await _edit_batch(
+                project_id=pid, user_id=uid, edits=edits,
+                ai_model="gpt-4o", project_context="", storage=storage,
+            )
+
+        assert [e["element_id"] for e in report["applied"]] == [stable_id("pages/index.astro", 0)]
+        assert [e["element_id"] for e in report["skipped"]] == ["missing", "f"]
+        assert report["skipped"][1]["reason"].startswith("AI edit failed")
+        assert mock_status.call_args.kwargs["skipped"] == report["skipped"]
@@ -187,3 +187,82 @@ class TestEditorAgentRun:
             "prompt": "Сделай что-нибудь",
         })
         assert "content" in result
+
+
+# ---------------------------------------------------------------------------
+# edit() в режиме patch
+# ---------------------------------------------------------------------------
+
+_PAGE = """\
+---
+const title = "Кофейня";
+---
+<main>
+  <h1 data-editable-id="hero-title">Добро пожаловать</h1>
+  <p data-editable-id="hero-text">Лучший кофе</p>
+</main>
+"""
+
+_PATCH = """\
+<<<<<<< SEARCH
+  <h1 data-editable-id="hero-title">Добро пожаловать</h1>
+=======
+  <h1 data-editable-id="hero-title">Свежая обжарка</h1>
+>>>>>>> REPLACE
+"""
+
+
+@pytest.mark.asyncio
+class TestEditorAgentPatchMode:
+
+    async def test_patch_applied_without_full_file_call(self):
+        """Применимый патч — один вызов LLM с PATCH_SYSTEM_PROMPT."""
+        from app.agents.editor import EditorAgent
+        agent = _make_agent(_PATCH)
+        result = await agent.edit(current_code=_PAGE, element_id="hero-title", prompt="Смени заголовок")
+
+        assert result == _PAGE.replace("Добро пожаловать", "Свежая обжарка")
+        agent._call_llm.assert_awaited_once()
+        assert agent._call_llm.call_args[0][0] == EditorAgent.PATCH_SYSTEM_PROMPT
+
+    async def test_unappliable_patch_falls_back_to_full_file(self):
+        """SEARCH не найден в файле — повтор полным файлом с SYSTEM_PROMPT."""
+        from app.agents.editor import EditorAgent
+        stale = _PATCH.replace("Добро пожаловать", "Привет")
+        full = _PAGE.replace("Добро пожаловать", "Свежая обжарка")
+        agent = _make_agent("")
+        agent._call_llm = AsyncMock(side_effect=[stale, full])
+
+        result = await agent.edit(current_code=_PAGE, element_id="hero-title", prompt="Смени заголовок")
+
+        assert result == full
+        systems = [c.args[0] for c in agent._call_llm.call_args_list]
+        assert systems == [EditorAgent.PATCH_SYSTEM_PROMPT, EditorAgent.SYSTEM_PROMPT]
+
+    async def test_full_mode_setting_skips_patch(self):
+        from unittest.mock import patch
+        from app.agents.editor import EditorAgent
+        agent = _make_agent("<h1>New</h1>")
+        with patch("app.agents.editor.settings.EDITOR_EDIT_MODE", "full"):
+            await agent.edit(current_code=_PAGE, element_id="", prompt="p")
+
+        agent._call_llm.assert_awaited_once()
+        assert agent._call_llm.call_args[0][0] == EditorAgent.SYSTEM_PROMPT
+
+
+@pytest.mark.asyncio
+class TestEditorAgentEditMany:
+
+    async def test_all_tasks_in_one_prompt(self):
+        agent = _make_agent(_PATCH)
+        result = await agent.edit_many(_PAGE, [
+            {"element_id": "hero-title", "prompt": "Смени заголовок", "element_tag": "<h1>"},
+            {"element_id": "hero-text", "prompt": "Сделай текст короче"},
+        ])
+
+        agent._call_llm.assert_awaited_once()
+        _, user_prompt = agent._call_llm.call_args[0]
+        assert "1. Элемент data-editable-id=\"hero-title\", открывающий тег в исходнике: `<h1>`" in user_prompt
+        assert "2. Элемент data-editable-id=\"hero-text\"" in user_prompt
+        assert "Сделай текст короче" in user_prompt
+        assert "Свежая обжарка" in result
@@ -45,7 +45,7 @@ def _update_file_body(project_id: str, file_path: str = "src/index.astro", conte
 
 
 def _db_session(latest_version: int = 2) -> AsyncMock:
-    """AsyncMock сессии; snapshot_repo.get_latest_version заменяется отдельно."""
+    """AsyncMock сессии; snapshot_repo.allocate_version заменяется отдельно."""
     session = AsyncMock()
     session.commit = AsyncMock()
     return session
@@ -185,7 +185,7 @@ class TestUpdateFileCode:
 
         with (
             patch("app.api.v1.editor.router.StorageService", return_value=storage),
-            patch("app.api.v1.editor.router.snapshot_repo.get_latest_version", new=AsyncMock(return_value=3)),
+            patch("app.api.v1.editor.router.snapshot_repo.allocate_version", new=AsyncMock(return_value=4)),
             patch("app.api.v1.editor.router.snapshot_repo.create", new=AsyncMock()),
         ):
             await update_file_code(body=body, db=db, user=_user(uid))
@@ -210,7 +210,7 @@ class TestUpdateFileCode:
 
         with (
             patch("app.api.v1.editor.router.StorageService", return_value=storage),
-            patch("app.api.v1.editor.router.snapshot_repo.get_latest_version", new=AsyncMock(return_value=0)),
+            patch("app.api.v1.editor.router.snapshot_repo.allocate_version", new=AsyncMock(return_value=1)),
             patch("app.api.v1.editor.router.snapshot_repo.create", new=AsyncMock()),
         ):
             await update_file_code(body=body, db=db, user=_user())
@@ -249,7 +249,7 @@ class TestUpdateFileCode:
 
         with (
             patch("app.api.v1.editor.router.StorageService", return_value=storage),
-            patch("app.api.v1.editor.router.snapshot_repo.get_latest_version", new=AsyncMock(return_value=7)),
+            patch("app.api.v1.editor.router.snapshot_repo.allocate_version", new=AsyncMock(return_value=8)),
             patch("app.api.v1.editor.router.snapshot_repo.create", new=AsyncMock()),
         ):
             await update_file_code(body=body, db=_db_session(), user=_user())
@@ -265,7 +265,7 @@ class TestUpdateFileCode:
 
         with (
             patch("app.api.v1.editor.router.StorageService", return_value=storage),
-            patch("app.api.v1.editor.router.snapshot_repo.get_latest_version", new=AsyncMock(return_value=0)),
+            patch("app.api.v1.editor.router.snapshot_repo.allocate_version", new=AsyncMock(return_value=1)),
             patch("app.api.v1.editor.router.snapshot_repo.create", new=AsyncMock()),
         ):
             await update_file_code(body=body, db=db, user=_user())
@@ -0,0 +1,66 @@
+"""Unit-тесты для app/services/element_locator.py (нумерация как в scripts/pre-build.cjs).
+
+Запуск:
+    cd backend
+    pytest tests/test_element_locator.py -v
+"""
+from __future__ import annotations
+
+import hashlib
+
+from app.services.element_locator import line_window, locate_element, stable_id
+
+_PAGE = """\
+---
+import Layout from '../layouts/Layout.astro';
+---
+<Layout>
+  <section class="hero">
+    <div class="inner">
+      <div><h1>Кофейня</h1></div>
+      <img src="/cup.png" alt="">
+    </div>
+  </section>
+  <article><p>Текст</p></article>
+</Layout>
+"""
+
+
+class TestStableId:
+    def test_matches_pre_build_formula(self):
+        expected = hashlib.sha256(b"pages/index.astro:3").hexdigest()[:16]
+        assert stable_id("pages/index.astro", 3) == expected
+
+
+class TestLocateElement:
+    def test_nested_same_tag_closes_at_matching_end(self):
+        # теги по порядку: section(0) div(1) div(2) h1(3) img(4) p(5); <Layout>/<article> не считаются
+        span = locate_element(_PAGE, "pages/index.astro", stable_id("pages/index.astro", 1))
+        assert span.open_tag == '<div class="inner">'
+        fragment = _PAGE[span.start:span.end]
+        assert fragment.startswith('<div class="inner">') and fragment.endswith("</div>")
+        assert "<img" in fragment and "</section>" not in fragment
+
+    def test_void_tag_is_just_the_tag(self):
+        span = locate_element(_PAGE, "/pages/index.astro", stable_id("pages/index.astro", 4))
+        assert _PAGE[span.start:span.end] == '<img src="/cup.png" alt="">'
+
+    def test_explicit_attribute_wins(self):
+        code = '<p data-editable-id="custom">a</p>'
+        span = locate_element(code, "x.astro", "custom")
+        assert (span.start, span.end) == (0, len(code))
+
+    def test_unknown_id_is_none(self):
+        assert locate_element(_PAGE, "pages/index.astro", "0" * 16) is None
+
+
+class TestLineWindow:
+    def test_window_covers_whole_lines_and_context(self):
+        span = locate_element(_PAGE, "pages/index.astro", stable_id("pages/index.astro", 5))
+        start, end = line_window(_PAGE, span, 1)
+        assert _PAGE[start:end] == "  </section>\n  <article><p>Текст</p></article>\n</Layout>\n"
+
+    def test_window_clamped_to_file(self):
+        code = "<p>a</p>"
+        span = locate_element(code, "x.astro", stable_id("x.astro", 0))
+        assert line_window(code, span, 10) == (0, len(code))
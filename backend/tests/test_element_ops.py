@@ -0,0 +1,75 @@
+"""Unit-тесты для app/services/element_ops.py (правки элемента без LLM).
+
+Запуск:
+    cd backend
+    pytest tests/test_element_ops.py -v
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.services.element_locator import stable_id
+from app.services.element_ops import ElementOpError, apply_operation
+
+_PATH = "pages/index.astro"
+_CODE = """\
+<section class="hero dark">
+  <h1>
+    Кофейня
+  </h1>
+  <a href="/menu">Меню</a>
+  <p>Цена: {price} ₽</p>
+  <img src="/cup.png" />
+</section>
+"""
+
+
+def _apply(index: int, operation: str, value: str, name: str | None = None) -> str:
+    return apply_operation(_CODE, _PATH, stable_id(_PATH, index), operation, value, name=name)
+
+
+class TestSetText:
+    def test_replaces_text_keeping_whitespace(self):
+        result = _apply(1, "set_text", "Пекарня <&>")
+        assert "  <h1>\n    Пекарня &lt;&amp;&gt;\n  </h1>" in result
+
+    def test_expression_inside_is_rejected(self):
+        with pytest.raises(ElementOpError):
+            _apply(3, "set_text", "x")
+
+    def test_void_element_is_rejected(self):
+        with pytest.raises(ElementOpError):
+            _apply(4, "set_text", "x")
+
+
+class TestSetAttribute:
+    def test_replaces_existing_value(self):
+        result = _apply(2, "set_attribute", "/contacts", name="href")
+        assert '<a href="/contacts">Меню</a>' in result
+
+    def test_adds_missing_attribute_to_self_closing_tag(self):
+        result = _apply(4, "set_attribute", 'Чашка "эспрессо"', name="alt")
+        assert '<img src="/cup.png" alt="Чашка &quot;эспрессо&quot;" />' in result
+
+    @pytest.mark.parametrize("name", ["onclick", "data-editable-id", "class", "bad name"])
+    def test_forbidden_names(self, name):
+        with pytest.raises(ElementOpError):
+            _apply(2, "set_attribute", "x", name=name)
+
+
+class TestClasses:
+    def test_add_and_remove(self):
+        added = _apply(0, "add_class", "py-8 dark")
+        assert '<section class="hero dark py-8">' in added
+        removed = apply_operation(added, _PATH, stable_id(_PATH, 0), "remove_class", "hero dark py-8")
+        assert removed.startswith("<section>\n")
+
+    def test_class_list_is_rejected(self):
+        code = '<div class:list={["a"]}>x</div>'
+        with pytest.raises(ElementOpError):
+            apply_operation(code, "x.astro", stable_id("x.astro", 0), "add_class", "b")
+
+
+def test_unknown_element():
+    with pytest.raises(ElementOpError, match="not found"):
+        apply_operation(_CODE, _PATH, "0" * 16, "set_text", "x")
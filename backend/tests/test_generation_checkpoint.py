@@ -0,0 +1,171 @@
+"""Unit-тесты для чекпоинтов pipeline генерации (app/services/generation_checkpoint.py).
+
+Redis подменяется словарём в памяти, агенты и БД — моками.
+
+Запуск:
+    cd backend
+    pytest tests/test_generation_checkpoint.py -v
+"""
+from __future__ import annotations
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+_PROJ_ID = "aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa"
+_USER_ID = "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb"
+
+
+class _FakeRedis:
+    """Минимальный hash-API Redis поверх словаря."""
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[bytes, bytes]] = {}
+        self.values: dict[str, str] = {}
+
+    @staticmethod
+    def _b(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(self._b(field))
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[self._b(field)] = self._b(value)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def _checkpoint(redis: _FakeRedis, *inputs):
+    from app.services.generation_checkpoint import GenerationCheckpoint
+
+    with patch("app.services.generation_checkpoint.redis_lib.from_url", return_value=redis):
+        return GenerationCheckpoint(_PROJ_ID, *inputs)
+
+
+# ===========================================================================
+# GenerationCheckpoint
+# ===========================================================================
+
+class TestGenerationCheckpoint:
+    def test_stage_and_files_round_trip(self):
+        redis = _FakeRedis()
+        cp = _checkpoint(redis, "prompt", "gpt-5.4", None)
+        cp.save("spec", {"pages": ["index"]})
+        cp.save_file("src/pages/index.astro", {"path": "src/pages/index.astro", "content": "<h1/>"})
+
+        again = _checkpoint(redis, "prompt", "gpt-5.4", None)
+        assert again.load("spec") == {"pages": ["index"]}
+        assert again.load("plan") is None
+        assert again.load_files() == {
+            "src/pages/index.astro": {"path": "src/pages/index.astro", "content": "<h1/>"},
+        }
+
+    def test_other_inputs_discard_checkpoint(self):
+        redis = _FakeRedis()
+        _checkpoint(redis, "prompt", "gpt-5.4", None).save("spec", {"pages": []})
+
+        other = _checkpoint(redis, "another prompt", "gpt-5.4", None)
+        assert other.load("spec") is None
+
+    def test_clear_removes_everything(self):
+        redis = _FakeRedis()
+        cp = _checkpoint(redis, "prompt")
+        cp.save("spec", {})
+        cp.clear()
+
+        assert redis.hashes == {}
+
+    def test_redis_errors_do_not_raise(self):
+        redis = MagicMock()
+        redis.hget.side_effect = ConnectionError("down")
+        redis.hset.side_effect = ConnectionError("down")
+        redis.hgetall.side_effect = ConnectionError("down")
+        cp = _checkpoint(redis, "prompt")
+
+        cp.save("spec", {})
+        assert cp.load("spec") is None
+        assert cp.load_files() == {}
+
+
+# ===========================================================================
+# Возобновление _pipeline
+# ===========================================================================
+
+def _db_ctx():
+    db = AsyncMock()
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=db)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return ctx
+
+
+@pytest.mark.asyncio
+class TestPipelineResume:
+    async def _run(self, redis: _FakeRedis, *, gen_side_effect):
+        from app.workers.tasks.generation import _pipeline
+
+        plan = {"files": [
+            {"path": "src/pages/index.astro", "dependencies": []},
+            {"path": "src/layouts/Layout.astro", "dependencies": []},
+        ]}
+        storage = AsyncMock()
+        storage.save_blob = AsyncMock(return_value="a" * 64)
+
+        with patch("app.services.generation_checkpoint.redis_lib.from_url", return_value=redis), \
+             patch("app.workers.tasks.generation.redis_lib.from_url", return_value=redis), \
+             patch("app.workers.tasks.generation.AsyncSessionFactory", return_value=_db_ctx()), \
+             patch("app.workers.tasks.generation.project_repo", new=AsyncMock()), \
+             patch("app.workers.tasks.generation.snapshot_repo.allocate_version",
+                   new_callable=AsyncMock, return_value=1), \
+             patch("app.workers.tasks.generation.snapshot_repo.create", new_callable=AsyncMock), \
+             patch("app.workers.tasks.generation.OptimizerAgent") as MockOpt, \
+             patch("app.workers.tasks.generation.ArchitectAgent") as MockArch, \
+             patch("app.workers.tasks.generation.CodeGeneratorAgent") as MockGen, \
+             patch("app.workers.tasks.build.run_build"):
+            MockOpt.return_value.run = AsyncMock(return_value={"pages": ["index"]})
+            MockArch.return_value.run = AsyncMock(return_value=plan)
+            MockGen.return_value.run = AsyncMock(side_effect=gen_side_effect)
+            try:
+                resumed = await _pipeline(_PROJ_ID, _USER_ID, "кофейня", "gpt-5.4", storage)
+            except RuntimeError:
+                resumed = None
+        return resumed, MockOpt, MockArch, MockGen
+
+    async def test_retry_skips_finished_stages_and_files(self):
+        redis = _FakeRedis()
+
+        async def _fail_on_index(data, on_progress=None):
+            if data["file"]["path"] == "src/pages/index.astro":
+                raise RuntimeError("rate limited")
+            return {"path": data["file"]["path"], "content": "<html/>"}
+
+        first, *_ = await self._run(redis, gen_side_effect=_fail_on_index)
+        assert first is None
+
+        async def _ok(data, on_progress=None):
+            return {"path": data["file"]["path"], "content": "<main/>"}
+
+        resumed, MockOpt, MockArch, MockGen = await self._run(redis, gen_side_effect=_ok)
+
+        assert resumed == {"stages": ["optimizer", "architect"], "files": ["src/layouts/Layout.astro"]}
+        MockOpt.return_value.run.assert_not_awaited()
+        MockArch.return_value.run.assert_not_awaited()
+        generated = [c.args[0]["file"]["path"] for c in MockGen.return_value.run.await_args_list]
+        assert generated == ["src/pages/index.astro"]
+        # после успеха чекпоинт удалён, в статусе — что было пропущено
+        assert redis.hashes == {}
+        status = json.loads(redis.values[f"generation:{_PROJ_ID}:status"])
+        assert status["stage"] == "building"
+        assert status["resumed"] == resumed
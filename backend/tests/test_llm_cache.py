@@ -0,0 +1,167 @@
+"""Unit-тесты для app/services/llm_cache.py и кэширования в BaseAgent._call_llm.
+
+Redis подменяется AsyncMock — реальный сервер не нужен.
+
+Запуск:
+    cd backend
+    pytest tests/test_llm_cache.py -v
+"""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import llm_cache
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    llm_cache._lru.clear()
+    llm_cache._lru_bytes = 0
+    for name in llm_cache._stats:
+        llm_cache._stats[name] = 0
+    yield
+    llm_cache._lru.clear()
+    llm_cache._lru_bytes = 0
+
+
+def _fake_redis(stored: str | None = None) -> MagicMock:
+    redis = MagicMock()
+    redis.get = AsyncMock(return_value=stored)
+    redis.set = AsyncMock()
+    return redis
+
+
+# ===========================================================================
+# Уровни кэша
+# ===========================================================================
+
+@pytest.mark.asyncio
+class TestLlmCache:
+    async def test_store_then_lookup_from_memory(self):
+        redis = _fake_redis()
+        with patch.object(llm_cache, "_redis", return_value=redis):
+            await llm_cache.store("k", "answer")
+            assert await llm_cache.lookup("k") == "answer"
+
+        redis.set.assert_awaited_once_with("llm:cache:k", "answer", ex=llm_cache.settings.LLM_CACHE_TTL)
+        redis.get.assert_not_awaited()
+        assert llm_cache.llm_cache_stats()["hits_memory"] == 1
+
+    async def test_redis_hit_warms_memory(self):
+        redis = _fake_redis("shared")
+        with patch.object(llm_cache, "_redis", return_value=redis):
+            assert await llm_cache.lookup("k") == "shared"
+            assert await llm_cache.lookup("k") == "shared"
+
+        redis.get.assert_awaited_once()
+        stats = llm_cache.llm_cache_stats()
+        assert (stats["hits_redis"], stats["hits_memory"]) == (1, 1)
+
+    async def test_miss_counted(self):
+        with patch.object(llm_cache, "_redis", return_value=_fake_redis()):
+            assert await llm_cache.lookup("k") is None
+        assert llm_cache.llm_cache_stats()["misses"] == 1
+
+    async def test_redis_error_is_a_miss(self):
+        redis = _fake_redis()
+        redis.get = AsyncMock(side_effect=ConnectionError("down"))
+        with patch.object(llm_cache, "_redis", return_value=redis):
+            assert await llm_cache.lookup("k") is None
+        assert llm_cache.llm_cache_stats()["redis_errors"] == 1
+
+    async def test_memory_evicts_least_recently_used_by_size(self):
+        with patch.object(llm_cache, "_redis", return_value=_fake_redis()), \
+             patch.object(llm_cache.settings, "LLM_CACHE_MEMORY_BYTES", 10):
+            await llm_cache.store("a", "12345")
+            await llm_cache.store("b", "12345")
+            await llm_cache.lookup("a")
+            await llm_cache.store("c", "12345")
+
+        assert list(llm_cache._lru) == ["a", "c"]
+        stats = llm_cache.llm_cache_stats()
+        assert (stats["memory_bytes"], stats["evictions_memory"]) == (10, 1)
+        assert stats["hit_rate"] == 1.0
+
+    async def test_oversized_response_not_stored(self):
+        redis = _fake_redis()
+        with patch.object(llm_cache, "_redis", return_value=redis), \
+             patch.object(llm_cache.settings, "LLM_CACHE_MAX_ENTRY_BYTES", 3):
+            await llm_cache.store("k", "too long")
+
+        redis.set.assert_not_awaited()
+        assert llm_cache.llm_cache_stats()["skipped_too_large"] == 1
+
+
+class TestLlmCacheConfig:
+    def test_key_depends_on_every_part(self):
+        base = llm_cache.make_key("m", 0.7, "sys", "user")
+        assert base == llm_cache.make_key("m", 0.7, "sys", "user")
+        assert base != llm_cache.make_key("m2", 0.7, "sys", "user")
+        assert base != llm_cache.make_key("m", 0.0, "sys", "user")
+        assert base != llm_cache.make_key("m", 0.7, "sys2", "user")
+        assert base != llm_cache.make_key("m", 0.7, "sys", "user2")
+
+    def test_enabled_for_agents_list(self):
+        with patch.object(llm_cache.settings, "LLM_CACHE_AGENTS", "OptimizerAgent, ArchitectAgent"):
+            assert llm_cache.enabled_for("ArchitectAgent")
+            assert not llm_cache.enabled_for("CodeGeneratorAgent")
+        with patch.object(llm_cache.settings, "LLM_CACHE_AGENTS", "*"):
+            assert llm_cache.enabled_for("CodeGeneratorAgent")
+
+
+# ===========================================================================
+# BaseAgent._call_llm
+# ===========================================================================
+
+def _response(content: str) -> MagicMock:
+    choice = MagicMock()
+    choice.message.content = content
+    response = MagicMock()
+    response.choices = [choice]
+    return response
+
+
+@pytest.mark.asyncio
+class TestCallLlmCache:
+    def _agent(self, content: str):
+        from app.agents.optimizer import OptimizerAgent
+
+        with patch.object(llm_cache.settings, "LLM_CACHE_AGENTS", "OptimizerAgent"):
+            agent = OptimizerAgent()
+        agent.client = MagicMock()
+        agent.client.chat.completions.create = AsyncMock(return_value=_response(content))
+        return agent
+
+    async def test_second_call_served_from_cache(self):
+        agent = self._agent('{"pages": []}')
+        with patch.object(llm_cache, "_redis", return_value=_fake_redis()):
+            first = await agent._call_llm("sys", "user")
+            second = await agent._call_llm("sys", "user")
+
+        assert first == second == '{"pages": []}'
+        agent.client.chat.completions.create.assert_awaited_once()
+
+    async def test_invalid_json_not_cached(self):
+        agent = self._agent("not json")
+        redis = _fake_redis()
+        with patch.object(llm_cache, "_redis", return_value=redis):
+            await agent._call_llm("sys", "user")
+
+        redis.set.assert_not_awaited()
+        assert llm_cache._lru == {}
+
+    async def test_disabled_by_default(self):
+        from app.agents.code_generator import CodeGeneratorAgent
+
+        agent = CodeGeneratorAgent()
+        agent.client = MagicMock()
+        agent.client.chat.completions.create = AsyncMock(return_value=_response("code"))
+        redis = _fake_redis()
+        with patch.object(llm_cache, "_redis", return_value=redis):
+            await agent._call_llm("sys", "user")
+
+        assert agent.cache_enabled is False
+        redis.get.assert_not_awaited()
+        redis.set.assert_not_awaited()
@@ -0,0 +1,156 @@
+"""Unit-тесты для app/services/model_router.py и каскада моделей в BaseAgent._call_llm.
+
+Запуск:
+    cd backend
+    pytest tests/test_model_router.py -v
+"""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import model_router
+
+
+class TestRoute:
+    def test_no_rules_keeps_requested_model(self):
+        with patch.object(model_router.settings, "LLM_MODEL_ROUTES", ""):
+            assert model_router.route("PlannerAgent", "gpt-5.4", 100) == "gpt-5.4"
+
+    def test_first_matching_rule_wins(self):
+        rules = "PlannerAgent=mini, EditorAgent:1000=mini, EditorAgent=mid, *=big"
+        with patch.object(model_router.settings, "LLM_MODEL_ROUTES", rules):
+            assert model_router.route("PlannerAgent", "gpt-5.4", 50_000) == "mini"
+            assert model_router.route("EditorAgent", "gpt-5.4", 800) == "mini"
+            assert model_router.route("EditorAgent", "gpt-5.4", 5000) == "mid"
+            assert model_router.route("ArchitectAgent", "gpt-5.4", 10) == "big"
+
+    def test_every_decision_is_logged(self, caplog):
+        with patch.object(model_router.settings, "LLM_MODEL_ROUTES", "EditorAgent:1000=gpt-5.4"), \
+             caplog.at_level("INFO", logger=model_router.__name__):
+            model_router.route("EditorAgent", "gpt-5.4", 800)
+            model_router.route("EditorAgent", "gpt-5.4", 5000)
+
+        assert [r.getMessage() for r in caplog.records] == [
+            "Model route: EditorAgent (800 chars) gpt-5.4 -> gpt-5.4 by rule EditorAgent:1000",
+            "Model route: EditorAgent (5000 chars) keeps gpt-5.4, no rule matched",
+        ]
+
+    def test_cascade_model(self):
+        with patch.object(model_router.settings, "LLM_CASCADE", "OptimizerAgent=mini"):
+            assert model_router.cascade_model("OptimizerAgent") == "mini"
+            assert model_router.cascade_model("ArchitectAgent") is None
+
+
+def _response(content: str) -> MagicMock:
+    choice = MagicMock()
+    choice.message.content = content
+    response = MagicMock()
+    response.choices = [choice]
+    return response
+
+
+@pytest.mark.asyncio
+class TestCascade:
+    def _agent(self, *contents: str):
+        from app.agents.optimizer import OptimizerAgent
+
+        agent = OptimizerAgent(model="gpt-5.4")
+        agent.client = MagicMock()
+        agent.client.chat.completions.create = AsyncMock(side_effect=[_response(c) for c in contents])
+        return agent
+
+    def _models(self, agent) -> list[str]:
+        return [c.kwargs["model"] for c in agent.client.chat.completions.create.await_args_list]
+
+    async def test_valid_fast_answer_accepted(self):
+        agent = self._agent('{"pages": []}')
+        with patch.object(model_router.settings, "LLM_CASCADE", "OptimizerAgent=mini"):
+            result = await agent._call_llm("sys", "user")
+
+        assert result == '{"pages": []}'
+        assert self._models(agent) == ["mini"]
+
+    async def test_invalid_fast_answer_escalates(self):
+        agent = self._agent("не JSON", '{"pages": ["index"]}')
+        with patch.object(model_router.settings, "LLM_CASCADE", "OptimizerAgent=mini"):
+            result = await agent._call_llm("sys", "user")
+
+        assert result == '{"pages": ["index"]}'
+        assert self._models(agent) == ["mini", "gpt-5.4"]
+
+    async def test_custom_validator(self):
+        agent = self._agent("short", "long enough")
+        with patch.object(model_router.settings, "LLM_CASCADE", "*=mini"):
+            result = await agent._call_llm("sys", "user", validate=lambda c: len(c) > 5)
+
+        assert result == "long enough"
+
+    async def test_route_applies_without_cascade(self):
+        agent = self._agent('{"pages": []}')
+        with patch.object(model_router.settings, "LLM_MODEL_ROUTES", "OptimizerAgent=mini"), \
+             patch.object(model_router.settings, "LLM_CASCADE", ""):
+            await agent._call_llm("sys", "user")
+
+        assert self._models(agent) == ["mini"]
+
+    async def test_editor_full_file_rejects_broken_fast_answer(self):
+        from app.agents.editor import EditorAgent
+
+        agent = EditorAgent(model="gpt-5.4")
+        agent.client = MagicMock()
+        agent.client.chat.completions.create = AsyncMock(side_effect=[
+            _response("---\n---\n<div><h1>Новый</h1>"), _response("---\n---\n<div><h1>Новый</h1></div>"),
+        ])
+        with patch.object(model_router.settings, "LLM_CASCADE", "EditorAgent=mini"), \
+             patch("app.agents.editor.settings.EDITOR_EDIT_MODE", "full"):
+            result = await agent.edit(
+                current_code="---\n---\n<div><h1>Старый</h1></div>", element_id="", prompt="p",
+                file_path="pages/index.astro",
+            )
+
+        assert result == "---\n---\n<div><h1>Новый</h1></div>"
+        assert self._models(agent) == ["mini", "gpt-5.4"]
+
+    async def test_no_cascade_without_validator_for_text_agents(self):
+        agent = self._agent("любой текст")
+        agent.json_response = False
+        with patch.object(model_router.settings, "LLM_CASCADE", "*=mini"):
+            await agent._call_llm("sys", "user")
+
+        assert self._models(agent) == ["gpt-5.4"]
+
+    async def test_rejected_fast_stream_does_not_report_progress(self):
+        def _stream(*texts: str):
+            async def _gen():
+                for text in texts:
+                    chunk = MagicMock()
+                    chunk.usage = None
+                    chunk.choices = [MagicMock()]
+                    chunk.choices[0].delta.content = text
+                    yield chunk
+            return _gen()
+
+        agent = self._agent()
+        agent.client.chat.completions.create = AsyncMock(side_effect=[
+            _stream("не ", "JSON", " совсем"), _stream('{"pages"', ": []}"),
+        ])
+        progress: list[tuple[int, int]] = []
+        with patch.object(model_router.settings, "LLM_CASCADE", "OptimizerAgent=mini"):
+            result = await agent._call_llm("sys", "user", on_delta=lambda b, t: progress.append((b, t)))
+
+        assert result == '{"pages": []}'
+        assert progress == [(8, 1), (13, 2)]
+
+    async def test_retry_wraps_each_model_call(self):
+        agent = self._agent()
+        agent.client.chat.completions.create = AsyncMock(side_effect=[
+            Exception("timeout"), _response("не JSON"), _response('{"pages": []}'),
+        ])
+        with patch.object(model_router.settings, "LLM_CASCADE", "OptimizerAgent=mini"), \
+             patch("asyncio.sleep", AsyncMock()):
+            result = await agent._call_llm("sys", "user")
+
+        assert result == '{"pages": []}'
+        assert self._models(agent) == ["mini", "mini", "gpt-5.4"]
@@ -6,6 +6,7 @@
 """
 from __future__ import annotations
 
+import hashlib
 import json
 from io import BytesIO
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -60,7 +61,8 @@ class TestSaveFile:
         await svc.save_file("projects", "some/path.txt", b"hello")
 
         svc._sync_put_object.assert_called_once_with(
-            "astro-projects", "some/path.txt", b"hello"
+            "astro-projects", "some/path.txt", b"hello",
+            {"sha256": hashlib.sha256(b"hello").hexdigest()},
         )
 
     @pytest.mark.asyncio
@@ -71,7 +73,8 @@ class TestSaveFile:
         await svc.save_file("projects", "obj.txt", BytesIO(b"bio data"))
 
         svc._sync_put_object.assert_called_once_with(
-            "astro-projects", "obj.txt", b"bio data"
+            "astro-projects", "obj.txt", b"bio data",
+            {"sha256": hashlib.sha256(b"bio data").hexdigest()},
         )
 
     @pytest.mark.asyncio
@@ -116,7 +119,7 @@ class TestSaveSourceFiles:
         svc = _make_storage()
         uploaded: list[str] = []
         svc._sync_put_object = MagicMock(
-            side_effect=lambda _b, name, _d: uploaded.append(name)
+            side_effect=lambda _b, name, _d, _m: uploaded.append(name)
         )
 
         await svc.save_source_files("user-1", "proj-1", {"src/pages/index.astro": "x"})
@@ -128,7 +131,7 @@ class TestSaveSourceFiles:
         svc = _make_storage()
         uploaded: list[str] = []
         svc._sync_put_object = MagicMock(
-            side_effect=lambda _b, name, _d: uploaded.append(name)
+            side_effect=lambda _b, name, _d, _m: uploaded.append(name)
         )
 
         await svc.save_source_files("u", "p", {"/pages/index.astro": "x"})
@@ -142,7 +145,7 @@ class TestSaveSourceFiles:
         svc = _make_storage()
         captured: list[bytes] = []
         svc._sync_put_object = MagicMock(
-            side_effect=lambda _b, _n, data: captured.append(data)
+            side_effect=lambda _b, _n, data, _m: captured.append(data)
         )
 
         await svc.save_source_files("u", "p", {"f.astro": "Привет мир"})
@@ -204,23 +207,55 @@ class TestDeleteDirectory:
     async def test_all_listed_objects_removed(self):
         svc = _make_storage()
         svc._sync_list_objects = MagicMock(return_value=["a/1.txt", "a/2.txt"])
-        svc._sync_remove_object = MagicMock()
+        svc._sync_remove_objects = MagicMock(return_value={})
+
+        errors = await svc.delete_directory("projects", "a/")
+
+        assert errors == {}
+        svc._sync_remove_objects.assert_called_once()
+        assert svc._sync_remove_objects.call_args[0][1] == ["a/1.txt", "a/2.txt"]
+
+    @pytest.mark.asyncio
+    async def test_keys_sent_in_batches_of_1000(self):
+        svc = _make_storage()
+        names = [f"a/{i}.txt" for i in range(2500)]
+        svc._sync_list_objects = MagicMock(return_value=names)
+        svc._sync_remove_objects = MagicMock(return_value={})
 
         await svc.delete_directory("projects", "a/")
 
-        assert svc._sync_remove_object.call_count == 2
-        removed = {c[0][1] for c in svc._sync_remove_object.call_args_list}
-        assert removed == {"a/1.txt", "a/2.txt"}
+        sizes = sorted(len(c[0][1]) for c in svc._sync_remove_objects.call_args_list)
+        assert sizes == [500, 1000, 1000]
+
+    @pytest.mark.asyncio
+    async def test_per_key_errors_returned(self):
+        svc = _make_storage()
+        svc._sync_list_objects = MagicMock(return_value=["a/1.txt", "a/2.txt"])
+        svc._sync_remove_objects = MagicMock(return_value={"a/2.txt": "AccessDenied: nope"})
+
+        errors = await svc.delete_directory("projects", "a/")
+
+        assert errors == {"a/2.txt": "AccessDenied: nope"}
+
+    def test_sync_remove_objects_collects_delete_errors(self):
+        svc = _make_storage()
+        err = MagicMock()
+        err.name, err.code, err.message = "a/1.txt", "AccessDenied", "nope"
+        svc.client.remove_objects.return_value = iter([err])
+
+        errors = svc._sync_remove_objects("astro-projects", ["a/1.txt", "a/2.txt"])
+
+        assert errors == {"a/1.txt": "AccessDenied: nope"}
 
     @pytest.mark.asyncio
     async def test_empty_dir_no_remove_calls(self):
         svc = _make_storage()
         svc._sync_list_objects = MagicMock(return_value=[])
-        svc._sync_remove_object = MagicMock()
+        svc._sync_remove_objects = MagicMock()
 
         await svc.delete_directory("projects", "empty/")
 
-        svc._sync_remove_object.assert_not_called()
+        svc._sync_remove_objects.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_invalid_bucket_raises(self):
@@ -270,6 +305,95 @@ class TestSyncGetObjectResponseClosed:
         mock_resp.release_conn.assert_called_once()
 
 
+# ===========================================================================
+# StorageService.save_blob — content-addressed снапшоты
+# ===========================================================================
+
+class _NoSuchKey(Exception):
+    code = "NoSuchKey"
+
+
+class TestSaveBlob:
+    @pytest.mark.asyncio
+    async def test_uploads_new_blob_under_hash(self):
+        import hashlib
+
+        svc = _make_storage()
+        svc.client.stat_object.side_effect = _NoSuchKey()
+        data = b"<h1>v1</h1>"
+
+        content_hash = await svc.save_blob("u", "p", data)
+
+        assert content_hash == hashlib.sha256(data).hexdigest()
+        svc.client.put_object.assert_called_once()
+        kwargs = svc.client.put_object.call_args.kwargs
+        assert kwargs["bucket_name"] == "astro-projects"
+        assert kwargs["object_name"] == f"projects/u/p/blobs/{content_hash}"
+
+    @pytest.mark.asyncio
+    async def test_existing_blob_not_uploaded_again(self):
+        svc = _make_storage()
+        svc.client.stat_object.return_value = MagicMock()
+
+        first = await svc.save_blob("u", "p", b"same")
+        second = await svc.save_blob("u", "p", b"same")
+
+        assert first == second
+        svc.client.put_object.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stat_error_other_than_missing_raises(self):
+        svc = _make_storage()
+        svc.client.stat_object.side_effect = RuntimeError("connection refused")
+
+        with pytest.raises(Exception, match="Error saving blob to MinIO"):
+            await svc.save_blob("u", "p", b"x")
+
+
+# ===========================================================================
+# Общий Minio-клиент и однократная инициализация бакетов
+# ===========================================================================
+
+class TestSharedMinioClient:
+    def test_client_built_once_per_process(self):
+        import app.services.storage as _storage_mod
+        from app.services.storage import StorageService
+
+        minio_cls = MagicMock(return_value=MagicMock())
+        with patch.object(_storage_mod, "Minio", minio_cls):
+            a = StorageService()
+            b = StorageService()
+
+        assert a.client is b.client
+        minio_cls.assert_called_once()
+
+    def test_construction_does_not_touch_buckets(self):
+        svc = _make_storage()
+
+        svc.client.bucket_exists.assert_not_called()
+        svc.client.set_bucket_policy.assert_not_called()
+
+    def test_initialize_buckets_checks_every_bucket(self):
+        svc = _make_storage()
+
+        svc.initialize_buckets()
+
+        checked = {c[0][0] for c in svc.client.bucket_exists.call_args_list}
+        assert checked == set(svc.BUCKETS.values())
+        assert svc.client.set_bucket_policy.call_count == len(svc.PUBLIC_BUCKETS)
+
+    def test_reset_builds_new_client(self):
+        import app.services.storage as _storage_mod
+        from app.services.storage import StorageService, reset_minio_client
+
+        with patch.object(_storage_mod, "Minio", side_effect=[MagicMock(), MagicMock()]):
+            first = StorageService().client
+            reset_minio_client()
+            second = StorageService().client
+
+        assert first is not second
+
+
 # ===========================================================================
 # Пайплайн генерации — _pipeline()
 # ===========================================================================
@@ -301,7 +425,7 @@ _USER_ID = "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb"
 @pytest.mark.asyncio
 class TestGenerationPipeline:
     async def _run(self, *, prompt="кофейня", model="gpt-5.4",
-                   optimizer_spec=None, architect_files=None, gen_results=None):
+                   optimizer_spec=None, architect_files=None, gen_results=None, gen_side_effect=None):
         from app.workers.tasks.generation import _pipeline
 
         opt_spec = optimizer_spec or _default_optimizer_spec()
@@ -315,6 +439,11 @@ class TestGenerationPipeline:
         with patch("app.workers.tasks.generation.AsyncSessionFactory", return_value=ctx), \
              patch("app.workers.tasks.generation.project_repo.update_status",
                    new_callable=AsyncMock) as mock_update_status, \
+             patch("app.workers.tasks.generation.project_repo.set_active_snapshot_version",
+                   new_callable=AsyncMock), \
+             patch("app.workers.tasks.generation.snapshot_repo.allocate_version",
+                   new_callable=AsyncMock, return_value=1), \
+             patch("app.workers.tasks.generation.snapshot_repo.create", new_callable=AsyncMock), \
              patch("app.workers.tasks.generation.OptimizerAgent") as MockOpt, \
              patch("app.workers.tasks.generation.ArchitectAgent") as MockArch, \
              patch("app.workers.tasks.generation.CodeGeneratorAgent") as MockGen, \
@@ -324,7 +453,7 @@ class TestGenerationPipeline:
 
             MockOpt.return_value.run = AsyncMock(return_value=opt_spec)
             MockArch.return_value.run = AsyncMock(return_value=arch_files)
-            MockGen.return_value.run = AsyncMock(side_effect=list(gen_res))
+            MockGen.return_value.run = AsyncMock(side_effect=gen_side_effect or list(gen_res))
 
             await _pipeline(_PROJ_ID, _USER_ID, prompt, model, mock_storage)
 
@@ -370,8 +499,15 @@ class TestGenerationPipeline:
         user_id, project_id, files = r["mock_storage"].save_source_files.call_args[0]
         assert user_id == _USER_ID
         assert project_id == _PROJ_ID
-        assert "src/pages/page0.astro" in files
-        assert files["src/pages/page0.astro"] == "<page0/>"
+        assert files == {"src/pages/page0.astro": "<page0/>"}
+
+    async def test_each_file_saved_as_soon_as_generated(self):
+        r = await self._run(architect_files=_default_architect_files(3), gen_results=_default_gen_results(3))
+
+        saved = [c.args[2] for c in r["mock_storage"].save_source_files.await_args_list]
+        assert sorted(saved, key=lambda f: list(f)[0]) == [
+            {f"src/pages/page{i}.astro": f"<page{i}/>"} for i in range(3)
+        ]
 
     async def test_build_task_queued_after_save(self):
         r = await self._run()
@@ -393,16 +529,47 @@ class TestGenerationPipeline:
         r["MockArch"].assert_called_once_with(model="gpt-5.4")
         r["MockGen"].assert_called_once_with(model="gpt-5.4")
 
+    async def test_streamed_progress_in_status(self):
+        async def _streaming_gen(data, on_progress=None):
+            on_progress(512, 128)
+            return {"path": data["file"]["path"], "content": "<page0/>"}
+
+        with patch("app.workers.tasks.generation.settings.GENERATION_PROGRESS_INTERVAL", 0):
+            r = await self._run(gen_side_effect=_streaming_gen)
+
+        payloads = [json.loads(c[0][1]) for c in r["mock_redis"].set.call_args_list]
+        running = [
+            p["files"]["src/pages/page0.astro"] for p in payloads
+            if p.get("files", {}).get("src/pages/page0.astro", {}).get("status") == "running"
+        ]
+        assert {"status": "running", "bytes": 512, "tokens": 128} in running
+
+    async def test_invalid_file_regenerated_before_build(self):
+        """Файл с незакрытым тегом перегенерируется с замечаниями валидатора."""
+        calls = []
+
+        async def _gen(data, on_progress=None):
+            calls.append(data)
+            content = "<div><p>ok</p></div>" if data.get("problems") else "<div><p>ok</p>"
+            return {"path": data["file"]["path"], "content": content}
+
+        r = await self._run(gen_side_effect=_gen)
+
+        assert len(calls) == 2
+        assert calls[1]["problems"] == ["тег <div> не закрыт"]
+        assert calls[1]["previous"] == "<div><p>ok</p>"
+        saved = [c.args[2] for c in r["mock_storage"].save_source_files.await_args_list]
+        assert saved[-1] == {"src/pages/page0.astro": "<div><p>ok</p></div>"}
+
     async def test_empty_file_list_no_gen_calls(self):
         arch = {"files": []}
         r = await self._run(architect_files=arch, gen_results=[])
         r["MockGen"].return_value.run.assert_not_awaited()
 
-    async def test_empty_file_list_save_called_with_empty_dict(self):
+    async def test_empty_file_list_nothing_saved(self):
         arch = {"files": []}
         r = await self._run(architect_files=arch, gen_results=[])
-        _, _, files = r["mock_storage"].save_source_files.call_args[0]
-        assert files == {}
+        r["mock_storage"].save_source_files.assert_not_awaited()
 
 
 # ===========================================================================
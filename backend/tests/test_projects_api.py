@@ -12,6 +12,7 @@ from unittest.mock import AsyncMock, MagicMock, call, patch
 from uuid import UUID, uuid4
 
 import pytest
+from fastapi import Response
 
 
 # ---------------------------------------------------------------------------
@@ -156,12 +157,87 @@ class TestCopyDirectory:
     @pytest.mark.asyncio
     async def test_sync_error_wrapped(self):
         svc = _make_storage()
+        svc.COPY_RETRY_DELAY = 0
         svc._sync_list_objects = MagicMock(return_value=["x/a.txt"])
         svc._sync_copy_object = MagicMock(side_effect=RuntimeError("minio down"))
 
         with pytest.raises(Exception, match="Error copying directory in MinIO"):
             await svc.copy_directory("projects", "x/", "y/")
 
+    @pytest.mark.asyncio
+    async def test_failed_object_retried(self):
+        svc = _make_storage()
+        svc.COPY_RETRY_DELAY = 0
+        svc._sync_list_objects = MagicMock(return_value=["x/a.txt"])
+        svc._sync_copy_object = MagicMock(side_effect=[RuntimeError("timeout"), None])
+
+        copied = await svc.copy_directory("projects", "x/", "y/")
+
+        assert copied == 1
+        assert svc._sync_copy_object.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_in_flight_copies_bounded(self):
+        import threading
+        import time
+
+        svc = _make_storage()
+        svc._sync_list_objects = MagicMock(return_value=[f"x/{i}.txt" for i in range(12)])
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def _copy(*_args):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.01)
+            with lock:
+                state["active"] -= 1
+
+        svc._sync_copy_object = MagicMock(side_effect=_copy)
+
+        await svc.copy_directory("projects", "x/", "y/", concurrency=3)
+
+        assert svc._sync_copy_object.call_count == 12
+        assert 1 < state["peak"] <= 3
+
+    @pytest.mark.asyncio
+    async def test_progress_reported_per_object(self):
+        svc = _make_storage()
+        svc._sync_list_objects = MagicMock(return_value=["x/a.txt", "x/b.txt"])
+        svc._sync_copy_object = MagicMock()
+        progress: list[tuple[int, int]] = []
+
+        await svc.copy_directory(
+            "projects", "x/", "y/", on_progress=lambda done, total: progress.append((done, total))
+        )
+
+        assert sorted(progress) == [(1, 2), (2, 2)]
+
+    @pytest.mark.asyncio
+    async def test_move_batch_deletes_sources(self):
+        svc = _make_storage()
+        svc._sync_list_objects = MagicMock(return_value=["x/a.txt", "x/b.txt"])
+        svc._sync_copy_object = MagicMock()
+        svc._sync_remove_objects = MagicMock(return_value={})
+
+        await svc.copy_directory("projects", "x/", "y/", move=True)
+
+        svc._sync_remove_objects.assert_called_once_with("astro-projects", ["x/a.txt", "x/b.txt"])
+
+    @pytest.mark.asyncio
+    async def test_move_keeps_sources_when_copy_fails(self):
+        svc = _make_storage()
+        svc.COPY_RETRY_DELAY = 0
+        svc._sync_list_objects = MagicMock(return_value=["x/a.txt"])
+        svc._sync_copy_object = MagicMock(side_effect=RuntimeError("minio down"))
+        svc._sync_remove_objects = MagicMock()
+
+        with pytest.raises(Exception):
+            await svc.copy_directory("projects", "x/", "y/", move=True)
+
+        svc._sync_remove_objects.assert_not_called()
+
 
 # ===========================================================================
 # list_projects
@@ -180,7 +256,7 @@ class TestListProjects:
         result_mock.scalars.return_value.all.return_value = projects
         session.execute = AsyncMock(return_value=result_mock)
 
-        result = await list_projects(user=_user(uid), session=session)
+        result = await list_projects(user=_user(uid), session=session, response=Response())
 
         assert result == projects
 
@@ -192,7 +268,7 @@ class TestListProjects:
         session = AsyncMock()
         session.execute = AsyncMock(return_value=result_mock)
 
-        result = await list_projects(user=_user(), session=session)
+        result = await list_projects(user=_user(), session=session, response=Response())
 
         assert result == []
 
@@ -368,7 +444,7 @@ class TestSaveProject:
         assert src == f"projects/{uid}/000"
         assert str(proj.id) in dst
 
-    async def test_deletes_000_slot_after_copy(self):
+    async def test_000_slot_moved_not_copied(self):
         from app.api.v1.projects.router import save_project
 
         uid = uuid4()
@@ -379,9 +455,7 @@ class TestSaveProject:
         with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage):
             await save_project(project_id=proj.id, user=_user(uid), session=session)
 
-        mock_storage.delete_directory.assert_awaited_once()
-        prefix_arg = mock_storage.delete_directory.call_args[0][1]
-        assert "000" in prefix_arg
+        assert mock_storage.copy_directory.call_args.kwargs["move"] is True
 
     async def test_idempotent_when_already_saved(self):
         """Если s3_path уже не 000, MinIO не трогаем."""
@@ -532,6 +606,89 @@ class TestExportProject:
 
         assert not any(n.endswith("/") for n in names)
 
+    async def _export_synthetic(self, n_files: int, file_size: int, storage: AsyncMock | None = None):
+        """Экспорт проекта из n_files несжимаемых файлов; возвращает (байт в ответе, пик памяти)."""
+        import os
+        import tracemalloc
+        from app.api.v1.projects.router import export_project
+
+        uid = uuid4()
+        proj = _project(uid, s3_path=f"projects/{uid}/abc")
+        proj.name = "Big"
+        session = _session(scalar=proj)
+        mock_storage = storage or AsyncMock()
+        paths = [f"projects/{uid}/abc/build/assets/f{i:04d}.bin" for i in range(n_files)]
+        mock_storage.list_files.side_effect = [paths, []]
+        if storage is None:
+            mock_storage.get_file.side_effect = lambda _b, _p: os.urandom(file_size)
+
+        tracemalloc.start()
+        try:
+            with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage):
+                response = await export_project(project_id=proj.id, user=_user(uid), session=session)
+            total = 0
+            async for chunk in response.body_iterator:
+                total += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return total, peak
+
+    async def test_peak_memory_flat_for_500_file_project(self):
+        """Пик памяти не растёт с размером проекта: 500 × 64 KiB ≈ 32 MiB архива."""
+        small_total, small_peak = await self._export_synthetic(50, 64 * 1024)
+        big_total, big_peak = await self._export_synthetic(500, 64 * 1024)
+
+        assert big_total > 500 * 64 * 1024          # весь архив действительно отдан
+        assert big_peak < 4 * 1024 * 1024           # но в памяти — лишь окно prefetch
+        # +29 MiB данных дают лишь метаданные записей (central directory, вызовы мока)
+        assert big_peak - small_peak < 2 * 1024 * 1024
+
+    async def test_prefetch_bounds_in_flight_reads(self):
+        import asyncio
+
+        state = {"active": 0, "peak": 0}
+
+        async def _get_file(_bucket, _path):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0)
+            state["active"] -= 1
+            return b"x"
+
+        mock_storage = AsyncMock()
+        mock_storage.get_file.side_effect = _get_file
+        with patch("app.api.v1.projects.router.settings.EXPORT_PREFETCH", 4):
+            await self._export_synthetic(40, 1, storage=mock_storage)
+
+        assert mock_storage.get_file.await_count == 40
+        assert 1 < state["peak"] <= 4
+
+    async def test_unreadable_file_skipped(self):
+        from app.api.v1.projects.router import export_project
+
+        uid = uuid4()
+        proj = _project(uid, s3_path=f"projects/{uid}/abc")
+        proj.name = "MyProject"
+        session = _session(scalar=proj)
+        mock_storage = AsyncMock()
+        mock_storage.list_files.side_effect = [
+            [f"projects/{uid}/abc/src/a.astro", f"projects/{uid}/abc/src/b.astro"],
+            [],
+        ]
+        mock_storage.get_file.side_effect = [RuntimeError("minio down"), b"b content"]
+
+        with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage):
+            response = await export_project(project_id=proj.id, user=_user(uid), session=session)
+
+        buf = io.BytesIO()
+        async for chunk in response.body_iterator:
+            buf.write(chunk)
+        buf.seek(0)
+        with zipfile.ZipFile(buf) as zf:
+            assert zf.namelist() == ["src/b.astro"]
+            assert zf.read("src/b.astro") == b"b content"
+
     async def test_raises_404_when_no_files(self):
         from fastapi import HTTPException
         from app.api.v1.projects.router import export_project
@@ -609,22 +766,43 @@ class TestDeleteProject:
         session.delete.assert_awaited_once_with(proj)
         session.flush.assert_awaited_once()
 
-    async def test_deletes_minio_directory(self):
+    async def test_deletes_minio_objects_in_batch(self):
         from app.api.v1.projects.router import delete_project
 
         uid = uuid4()
         proj = _project(uid, s3_path=f"projects/{uid}/abc")
         session = _session(scalar=proj)
         mock_storage = AsyncMock()
+        keys = [f"{proj.s3_path}/src/a.astro", f"{proj.s3_path}/src/b.astro"]
+        mock_storage.list_files.return_value = keys
 
         with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage):
             await delete_project(
                 project_id=proj.id, user=_user(uid), session=session
             )
 
-        mock_storage.delete_directory.assert_awaited_once()
-        prefix_arg = mock_storage.delete_directory.call_args[0][1]
-        assert proj.s3_path in prefix_arg
+        assert proj.s3_path in mock_storage.list_files.call_args[0][1]
+        mock_storage.delete_objects.assert_awaited_once_with("projects", keys)
+
+    async def test_large_project_deleted_in_background(self):
+        from app.api.v1.projects.router import delete_project
+
+        uid = uuid4()
+        proj = _project(uid, s3_path=f"projects/{uid}/abc")
+        session = _session(scalar=proj)
+        mock_storage = AsyncMock()
+        mock_storage.list_files.return_value = [f"k{i}" for i in range(5)]
+
+        with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage), \
+             patch("app.api.v1.projects.router.settings.STORAGE_BACKGROUND_DELETE_THRESHOLD", 3), \
+             patch("app.api.v1.projects.router.delete_prefix_task") as task:
+            response = await delete_project(
+                project_id=proj.id, user=_user(uid), session=session
+            )
+
+        task.delay.assert_called_once_with("projects", proj.s3_path + "/")
+        mock_storage.delete_objects.assert_not_awaited()
+        assert response.status_code == 204
 
     async def test_returns_204(self):
         from fastapi import Response
@@ -664,7 +842,7 @@ class TestDeleteProject:
         proj = _project(uid)
         session = _session(scalar=proj)
         mock_storage = AsyncMock()
-        mock_storage.delete_directory.side_effect = RuntimeError("minio down")
+        mock_storage.list_files.side_effect = RuntimeError("minio down")
 
         with patch("app.api.v1.projects.router.StorageService", return_value=mock_storage):
             await delete_project(
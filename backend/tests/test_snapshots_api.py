@@ -6,10 +6,11 @@
 """
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 from uuid import UUID, uuid4
 
 import pytest
+from fastapi import Response
 
 
 # ---------------------------------------------------------------------------
@@ -92,7 +93,8 @@ class TestListSnapshots:
             new=AsyncMock(return_value=[snap1, snap2]),
         ):
             result = await list_snapshots(
-                project_id=project_id, user=_user(uid), db=_db_with_project()
+                project_id=project_id, user=_user(uid), db=_db_with_project(),
+                response=Response(),
             )
 
         assert result == [snap1, snap2]
@@ -105,7 +107,8 @@ class TestListSnapshots:
             new=AsyncMock(return_value=[]),
         ):
             result = await list_snapshots(
-                project_id=uuid4(), user=_user(), db=_db_with_project()
+                project_id=uuid4(), user=_user(), db=_db_with_project(),
+                response=Response(),
             )
 
         assert result == []
@@ -116,7 +119,8 @@ class TestListSnapshots:
 
         with pytest.raises(HTTPException) as exc_info:
             await list_snapshots(
-                project_id=uuid4(), user=_user(), db=_db_no_project()
+                project_id=uuid4(), user=_user(), db=_db_no_project(),
+                response=Response(),
             )
 
         assert exc_info.value.status_code == 404
@@ -130,12 +134,33 @@ class TestListSnapshots:
 
         with patch("app.api.v1.snapshots.router.snapshot_repo.list_by_project", new=mock_list):
             await list_snapshots(
-                project_id=project_id, user=_user(), db=_db_with_project()
+                project_id=project_id, user=_user(), db=_db_with_project(),
+                response=Response(),
             )
 
         mock_list.assert_called_once()
         assert mock_list.call_args[0][1] == project_id
 
+    async def test_limit_returns_page_and_next_cursor(self):
+        from types import SimpleNamespace
+        from app.api.v1.snapshots.router import list_snapshots
+        from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+        project_id = uuid4()
+        snaps = [_make_snapshot(project_id=project_id, version=v) for v in (7, 6, 5)]
+        mock_list = AsyncMock(return_value=snaps)
+        response = SimpleNamespace(headers={})
+
+        with patch("app.api.v1.snapshots.router.snapshot_repo.list_by_project", new=mock_list):
+            result = await list_snapshots(
+                project_id=project_id, user=_user(), db=_db_with_project(),
+                response=response, limit=2, cursor=encode_cursor({"version": 8}),
+            )
+
+        assert result == snaps[:2]
+        assert mock_list.call_args.kwargs == {"limit": 3, "before_version": 8}
+        assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], version=int) == {"version": 6}
+
 
 # ===========================================================================
 # POST /snapshots/{snapshot_id}/restore
@@ -342,3 +367,134 @@ class TestRestoreSnapshot:
 
         assert exc_info.value.status_code == 500
         assert "MinIO write error" in exc_info.value.detail
+
+
+# ===========================================================================
+# Восстановление по манифесту версии
+# ===========================================================================
+
+def _manifest_file(rel_path: str, content_hash: str | None, legacy_path: str | None = None) -> MagicMock:
+    f = MagicMock()
+    f.rel_path = rel_path
+    f.content_hash = content_hash
+    f.legacy_path = legacy_path
+    return f
+
+
+@pytest.mark.asyncio
+class TestRestoreFromManifest:
+    async def _restore(
+        self,
+        uid: str,
+        project_id: UUID,
+        files: list[MagicMock],
+        active_files: list[MagicMock] | None = None,
+        version: int = 1,
+        active_version: int = 1,
+        src_hashes: dict[str, str] | None = None,
+    ):
+        from app.api.v1.snapshots.router import restore_snapshot
+
+        snap = MagicMock()
+        snap.id = uuid4()
+        snap.project_id = project_id
+        snap.version = version
+        project = MagicMock()
+        project.active_snapshot_version = active_version
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = project
+        db.execute = AsyncMock(return_value=result)
+
+        storage = _make_storage(get_file_return=b"blob")
+        src_prefix = f"projects/{uid}/{project_id}/src/"
+        storage.get_content_hash = AsyncMock(
+            side_effect=lambda _, name: (src_hashes or {}).get(name.removeprefix(src_prefix))
+        )
+        at_version = AsyncMock(return_value=active_files or [])
+        with (
+            patch(
+                "app.api.v1.snapshots.router.snapshot_repo.get_by_id",
+                new=AsyncMock(return_value=snap),
+            ),
+            patch(
+                "app.api.v1.snapshots.router.snapshot_repo.list_files",
+                new=AsyncMock(return_value=files),
+            ),
+            patch(
+                "app.api.v1.snapshots.router.snapshot_repo.list_files_at_version",
+                new=at_version,
+            ),
+            patch("app.api.v1.snapshots.router.StorageService", return_value=storage),
+            patch("app.workers.tasks.build.run_build"),
+        ):
+            await restore_snapshot(snapshot_id=snap.id, user=_user(uid), db=db, redis=AsyncMock())
+        return storage, at_version
+
+    async def test_reads_content_from_blob(self):
+        uid, project_id = str(uuid4()), uuid4()
+
+        storage, _ = await self._restore(
+            uid, project_id, [_manifest_file("pages/index.astro", "ab" * 32)]
+        )
+
+        storage.get_file.assert_awaited_once_with(
+            "projects", f"projects/{uid}/{project_id}/blobs/{'ab' * 32}"
+        )
+        storage.save_file.assert_awaited_once_with(
+            "projects", f"projects/{uid}/{project_id}/src/pages/index.astro", b"blob"
+        )
+
+    async def test_legacy_file_read_from_legacy_path(self):
+        uid, project_id = str(uuid4()), uuid4()
+        legacy = f"projects/{uid}/{project_id}/snapshots/v1/pages/index.astro"
+
+        storage, _ = await self._restore(
+            uid, project_id, [_manifest_file("pages/index.astro", None, legacy)]
+        )
+
+        storage.get_file.assert_awaited_once_with("projects", legacy)
+
+    async def test_only_changed_files_rewritten(self):
+        uid, project_id = str(uuid4()), uuid4()
+        target = [
+            _manifest_file("components/Hero.astro", "22" * 32),
+            _manifest_file("pages/index.astro", "11" * 32),
+        ]
+        active = [
+            _manifest_file("components/Hero.astro", "22" * 32),
+            _manifest_file("pages/index.astro", "33" * 32),
+        ]
+
+        storage, at_version = await self._restore(
+            uid, project_id, target, active, version=1, active_version=3,
+            src_hashes={"components/Hero.astro": "22" * 32, "pages/index.astro": "33" * 32},
+        )
+
+        at_version.assert_awaited_once_with(ANY, project_id, 3)
+        # Hero.astro в активной версии и в src/ совпадает по хэшу — остаётся как есть
+        storage.save_file.assert_awaited_once_with(
+            "projects", f"projects/{uid}/{project_id}/src/pages/index.astro", b"blob"
+        )
+
+    async def test_stale_src_file_rewritten_despite_manifest_match(self):
+        """src/ изменён писателем, чей снапшот не закоммичен, — манифесту верить нельзя."""
+        uid, project_id = str(uuid4()), uuid4()
+        target = [_manifest_file("components/Hero.astro", "22" * 32)]
+
+        storage, _ = await self._restore(
+            uid, project_id, target, list(target), version=1, active_version=3,
+            src_hashes={"components/Hero.astro": "44" * 32},
+        )
+
+        storage.save_file.assert_awaited_once_with(
+            "projects", f"projects/{uid}/{project_id}/src/components/Hero.astro", b"blob"
+        )
+
+    async def test_empty_manifest_returns_404(self):
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc_info:
+            await self._restore(str(uuid4()), uuid4(), [])
+
+        assert exc_info.value.status_code == 404